@@ -1,21 +1,80 @@
-from fastapi import APIRouter, HTTPException, Depends
-from database import supabase
-from service import get_current_user
-from typing import Dict, List, Optional, Any
+import asyncio
+import bisect
+import itertools
+import os
+import weakref
+from fastapi import APIRouter, HTTPException, Depends, Query
+from database import async_supabase
+from service import get_request_context, RequestContext
+from events import publish_fridge_event
+from membership import membership_index
+from listing import fetch_all
+from cache import TTLCache
+from debt_simplification import simplify as simplify_debts
+from typing import Dict, List, Optional, Any, Tuple
 from collections import defaultdict
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+try:
+    import numpy as np
+except ImportError:  # optional, only used for large ledger rebuilds
+    np = None
 
 app = APIRouter()
 
 SETTLEMENT_TABLE = "cost_balance_settlements"
-AMOUNT_TOLERANCE = 0.01
+SETTLEMENT_FIELDS = "id, fridge_id, from_user_id, to_user_id, amount, cleared_at, created_at"
+CHECKPOINT_TABLE = "cost_balance_checkpoints"
+CHECKPOINT_PAIRS_TABLE = "cost_balance_checkpoint_pairs"
+CHANGES_TABLE = "fridge_changes"
+
+# Ledgers are rebuilt from scratch when evicted, so these only bound memory
+LEDGER_CACHE_SIZE = int(os.getenv("BALANCE_LEDGER_CACHE_SIZE", "1024"))
+LEDGER_CACHE_TTL = float(os.getenv("BALANCE_LEDGER_CACHE_TTL", "3600"))
+# More pending changes than this and a rebuild is cheaper than catching up
+LEDGER_MAX_CATCH_UP = int(os.getenv("BALANCE_LEDGER_MAX_CATCH_UP", "500"))
+# How ledger rebuilds split item prices: "python", "numpy", or "auto" (NumPy for
+# fridges with at least BALANCE_NUMPY_MIN_ITEMS items, when it is installed)
+BALANCE_ENGINE = os.getenv("BALANCE_ENGINE", "auto")
+BALANCE_NUMPY_MIN_ITEMS = int(os.getenv("BALANCE_NUMPY_MIN_ITEMS", "1000"))
+# Finished GET /balances payloads, keyed by (fridge_id, fridges.balance_version).
+# Writes bump the version, so the TTL only bounds staleness of member names/photos.
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", "1024"))
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "300"))
+# Settlement compaction: settlements older than the minimum age are folded into
+# per-pair checkpoints once a fridge has enough of them. The background pass
+# runs every BALANCE_COMPACTION_INTERVAL seconds; 0 disables it.
+BALANCE_COMPACTION_MIN_AGE_DAYS = int(os.getenv("BALANCE_COMPACTION_MIN_AGE_DAYS", "30"))
+BALANCE_COMPACTION_MIN_SETTLEMENTS = int(os.getenv("BALANCE_COMPACTION_MIN_SETTLEMENTS", "50"))
+BALANCE_COMPACTION_INTERVAL = float(os.getenv("BALANCE_COMPACTION_INTERVAL", "0"))
+BALANCE_COMPACTION_BATCH = int(os.getenv("BALANCE_COMPACTION_BATCH", "100"))
+# Point-in-time balances: a timeline snapshots pair state every N events, so
+# a lookup replays at most N events. Timelines are cached per balance_version.
+BALANCE_HISTORY_SNAPSHOT_EVERY = int(os.getenv("BALANCE_HISTORY_SNAPSHOT_EVERY", "256"))
+BALANCE_HISTORY_CACHE_SIZE = int(os.getenv("BALANCE_HISTORY_CACHE_SIZE", "64"))
+BALANCE_HISTORY_MAX_POINTS = 366
+
+if BALANCE_HISTORY_SNAPSHOT_EVERY < 1:
+    raise ValueError("ERROR: BALANCE_HISTORY_SNAPSHOT_EVERY must be at least 1.")
+if BALANCE_ENGINE not in ("auto", "python", "numpy"):
+    raise ValueError(f"ERROR: Unknown BALANCE_ENGINE '{BALANCE_ENGINE}'. Expected auto, python or numpy.")
+if BALANCE_ENGINE == "numpy" and np is None:
+    raise ValueError("ERROR: BALANCE_ENGINE=numpy but numpy is not installed.")
+
+
+# All money is handled as integer cents; amounts only become floats in responses.
+
+def _to_cents(value: Any) -> int:
+    """Whole cents in a stored amount (price, settlement), rounding half up."""
+    try:
+        return int((Decimal(str(value)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError, ValueError):
+        return 0
 
 
-def _round_currency(value: float) -> float:
-    result = round(float(value) + 1e-9, 2)
-    if abs(result) < AMOUNT_TOLERANCE:
-        return 0.0
-    return result
+def _from_cents(cents: int) -> float:
+    return cents / 100
 
 
 def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
@@ -44,87 +103,498 @@ def _format_iso_datetime(value: Optional[datetime]) -> Optional[str]:
     return value.astimezone(timezone.utc).isoformat()
 
 
-def _simplify_debts(balances: Dict[str, float], users_map: Dict[str, dict]) -> List[dict]:
+def _simplify_debts(balances: Dict[str, int], users_map: Dict[str, dict]) -> List[dict]:
     """
-    Simplify debts using a greedy algorithm to minimize number of transactions.
-    
-    Algorithm:
-    1. Find person who owes the most (most negative balance)
-    2. Find person who is owed the most (most positive balance)
-    3. Settle between them with the minimum of the two amounts
-    4. Repeat until all balances are ~0
-    """
-    # Create a working copy of balances
-    working_balances = {k: v for k, v in balances.items() if abs(v) > 0.01}
-    
-    print(f"DEBUG: Starting debt simplification. Initial balances: {working_balances}")
-    total_balance = sum(working_balances.values())
-    print(f"DEBUG: Sum of balances: {total_balance}")
-    
-    if abs(total_balance) > 0.1:
-        print(f"WARNING: Balances do not sum to zero (sum={total_balance}). This may cause issues.")
-    
-    transactions = []
-    
-    loop_count = 0
-    MAX_LOOPS = 100
-    
-    while working_balances:
-        loop_count += 1
-        if loop_count > MAX_LOOPS:
-            print(f"CRITICAL: Infinite loop detected in debt simplification. Breaking after {MAX_LOOPS} iterations.")
-            print(f"Current working balances: {working_balances}")
-            break
-            
-        # Find max debtor (most negative) and max creditor (most positive)
-        max_debtor = min(working_balances.items(), key=lambda x: x[1])
-        max_creditor = max(working_balances.items(), key=lambda x: x[1])
-
-        debtor_id, debtor_balance = max_debtor
-        creditor_id, creditor_balance = max_creditor
-
-        if abs(debtor_balance) <= AMOUNT_TOLERANCE and abs(creditor_balance) <= AMOUNT_TOLERANCE:
-            break
-
-        settlement_amount = min(abs(debtor_balance), abs(creditor_balance))
-        settlement_amount = _round_currency(settlement_amount)
-
-        if settlement_amount > AMOUNT_TOLERANCE:
-            transactions.append({
-                "from_user_id": debtor_id,
-                "to_user_id": creditor_id,
-                "from_user": users_map.get(debtor_id, {"email": "Unknown", "first_name": "Unknown"}),
-                "to_user": users_map.get(creditor_id, {"email": "Unknown", "first_name": "Unknown"}),
-                "amount": round(settlement_amount, 2)
-            })
+    Turn net balances into the settlement plan shown to users.
 
-        working_balances[debtor_id] = working_balances.get(debtor_id, 0.0) + settlement_amount
-        working_balances[creditor_id] = working_balances.get(creditor_id, 0.0) - settlement_amount
+    The transfers come from the configured engine in debt_simplification
+    (heap-based greedy by default, exact minimum for small groups when
+    DEBT_SIMPLIFICATION_ENGINE=exact).
+    """
+    working_balances = {user_id: cents for user_id, cents in balances.items() if cents}
+
+    print(f"DEBUG: Starting debt simplification. Initial balances (cents): {working_balances}")
+
+    # Every pair debt is added to one member and taken from another, so this can only
+    # fire if a caller passes balances that did not come from the ledger.
+    total_cents = sum(working_balances.values())
+    if total_cents:
+        print(f"WARNING: Balances do not sum to zero (sum={total_cents} cents).")
 
-        if abs(working_balances.get(debtor_id, 0.0)) <= AMOUNT_TOLERANCE and debtor_id in working_balances:
-            del working_balances[debtor_id]
-        if abs(working_balances.get(creditor_id, 0.0)) <= AMOUNT_TOLERANCE and creditor_id in working_balances:
-            del working_balances[creditor_id]
+    transactions = []
+    for debtor_id, creditor_id, cents in simplify_debts(working_balances):
+        amount = _from_cents(cents)
+        transactions.append({
+            "from_user_id": debtor_id,
+            "to_user_id": creditor_id,
+            "from_user": users_map.get(debtor_id, {"email": "Unknown", "first_name": "Unknown"}),
+            "to_user": users_map.get(creditor_id, {"email": "Unknown", "first_name": "Unknown"}),
+            "amount": amount
+        })
 
     return transactions
 
 
-def _calculate_fridge_balances(fridge_id: str) -> Dict[str, Any]:
-    memberships_response = supabase.table("fridge_memberships").select(
-        "users(id, email, first_name, last_name, profile_photo)"
-    ).eq("fridge_id", fridge_id).execute()
+def _item_shares(item: dict, user_ids: List[str]) -> List[Tuple[str, str, int]]:
+    """
+    Split one fridge item between its sharers.
+
+    Returns (debtor_id, creditor_id, cents) for every sharer other than the
+    person who added it. Shares add up to the price exactly: the cents that
+    do not divide evenly go one each to the first sharers, in shared_by order.
+    """
+    price_cents = _to_cents(item.get("price") or 0)
+
+    if price_cents <= 0:
+        return []
+
+    added_by = item.get("added_by")
+    if not added_by or added_by not in user_ids:
+        return []
+
+    valid_sharers = _valid_sharers(item, user_ids)
+    if not valid_sharers:
+        return []
+
+    base_share, remainder = divmod(price_cents, len(valid_sharers))
+
+    shares: List[Tuple[str, str, int]] = []
+    for index, sharer_id in enumerate(valid_sharers):
+        share = base_share + (1 if index < remainder else 0)
+        if share and sharer_id != added_by:
+            shares.append((sharer_id, added_by, share))
+
+    return shares
+
+
+def _valid_sharers(item: dict, user_ids: List[str]) -> List[str]:
+    """Members an item is split between, in shared_by order (everyone when it is empty)."""
+    shared_by_raw = item.get("shared_by")
+    if shared_by_raw in (None, [], {}):
+        potential_sharers = list(user_ids)
+    else:
+        potential_sharers = shared_by_raw
+
+    if isinstance(potential_sharers, str):
+        potential_sharers = [potential_sharers]
+    elif isinstance(potential_sharers, dict):
+        potential_sharers = list(potential_sharers.values())
+    elif not isinstance(potential_sharers, list):
+        potential_sharers = list(potential_sharers)
+
+    valid_user_set = set(user_ids)
+    return [uid for uid in potential_sharers if uid in valid_user_set]
+
+
+def _use_numpy(item_count: int) -> bool:
+    if BALANCE_ENGINE == "numpy":
+        return True
+    return BALANCE_ENGINE == "auto" and np is not None and item_count >= BALANCE_NUMPY_MIN_ITEMS
+
+
+def _numpy_cents(values: List[Any]) -> Optional["np.ndarray"]:
+    """
+    _to_cents over a list of prices, vectorized for ints and floats with at
+    most two decimals. None if some price does not fit in int64.
+    """
+    cents = np.zeros(len(values), dtype=np.int64)
+    numeric = np.fromiter(
+        (isinstance(value, (int, float)) and not isinstance(value, bool) for value in values),
+        dtype=bool, count=len(values),
+    )
+    if numeric.any():
+        amounts = np.asarray([value for value, is_numeric in zip(values, numeric) if is_numeric], dtype=np.float64)
+        with np.errstate(invalid="ignore", over="ignore"):
+            scaled = np.rint(amounts * 100)
+            # Exact when the float is the nearest double to a whole number of cents
+            exact = np.isfinite(scaled) & (scaled / 100 == amounts) & (np.abs(scaled) < 2 ** 53)
+        numeric_positions = np.flatnonzero(numeric)
+        cents[numeric_positions[exact]] = scaled[exact].astype(np.int64)
+        numeric[numeric_positions[~exact]] = False
+    for position in np.flatnonzero(~numeric).tolist():
+        value = _to_cents(values[position])
+        if abs(value) >= 2 ** 62:
+            return None
+        cents[position] = value
+    return cents
+
+
+def _numpy_pair_contributions(items: List[dict], member_ids: Tuple[str, ...]) -> Optional[Dict[Tuple[str, str], int]]:
+    """
+    Cents contributed per (debtor, creditor) pair over many items at once.
+
+    Same split rule as _item_shares, on int64 arrays: one entry per
+    (item, sharer) with the sharer's rank in the item, so the remainder cents
+    go to rank < price % sharers. Results are identical to summing
+    _item_shares over the items, or None when the amounts could overflow.
+    """
+    member_index = {uid: index for index, uid in enumerate(member_ids)}
+    everyone = list(range(len(member_ids)))
+    creditors: List[int] = []
+    raw_prices: List[Any] = []
+    sharer_lists: List[List[int]] = []
+
+    for item in items:
+        creditor = member_index.get(item.get("added_by"))
+        if creditor is None:
+            continue
+        shared_by = item.get("shared_by")
+        if shared_by in (None, [], {}):
+            sharers = everyone
+        elif isinstance(shared_by, list):
+            sharers = [member_index[uid] for uid in shared_by if uid in member_index]
+        else:
+            sharers = [member_index[uid] for uid in _valid_sharers(item, list(member_ids))]
+        if not sharers:
+            continue
+        raw_prices.append(item.get("price") or 0)
+        creditors.append(creditor)
+        sharer_lists.append(sharers)
+
+    if not raw_prices:
+        return {}
+
+    # One entry per (item, sharer), with the sharer's rank within the item
+    sharer_counts = np.fromiter(map(len, sharer_lists), dtype=np.int64, count=len(sharer_lists))
+    total_entries = int(sharer_counts.sum())
+    entry_item_arr = np.repeat(np.arange(len(sharer_lists), dtype=np.int64), sharer_counts)
+    entry_member_arr = np.fromiter(itertools.chain.from_iterable(sharer_lists), dtype=np.int64, count=total_entries)
+    first_entry = np.cumsum(sharer_counts) - sharer_counts
+    entry_rank_arr = np.arange(total_entries, dtype=np.int64) - first_entry[entry_item_arr]
+    price_arr = _numpy_cents(raw_prices)
+    # Sums must stay exact in int64; absurd prices take the Python path
+    if price_arr is None or int(np.abs(price_arr).max()) * len(raw_prices) >= 2 ** 63:
+        return None
+    creditor_arr = np.asarray(creditors, dtype=np.int64)
+
+    base_share, remainder = np.divmod(price_arr, sharer_counts)
+    shares = base_share[entry_item_arr] + (entry_rank_arr < remainder[entry_item_arr])
+    entry_creditor = creditor_arr[entry_item_arr]
+
+    # The buyer's own share is not a debt; free and negative prices are skipped
+    owed = (entry_member_arr != entry_creditor) & (shares > 0) & (price_arr[entry_item_arr] > 0)
+    matrix = np.zeros((len(member_ids), len(member_ids)), dtype=np.int64)
+    np.add.at(matrix, (entry_member_arr[owed], entry_creditor[owed]), shares[owed])
+
+    debtors, creditors_nz = np.nonzero(matrix)
+    return {
+        (member_ids[debtor], member_ids[creditor]): int(matrix[debtor, creditor])
+        for debtor, creditor in zip(debtors.tolist(), creditors_nz.tolist())
+    }
+
+
+class FridgeLedger:
+    """
+    Running balance state for one fridge.
+
+    Keeps, per (debtor, creditor) pair, the cents contributed through shared
+    items and the cents settled, plus enough per-row detail to undo an item
+    or settlement when it changes. A pair owes max(0, contributed - settled),
+    which is what replaying settlements FIFO over the pair's contributions
+    produces, so a read is O(members^2) however long the history is.
+
+    The ledger follows the fridge_changes log: `cursor` is the last change it
+    has applied, and catch_up() applies anything newer, including writes made
+    by other workers.
+    """
+
+    def __init__(self, fridge_id: str, member_ids: Tuple[str, ...]):
+        self.fridge_id = fridge_id
+        self.member_ids = member_ids
+        self.cursor: Optional[int] = None
+        # Latest settlement checkpoint applied, None when settlements are replayed in full
+        self.checkpoint_id: Optional[int] = None
+        self.built = False
+        self.lock = asyncio.Lock()
+        # Rows are kept so a changed item's old shares can be recomputed and undone
+        self._items: Dict[str, dict] = {}
+        self._settlements: Dict[str, Tuple[str, str, int, Optional[datetime]]] = {}
+        self._contributed: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._settled: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._latest_clears: Dict[str, datetime] = {}
+
+    def _reset(self) -> None:
+        self._items.clear()
+        self._settlements.clear()
+        self._contributed.clear()
+        self._settled.clear()
+        self._latest_clears.clear()
+
+    @staticmethod
+    def _item_key(item: dict) -> str:
+        item_id = item.get("id")
+        if not item_id:
+            item_id = f"{item.get('added_by')}-{item.get('created_at') or ''}"
+        return str(item_id)
+
+    def load_items(self, items: List[dict]) -> None:
+        """Replace every item at once; large fridges take the NumPy path (BALANCE_ENGINE)."""
+        self._items = {self._item_key(item): item for item in items}
+        self._contributed.clear()
+        if _use_numpy(len(self._items)):
+            contributions = _numpy_pair_contributions(list(self._items.values()), self.member_ids)
+            if contributions is not None:
+                self._contributed.update(contributions)
+                return
+        for item in self._items.values():
+            for debtor_id, creditor_id, cents in _item_shares(item, list(self.member_ids)):
+                self._contributed[(debtor_id, creditor_id)] += cents
+
+    def apply_item(self, item: dict) -> None:
+        item_id = self._item_key(item)
+        self.remove_item(item_id)
+        for debtor_id, creditor_id, cents in _item_shares(item, list(self.member_ids)):
+            self._contributed[(debtor_id, creditor_id)] += cents
+        self._items[item_id] = item
+
+    def remove_item(self, item_id: str) -> None:
+        previous = self._items.pop(str(item_id), None)
+        if previous is None:
+            return
+        for debtor_id, creditor_id, cents in _item_shares(previous, list(self.member_ids)):
+            self._contributed[(debtor_id, creditor_id)] -= cents
+
+    def apply_settlement(self, settlement: dict) -> None:
+        self._record_settlement(
+            str(settlement.get("id")),
+            settlement.get("from_user_id"),
+            settlement.get("to_user_id"),
+            max(0, _to_cents(settlement.get("amount") or 0)),
+            _parse_iso_datetime(settlement.get("cleared_at") or settlement.get("created_at")),
+        )
+
+    def apply_checkpoint_pair(self, pair: dict) -> None:
+        """One pair's folded settlements from a checkpoint, applied like a single settlement."""
+        from_id = pair.get("from_user_id")
+        to_id = pair.get("to_user_id")
+        self._record_settlement(
+            f"checkpoint:{from_id}:{to_id}",
+            from_id,
+            to_id,
+            int(pair.get("amount_cents") or 0),
+            _parse_iso_datetime(pair.get("last_cleared_at")),
+        )
+
+    def _record_settlement(
+        self,
+        settlement_id: str,
+        from_id: Optional[str],
+        to_id: Optional[str],
+        cents: int,
+        cleared_at: Optional[datetime],
+    ) -> None:
+        self.remove_settlement(settlement_id)
+        self._settlements[settlement_id] = (from_id, to_id, cents, cleared_at)
+        self._settled[(from_id, to_id)] += cents
+
+        if cleared_at:
+            for uid in (from_id, to_id):
+                existing = self._latest_clears.get(uid)
+                if uid and (not existing or cleared_at > existing):
+                    self._latest_clears[uid] = cleared_at
+
+    def remove_settlement(self, settlement_id: str) -> None:
+        previous = self._settlements.pop(str(settlement_id), None)
+        if previous:
+            from_id, to_id, cents, cleared_at = previous
+            self._settled[(from_id, to_id)] -= cents
+            # Only a removed latest clear needs a rescan of that user's settlements
+            for uid in (from_id, to_id):
+                if cleared_at and self._latest_clears.get(uid) == cleared_at:
+                    remaining = [
+                        other_cleared_at for other_from, other_to, _, other_cleared_at in self._settlements.values()
+                        if other_cleared_at and uid in (other_from, other_to)
+                    ]
+                    if remaining:
+                        self._latest_clears[uid] = max(remaining)
+                    else:
+                        self._latest_clears.pop(uid, None)
+
+    def pair_totals(self) -> Dict[str, Dict[str, int]]:
+        """Cents each debtor still owes each creditor."""
+        pair_totals: Dict[str, Dict[str, int]] = {}
+        for (debtor_id, creditor_id), contributed in self._contributed.items():
+            remaining = contributed - self._settled.get((debtor_id, creditor_id), 0)
+            if remaining > 0:
+                pair_totals.setdefault(debtor_id, {})[creditor_id] = remaining
+        return pair_totals
+
+    def latest_clears(self) -> Dict[str, datetime]:
+        return dict(self._latest_clears)
+
+    def settled_totals(self) -> Dict[Tuple[str, str], int]:
+        """Cents settled per (debtor, creditor) pair, zero pairs left out."""
+        return {pair: cents for pair, cents in self._settled.items() if cents}
+
+    async def rebuild(self) -> None:
+        # Take the cursor before reading rows: changes that land in between are
+        # applied again by the next catch_up(), which is idempotent.
+        self.cursor = await _latest_change_id(self.fridge_id)
+
+        # Paged: one response stops at PostgREST's max_rows
+        items = await fetch_all(lambda: async_supabase.table("fridge_items").select(
+            "id, price, added_by, shared_by, created_at"
+        ).eq("fridge_id", self.fridge_id))
+
+        checkpoint_id, checkpoint_pairs = await _latest_checkpoint(self.fridge_id)
+
+        settlements: List[dict] = []
+        try:
+            settlements = await fetch_all(lambda: _unfolded_settlements(
+                async_supabase.table(SETTLEMENT_TABLE).select(SETTLEMENT_FIELDS).eq("fridge_id", self.fridge_id),
+                checkpoint_id,
+            ))
+        except Exception as exc:
+            print(f"Warning: unable to fetch settlements for fridge {self.fridge_id}: {exc}")
+
+        self._reset()
+        self.checkpoint_id = checkpoint_id
+        self.load_items(items)
+        for pair in checkpoint_pairs:
+            self.apply_checkpoint_pair(pair)
+        for settlement in settlements:
+            self.apply_settlement(settlement)
+        self.built = True
+        print(f"DEBUG: Rebuilt balance ledger for fridge {self.fridge_id} at change {self.cursor}")
+
+    async def catch_up(self) -> None:
+        if not self.built or self.cursor is None:
+            # No change log to follow, so every read starts from scratch
+            await self.rebuild()
+            return
+
+        changes_response = await async_supabase.table(CHANGES_TABLE).select(
+            "id, collection, row_id, op"
+        ).eq("fridge_id", self.fridge_id).gt("id", self.cursor).order("id").limit(LEDGER_MAX_CATCH_UP + 1).execute()
+        changes = changes_response.data or []
+        if not changes:
+            return
+
+        # Membership changes alter every split; a compaction replaces settlements with a checkpoint
+        if len(changes) > LEDGER_MAX_CATCH_UP or any(
+            change["collection"] in ("fridge_memberships", CHECKPOINT_TABLE) for change in changes
+        ):
+            await self.rebuild()
+            return
+
+        latest_ops: Dict[str, Dict[str, str]] = {"fridge_items": {}, SETTLEMENT_TABLE: {}}
+        for change in changes:
+            if change["collection"] in latest_ops and change.get("row_id") is not None:
+                latest_ops[change["collection"]][change["row_id"]] = change["op"]
+
+        item_ids = [row_id for row_id, op in latest_ops["fridge_items"].items() if op == "upsert"]
+        settlement_ids = [row_id for row_id, op in latest_ops[SETTLEMENT_TABLE].items() if op == "upsert"]
+
+        items: List[dict] = []
+        if item_ids:
+            items_response = await async_supabase.table("fridge_items").select(
+                "id, price, added_by, shared_by, created_at"
+            ).eq("fridge_id", self.fridge_id).in_("id", item_ids).execute()
+            items = items_response.data or []
+
+        settlements: List[dict] = []
+        if settlement_ids:
+            settlements_response = await _unfolded_settlements(
+                async_supabase.table(SETTLEMENT_TABLE).select(SETTLEMENT_FIELDS)
+                .eq("fridge_id", self.fridge_id).in_("id", settlement_ids),
+                self.checkpoint_id,
+            ).execute()
+            settlements = settlements_response.data or []
+
+        # Deleted rows, and rows that have since left the fridge, are removed
+        for row_id in latest_ops["fridge_items"]:
+            self.remove_item(row_id)
+        for row_id in latest_ops[SETTLEMENT_TABLE]:
+            self.remove_settlement(row_id)
+        for item in items:
+            self.apply_item(item)
+        for settlement in settlements:
+            self.apply_settlement(settlement)
+
+        self.cursor = changes[-1]["id"]
+
+
+_ledgers = TTLCache(maxsize=LEDGER_CACHE_SIZE, ttl=LEDGER_CACHE_TTL)
+
+
+async def _latest_checkpoint(fridge_id: str) -> Tuple[Optional[int], List[dict]]:
+    """Id and per-pair rows of the fridge's latest settlement checkpoint."""
+    try:
+        checkpoint_response = await async_supabase.table(CHECKPOINT_TABLE).select("id").eq(
+            "fridge_id", str(fridge_id)
+        ).order("id", desc=True).limit(1).execute()
+        if not checkpoint_response.data:
+            return None, []
+
+        checkpoint_id = checkpoint_response.data[0]["id"]
+        pairs_response = await async_supabase.table(CHECKPOINT_PAIRS_TABLE).select(
+            "from_user_id, to_user_id, amount_cents, last_cleared_at"
+        ).eq("checkpoint_id", checkpoint_id).execute()
+        return checkpoint_id, pairs_response.data or []
+    except Exception as exc:
+        print(f"Warning: settlement checkpoints unavailable, replaying every settlement: {exc}")
+        return None, []
+
+
+def _unfolded_settlements(query, checkpoint_id: Optional[int]):
+    """
+    Restrict a settlements query to rows not covered by `checkpoint_id`.
+
+    Rows folded into a newer checkpoint still count: that checkpoint was not
+    read, so a compaction racing with the read cannot lose them.
+    """
+    if checkpoint_id is None:
+        return query
+    return query.or_(f"checkpoint_id.is.null,checkpoint_id.gt.{checkpoint_id}")
+
+
+async def _latest_change_id(fridge_id: str) -> Optional[int]:
+    try:
+        response = await async_supabase.table(CHANGES_TABLE).select("id").eq(
+            "fridge_id", str(fridge_id)
+        ).order("id", desc=True).limit(1).execute()
+    except Exception as exc:
+        print(f"Warning: change log unavailable, balances will be recomputed on every read: {exc}")
+        return None
+    return response.data[0]["id"] if response.data else 0
+
 
+async def get_fridge_ledger(fridge_id: str, member_ids: List[str]) -> FridgeLedger:
+    """The fridge's ledger, brought up to date with the change log."""
+    key = tuple(sorted(member_ids))
+    ledger = _ledgers.get(fridge_id)
+    # Splits depend on who is in the fridge, so a membership change starts over
+    if ledger is None or ledger.member_ids != key:
+        ledger = FridgeLedger(fridge_id, key)
+        _ledgers.set(fridge_id, ledger)
+
+    async with ledger.lock:
+        await ledger.catch_up()
+    return ledger
+
+
+def _net_balances(pair_totals: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    """Net cents per member: what others owe them minus what they owe."""
+    balances_map: Dict[str, int] = {}
+    for debtor_id, creditors_map in pair_totals.items():
+        for creditor_id, total_owed in creditors_map.items():
+            balances_map[debtor_id] = balances_map.get(debtor_id, 0) - total_owed
+            balances_map[creditor_id] = balances_map.get(creditor_id, 0) + total_owed
+    return balances_map
+
+
+async def _calculate_fridge_balances(fridge_id: str, members: Optional[List[dict]] = None) -> Dict[str, Any]:
     all_users: List[dict] = []
-    if memberships_response.data:
-        for membership in memberships_response.data:
-            user_data = membership.get("users")
-            if user_data:
-                all_users.append(user_data)
+    if members is not None:
+        all_users = list(members)
+    else:
+        all_users = await membership_index.members(fridge_id)
 
     if not all_users:
         return {
             "balances": [],
             "users_map": {},
+            "ledger": None,
             "pair_totals": {},
             "balances_map": {},
             "latest_clears": {},
@@ -145,193 +615,26 @@ def _calculate_fridge_balances(fridge_id: str) -> Dict[str, Any]:
         return {
             "balances": [],
             "users_map": {},
+            "ledger": None,
             "pair_totals": {},
             "balances_map": {},
             "latest_clears": {},
         }
 
-    items_response = supabase.table("fridge_items").select("*").eq("fridge_id", fridge_id).execute()
-    items = items_response.data or []
-
-    settlements: List[dict] = []
-    try:
-        settlements_response = (
-            supabase.table(SETTLEMENT_TABLE)
-            .select("id, fridge_id, from_user_id, to_user_id, amount, cleared_at, created_at")
-            .eq("fridge_id", fridge_id)
-            .order("cleared_at", desc=False)
-            .execute()
-        )
-        settlements = settlements_response.data or []
-    except Exception as exc:
-        print(f"Warning: unable to fetch settlements for fridge {fridge_id}: {exc}")
-        settlements = []
-
-    latest_clears: Dict[str, datetime] = {}
-    for settlement in settlements:
-        timestamp = settlement.get("cleared_at") or settlement.get("created_at")
-        parsed_ts = _parse_iso_datetime(timestamp)
-        if not parsed_ts:
-            continue
-        for key in ("from_user_id", "to_user_id"):
-            uid = settlement.get(key)
-            if not uid:
-                continue
-            existing = latest_clears.get(uid)
-            if not existing or parsed_ts > existing:
-                latest_clears[uid] = parsed_ts
-
-    pair_contributions: Dict[str, Dict[str, List[dict]]] = defaultdict(lambda: defaultdict(list))
-    item_details: Dict[str, dict] = {}
-    valid_user_set = set(user_ids)
-
-    for item in items:
-        try:
-            price = float(item.get("price") or 0.0)
-        except (TypeError, ValueError):
-            price = 0.0
-
-        if price <= AMOUNT_TOLERANCE:
-            continue
-
-        added_by = item.get("added_by")
-        if not added_by or added_by not in valid_user_set:
-            continue
-
-        shared_by_raw = item.get("shared_by")
-        if shared_by_raw in (None, [], {}):
-            potential_sharers = list(user_ids)
-        else:
-            potential_sharers = shared_by_raw
-
-        if isinstance(potential_sharers, str):
-            potential_sharers = [potential_sharers]
-        elif isinstance(potential_sharers, dict):
-            potential_sharers = list(potential_sharers.values())
-        elif not isinstance(potential_sharers, list):
-            potential_sharers = list(potential_sharers)
-
-        valid_sharers = [uid for uid in potential_sharers if uid in valid_user_set]
-        if not valid_sharers:
-            continue
-
-        cost_per_person = round(price / len(valid_sharers), 2)
-        total_after_rounding = cost_per_person * len(valid_sharers)
-        remainder = round(price - total_after_rounding, 2)
-
-        item_id = item.get("id")
-        if not item_id:
-            fallback_created_at = item.get("created_at") or ""
-            item_id = f"{added_by}-{fallback_created_at}"
-
-        item_title = item.get("title") or item.get("name") or "Item"
-        created_at = item.get("created_at")
-        item_details[item_id] = {
-            "title": item_title,
-            "price": _round_currency(price),
-            "split_with": len(valid_sharers),
-            "created_at": created_at,
-            "added_by_id": added_by,
-        }
-
-        remainder_applied = False
-        for sharer_id in valid_sharers:
-            amount_to_pay = cost_per_person
-            if not remainder_applied and abs(remainder) > AMOUNT_TOLERANCE:
-                amount_to_pay = round(amount_to_pay + remainder, 2)
-                remainder_applied = True
-
-            amount_to_pay = round(amount_to_pay, 2)
-            if amount_to_pay <= AMOUNT_TOLERANCE:
-                continue
-
-            if sharer_id == added_by:
-                continue
-
-            pair_contributions[sharer_id][added_by].append({
-                "item_id": item_id,
-                "item_title": item_title,
-                "amount_original": amount_to_pay,
-                "amount_remaining": amount_to_pay,
-                "created_at": created_at,
-                "added_by_id": added_by,
-            })
-
-    fallback_dt = datetime(1970, 1, 1, tzinfo=timezone.utc)
-    for creditors_map in pair_contributions.values():
-        for contributions_list in creditors_map.values():
-            contributions_list.sort(
-                key=lambda entry: _parse_iso_datetime(entry.get("created_at")) or fallback_dt
-            )
+    ledger = await get_fridge_ledger(fridge_id, user_ids)
+    return _ledger_balances(ledger, users_map)
 
-    for settlement in settlements:
-        from_id = settlement.get("from_user_id")
-        to_id = settlement.get("to_user_id")
-        try:
-            amount = float(settlement.get("amount") or 0.0)
-        except (TypeError, ValueError):
-            amount = 0.0
 
-        amount = _round_currency(amount)
-        if amount <= AMOUNT_TOLERANCE:
-            continue
+def _ledger_balances(ledger: FridgeLedger, users_map: Dict[str, dict]) -> Dict[str, Any]:
+    """The balance calculation for `users_map` from the ledger's current state."""
+    pair_totals = ledger.pair_totals()
+    latest_clears = ledger.latest_clears()
 
-        debtor_map = pair_contributions.get(from_id)
-        if not debtor_map:
-            continue
-
-        contributions_list = debtor_map.get(to_id)
-        if not contributions_list:
-            continue
-
-        remaining_amount = amount
-        for contribution in contributions_list:
-            if remaining_amount <= AMOUNT_TOLERANCE:
-                break
-
-            current_remaining = _round_currency(contribution.get("amount_remaining", 0.0))
-            if current_remaining <= AMOUNT_TOLERANCE:
-                continue
-
-            deduct_amount = min(remaining_amount, current_remaining)
-            deduct_amount = _round_currency(deduct_amount)
-
-            contribution["amount_remaining"] = _round_currency(current_remaining - deduct_amount)
-            remaining_amount = _round_currency(remaining_amount - deduct_amount)
-
-    balances_map: Dict[str, float] = {}
-    for debtor_id, creditors_map in pair_contributions.items():
-        if debtor_id not in balances_map:
-            balances_map[debtor_id] = 0.0
-        for creditor_id, contributions_list in creditors_map.items():
-            if creditor_id not in balances_map:
-                balances_map[creditor_id] = 0.0
-            total_owed = sum(
-                _round_currency(contrib.get("amount_remaining", 0.0))
-                for contrib in contributions_list
-            )
-            total_owed = _round_currency(total_owed)
-            if total_owed > AMOUNT_TOLERANCE:
-                balances_map[debtor_id] -= total_owed
-                balances_map[creditor_id] += total_owed
-
-    pair_totals: Dict[str, Dict[str, float]] = {}
-    for debtor_id, creditors_map in pair_contributions.items():
-        for creditor_id, contributions_list in creditors_map.items():
-            total_remaining = sum(
-                _round_currency(contrib.get("amount_remaining", 0.0))
-                for contrib in contributions_list
-            )
-            total_remaining = _round_currency(total_remaining)
-            if total_remaining > AMOUNT_TOLERANCE:
-                if debtor_id not in pair_totals:
-                    pair_totals[debtor_id] = {}
-                pair_totals[debtor_id][creditor_id] = total_remaining
+    balances_map = _net_balances(pair_totals)
 
     balances_list: List[dict] = []
     for user_id, user_data in users_map.items():
-        balance_value = balances_map.get(user_id, 0.0)
-        balance_value = _round_currency(balance_value)
+        balance_value = _from_cents(balances_map.get(user_id, 0))
 
         user_clear_ts = latest_clears.get(user_id)
         user_clear_str = _format_iso_datetime(user_clear_ts) if user_clear_ts else None
@@ -349,6 +652,7 @@ def _calculate_fridge_balances(fridge_id: str) -> Dict[str, Any]:
     return {
         "balances": balances_list,
         "users_map": users_map,
+        "ledger": ledger,
         "pair_totals": pair_totals,
         "balances_map": balances_map,
         "latest_clears": {
@@ -357,71 +661,95 @@ def _calculate_fridge_balances(fridge_id: str) -> Dict[str, Any]:
     }
 
 
+_clear_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _fridge_clear_lock(fridge_id: str) -> asyncio.Lock:
+    """One lock per fridge, alive while any clear for that fridge holds or waits on it."""
+    lock = _clear_locks.get(fridge_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _clear_locks[fridge_id] = lock
+    return lock
+
+
 @app.post("/balances/{user_id}/clear")
-async def clear_user_balance(user_id: str, current_user=Depends(get_current_user)):
+async def clear_user_balance(user_id: str, ctx: RequestContext = Depends(get_request_context)):
     try:
-        fridge_id = current_user.get("fridge_id") if isinstance(current_user, dict) else None
+        fridge_id = ctx.fridge_id
 
         if not fridge_id:
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
 
-        calculation = _calculate_fridge_balances(fridge_id)
-        users_map = calculation["users_map"]
+        # Serialize clears per fridge so two taps cannot both insert settlements for the same debts
+        async with _fridge_clear_lock(str(fridge_id)):
+            calculation = await _calculate_fridge_balances(fridge_id, await ctx.members())
+            users_map = calculation["users_map"]
 
-        if user_id not in users_map:
-            raise HTTPException(status_code=404, detail="User not found in this fridge")
+            if user_id not in users_map:
+                raise HTTPException(status_code=404, detail="User not found in this fridge")
 
-        pair_totals = calculation["pair_totals"]
-
-        settlements_to_insert: List[dict] = []
-        timestamp = datetime.now(timezone.utc).isoformat()
-        for to_user_id, amount in pair_totals.get(user_id, {}).items():
-            amount = _round_currency(amount)
-            if amount <= AMOUNT_TOLERANCE:
-                continue
+            pair_totals = calculation["pair_totals"]
 
-            payload = {
-                "fridge_id": fridge_id,
-                "from_user_id": user_id,
-                "to_user_id": to_user_id,
-                "amount": amount,
-                "cleared_at": timestamp,
-            }
+            settlements_to_insert: List[dict] = []
+            timestamp = datetime.now(timezone.utc).isoformat()
+            for to_user_id, cents in pair_totals.get(user_id, {}).items():
+                payload = {
+                    "fridge_id": fridge_id,
+                    "from_user_id": user_id,
+                    "to_user_id": to_user_id,
+                    "amount": _from_cents(cents),
+                    "cleared_at": timestamp,
+                }
 
-            settlements_to_insert.append(payload)
+                settlements_to_insert.append(payload)
 
-        for debtor_id, creditors in pair_totals.items():
-            if debtor_id == user_id:
-                continue
+            for debtor_id, creditors in pair_totals.items():
+                if debtor_id == user_id:
+                    continue
 
-            amount = creditors.get(user_id)
-            if amount:
-                amount = _round_currency(amount)
-                if amount > AMOUNT_TOLERANCE:
+                cents = creditors.get(user_id)
+                if cents:
                     payload = {
                         "fridge_id": fridge_id,
                         "from_user_id": debtor_id,
                         "to_user_id": user_id,
-                        "amount": amount,
+                        "amount": _from_cents(cents),
                         "cleared_at": timestamp,
                     }
 
                     settlements_to_insert.append(payload)
 
-        if not settlements_to_insert:
-            return {
-                "status": "success",
-                "message": "Balance is already paid for this user.",
-                "balances": calculation["balances"],
-                "cleared_user_id": user_id,
-            }
-
-        try:
-            supabase.table(SETTLEMENT_TABLE).insert(settlements_to_insert).execute()
-        except Exception as exc:
-            raise HTTPException(status_code=500, detail=f"Failed to record settlements: {exc}")
-
-        updated = _calculate_fridge_balances(fridge_id)
+            if not settlements_to_insert:
+                return {
+                    "status": "success",
+                    "message": "Balance is already paid for this user.",
+                    "balances": calculation["balances"],
+                    "cleared_user_id": user_id,
+                }
+
+            try:
+                insert_response = await async_supabase.table(SETTLEMENT_TABLE).insert(settlements_to_insert).execute()
+            except Exception as exc:
+                raise HTTPException(status_code=500, detail=f"Failed to record settlements: {exc}")
+
+            inserted = insert_response.data or []
+            ledger = calculation["ledger"]
+            if len(inserted) == len(settlements_to_insert):
+                # Apply the new rows to the state just computed instead of recomputing. They
+                # carry their ids, so the change log replaying them later is a no-op.
+                async with ledger.lock:
+                    for settlement in inserted:
+                        ledger.apply_settlement(settlement)
+                updated = _ledger_balances(ledger, users_map)
+            else:
+                updated = await _calculate_fridge_balances(fridge_id, await ctx.members())
+
+        await publish_fridge_event(fridge_id, "balances.cleared", {
+            "cleared_user_id": user_id,
+            "cleared_at": timestamp,
+            "balances": updated["balances"],
+        })
 
         return {
             "status": "success",
@@ -437,80 +765,145 @@ async def clear_user_balance(user_id: str, current_user=Depends(get_current_user
         print(f"Error clearing balance for user {user_id}: {exc}")
         import traceback
         traceback.print_exc()
-    raise HTTPException(status_code=500, detail=f"Failed to mark balance as paid: {exc}")
+        raise HTTPException(status_code=500, detail=f"Failed to mark balance as paid: {exc}")
+
+
+def _build_balance_breakdown(calculation: Dict[str, Any]) -> List[dict]:
+    """Per-user balances with the simplified settlement plan, highest balance first."""
+    balances_map = calculation["balances_map"]
+    users_map = calculation["users_map"]
+
+    if not users_map:
+        return []
+
+    # Use the simplified debt algorithm to minimize transactions
+    simplified_transactions = _simplify_debts(balances_map, users_map)
+    
+    # Build response with simplified breakdown for each user
+    balance_list = []
+    for user_id, user_data in users_map.items():
+        balance_value = balances_map.get(user_id, 0)
+        
+        # Build breakdown list from simplified transactions only
+        breakdown = []
+        
+        for transaction in simplified_transactions:
+            if transaction["from_user_id"] == user_id:
+                # This user needs to pay someone
+                breakdown.append({
+                    "type": "owes",
+                    "user_id": transaction["to_user_id"],
+                    "email": transaction["to_user"]["email"],
+                    "first_name": transaction["to_user"].get("first_name"),
+                    "last_name": transaction["to_user"].get("last_name"),
+                    "amount": transaction["amount"]
+                })
+            elif transaction["to_user_id"] == user_id:
+                # Someone needs to pay this user
+                breakdown.append({
+                    "type": "owed_by",
+                    "user_id": transaction["from_user_id"],
+                    "email": transaction["from_user"]["email"],
+                    "first_name": transaction["from_user"].get("first_name"),
+                    "last_name": transaction["from_user"].get("last_name"),
+                    "amount": transaction["amount"]
+                })
+        
+        # Sort breakdown: owed_by first (what they're owed), then owes (what they owe)
+        breakdown.sort(key=lambda x: (x["type"] == "owes", x["amount"]), reverse=False)
+        
+        balance_list.append({
+            "user_id": user_id,
+            "email": user_data.get("email"),
+            "first_name": user_data.get("first_name"),
+            "last_name": user_data.get("last_name"),
+            "profile_photo": user_data.get("profile_photo"),
+            "balance": _from_cents(balance_value),
+            "breakdown": breakdown
+        })
+    
+    # Sort by balance (highest to lowest)
+    balance_list.sort(key=lambda x: x["balance"], reverse=True)
+    return balance_list
+
+
+_balance_cache = TTLCache(maxsize=BALANCE_CACHE_SIZE, ttl=BALANCE_CACHE_TTL)
+
+
+async def _balance_version(fridge_id: str) -> Optional[int]:
+    try:
+        response = await async_supabase.table("fridges").select("balance_version").eq("id", fridge_id).execute()
+    except Exception as exc:
+        print(f"Warning: fridge balance version unavailable, balances will not be cached: {exc}")
+        return None
+    return response.data[0].get("balance_version") if response.data else None
+
+
+def _cached_balance_breakdown(fridge_id: str, version: Optional[int]) -> Optional[List[dict]]:
+    if version is None:
+        return None
+    return _balance_cache.get((str(fridge_id), version))
+
+
+async def get_balance_breakdown(
+    fridge_id: str,
+    members: Optional[List[dict]] = None,
+    version: Optional[int] = None,
+) -> List[dict]:
+    """
+    Balances and settlement plan for a fridge, as served by GET /balances.
+
+    Results are cached per fridges.balance_version, which triggers bump on
+    every item, settlement and membership write. Pass `version` when the
+    fridge row is already loaded, and `members` only if they were read after
+    that row; otherwise they are loaded here, after the version, so a result
+    is never cached under a version newer than its member list. The
+    returned list is shared between requests and must not be modified.
+    """
+    if version is None:
+        version = await _balance_version(fridge_id)
+    cached = _cached_balance_breakdown(fridge_id, version)
+    if cached is not None:
+        return cached
+
+    # The version was read before the ledger, so a concurrent write can only
+    # make this result newer than its key, never older
+    calculation = await _calculate_fridge_balances(fridge_id, members)
+    balance_list = _build_balance_breakdown(calculation)
+    if version is not None:
+        _balance_cache.set((str(fridge_id), version), balance_list)
+    return balance_list
+
+
 @app.get("/balances")
-async def get_fridge_balances(current_user=Depends(get_current_user)):
+async def get_fridge_balances(as_of: Optional[str] = None, ctx: RequestContext = Depends(get_request_context)):
     """
     Calculate the balance for each user in the fridge with simplified settlement plan.
     
     Returns minimized transactions using greedy debt simplification algorithm.
+    With `as_of` (ISO 8601), returns the balances as they stood at that time.
     """
     try:
-        fridge_id = current_user.get("fridge_id") if isinstance(current_user, dict) else None
+        fridge_id = ctx.fridge_id
         
         if not fridge_id:
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
 
-        # Use the helper function to get accurate balances with settlements applied
-        calculation = _calculate_fridge_balances(fridge_id)
-        balances_map = calculation["balances_map"]
-        users_map = calculation["users_map"]
-        
-        if not users_map:
+        if as_of:
+            as_of_at = _parse_as_of(as_of)
             return {
                 "status": "success",
                 "fridge_id": fridge_id,
-                "balances": []
+                "as_of": _format_iso_datetime(as_of_at),
+                "balances": await _balances_as_of(ctx, as_of_at),
             }
-        
-        # Use the simplified debt algorithm to minimize transactions
-        simplified_transactions = _simplify_debts(balances_map, users_map)
-        
-        # Build response with simplified breakdown for each user
-        balance_list = []
-        for user_id, user_data in users_map.items():
-            balance_value = balances_map.get(user_id, 0.0)
-            
-            # Build breakdown list from simplified transactions only
-            breakdown = []
-            
-            for transaction in simplified_transactions:
-                if transaction["from_user_id"] == user_id:
-                    # This user needs to pay someone
-                    breakdown.append({
-                        "type": "owes",
-                        "user_id": transaction["to_user_id"],
-                        "email": transaction["to_user"]["email"],
-                        "first_name": transaction["to_user"].get("first_name"),
-                        "last_name": transaction["to_user"].get("last_name"),
-                        "amount": transaction["amount"]
-                    })
-                elif transaction["to_user_id"] == user_id:
-                    # Someone needs to pay this user
-                    breakdown.append({
-                        "type": "owed_by",
-                        "user_id": transaction["from_user_id"],
-                        "email": transaction["from_user"]["email"],
-                        "first_name": transaction["from_user"].get("first_name"),
-                        "last_name": transaction["from_user"].get("last_name"),
-                        "amount": transaction["amount"]
-                    })
-            
-            # Sort breakdown: owed_by first (what they're owed), then owes (what they owe)
-            breakdown.sort(key=lambda x: (x["type"] == "owes", x["amount"]), reverse=False)
-            
-            balance_list.append({
-                "user_id": user_id,
-                "email": user_data.get("email"),
-                "first_name": user_data.get("first_name"),
-                "last_name": user_data.get("last_name"),
-                "profile_photo": user_data.get("profile_photo"),
-                "balance": round(balance_value, 2),
-                "breakdown": breakdown
-            })
-        
-        # Sort by balance (highest to lowest)
-        balance_list.sort(key=lambda x: x["balance"], reverse=True)
+
+        # An unchanged fridge is answered from the version cache without loading members
+        fridge = await ctx.fridge()
+        version = fridge.get("balance_version") if fridge else None
+        balance_list = _cached_balance_breakdown(fridge_id, version)
+        if balance_list is None:
+            balance_list = await get_balance_breakdown(fridge_id, await ctx.members(), version)
         
         return {
             "status": "success",
@@ -524,4 +917,554 @@ async def get_fridge_balances(current_user=Depends(get_current_user)):
         print(f"Error calculating balances: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to calculate balances: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to calculate balances: {str(e)}")
+
+# Events without a timestamp have always applied
+_BEGINNING_OF_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+class BalanceTimeline:
+    """
+    Every contribution and settlement of a fridge in time order, for
+    point-in-time balances.
+
+    An item contributes its shares at created_at and a settlement counts at
+    cleared_at, including settlements folded into checkpoints (their rows are
+    kept). Splits use the current members and item rows, so deleted items are
+    absent from the past too. State is snapshotted every
+    BALANCE_HISTORY_SNAPSHOT_EVERY events; pair_totals_at() bisects to the
+    nearest snapshot and replays only the events after it.
+
+    Like FridgeLedger, the timeline follows the fridge_changes log: apply_rows()
+    swaps a changed row's events in place and recomputes only the snapshots
+    after the earliest event it moved, so a new item costs a few snapshots
+    rather than a reload of the fridge.
+    """
+
+    def __init__(self, items: List[dict], settlements: List[dict], member_ids: List[str]):
+        # Same member order as FridgeLedger, so odd cents land on the same sharers
+        self.member_ids = tuple(sorted(member_ids))
+        # Last fridge_changes id reflected, None when there is no log to follow
+        self.cursor: Optional[int] = None
+        # fridges.balance_version the timeline is known to be at least as new as
+        self.version: Optional[int] = None
+        self.lock = asyncio.Lock()
+        # (collection, row id) -> that row's events, so a change can take them out again
+        self._row_events: Dict[Tuple[str, str], List[Tuple[datetime, bool, str, str, int]]] = {}
+        for item in items:
+            self._row_events[("fridge_items", FridgeLedger._item_key(item))] = self._item_events(item)
+        for settlement in settlements:
+            self._row_events[(SETTLEMENT_TABLE, str(settlement.get("id")))] = self._settlement_events(settlement)
+
+        # (at, is_settlement, debtor_id, creditor_id, cents)
+        events = [event for row_events in self._row_events.values() for event in row_events]
+        events.sort(key=lambda event: event[0])
+        self.events = events
+        self.times = [event[0] for event in events]
+        # snapshots[k] is the state after the first k * BALANCE_HISTORY_SNAPSHOT_EVERY events
+        self.snapshots: List[Tuple[Dict[Tuple[str, str], int], Dict[Tuple[str, str], int]]] = []
+        self._snapshot_from(0)
+
+    def _item_events(self, item: dict) -> List[Tuple[datetime, bool, str, str, int]]:
+        at = _parse_iso_datetime(item.get("created_at")) or _BEGINNING_OF_TIME
+        return [
+            (at, False, debtor_id, creditor_id, cents)
+            for debtor_id, creditor_id, cents in _item_shares(item, list(self.member_ids))
+        ]
+
+    @staticmethod
+    def _settlement_events(settlement: dict) -> List[Tuple[datetime, bool, str, str, int]]:
+        cents = max(0, _to_cents(settlement.get("amount") or 0))
+        at = _parse_iso_datetime(settlement.get("cleared_at") or settlement.get("created_at")) or _BEGINNING_OF_TIME
+        return [(at, True, settlement.get("from_user_id"), settlement.get("to_user_id"), cents)]
+
+    def _snapshot_from(self, position: int) -> None:
+        """Recompute the snapshots after `position`, the first event that changed."""
+        keep = min(position // BALANCE_HISTORY_SNAPSHOT_EVERY + 1, len(self.snapshots))
+        del self.snapshots[keep:]
+        if keep:
+            contributed, settled = (dict(state) for state in self.snapshots[-1])
+        else:
+            contributed, settled = {}, {}
+        for index in range(max(keep - 1, 0) * BALANCE_HISTORY_SNAPSHOT_EVERY, len(self.events)):
+            if index % BALANCE_HISTORY_SNAPSHOT_EVERY == 0 and index // BALANCE_HISTORY_SNAPSHOT_EVERY >= keep:
+                self.snapshots.append((dict(contributed), dict(settled)))
+            self._apply(self.events[index], contributed, settled)
+
+    def apply_rows(self, changed: Dict[Tuple[str, str], Optional[dict]]) -> None:
+        """
+        Replace the events of changed rows, keyed (collection, row id). A None
+        row was deleted or left the fridge.
+        """
+        first_changed = len(self.events)
+        for key, row in changed.items():
+            for event in self._row_events.pop(key, ()):
+                position = bisect.bisect_left(self.times, event[0])
+                position = self.events.index(event, position)
+                del self.events[position]
+                del self.times[position]
+                first_changed = min(first_changed, position)
+            if row is None:
+                continue
+            if key[0] == "fridge_items":
+                row_events = self._item_events(row)
+            else:
+                row_events = self._settlement_events(row)
+            self._row_events[key] = row_events
+            for event in row_events:
+                position = bisect.bisect_right(self.times, event[0])
+                self.events.insert(position, event)
+                self.times.insert(position, event[0])
+                first_changed = min(first_changed, position)
+        self._snapshot_from(first_changed)
+
+    @staticmethod
+    def _apply(event, contributed: Dict[Tuple[str, str], int], settled: Dict[Tuple[str, str], int]) -> None:
+        _, is_settlement, debtor_id, creditor_id, cents = event
+        target = settled if is_settlement else contributed
+        target[(debtor_id, creditor_id)] = target.get((debtor_id, creditor_id), 0) + cents
+
+    @staticmethod
+    def _pair_totals(contributed, settled) -> Dict[str, Dict[str, int]]:
+        pair_totals: Dict[str, Dict[str, int]] = {}
+        for (debtor_id, creditor_id), cents in contributed.items():
+            remaining = cents - settled.get((debtor_id, creditor_id), 0)
+            if remaining > 0:
+                pair_totals.setdefault(debtor_id, {})[creditor_id] = remaining
+        return pair_totals
+
+    def pair_totals_at(self, as_of: datetime) -> Dict[str, Dict[str, int]]:
+        """Cents each debtor owed each creditor at `as_of`."""
+        end = bisect.bisect_right(self.times, as_of)
+        if not self.snapshots:
+            return {}
+        snapshot_index = min(end // BALANCE_HISTORY_SNAPSHOT_EVERY, len(self.snapshots) - 1)
+        contributed, settled = (dict(state) for state in self.snapshots[snapshot_index])
+        for event in self.events[snapshot_index * BALANCE_HISTORY_SNAPSHOT_EVERY:end]:
+            self._apply(event, contributed, settled)
+        return self._pair_totals(contributed, settled)
+
+    def net_series(self, points: List[datetime]) -> List[Dict[str, int]]:
+        """Net cents per member at each of the ascending `points`, in one pass over the events."""
+        contributed: Dict[Tuple[str, str], int] = {}
+        settled: Dict[Tuple[str, str], int] = {}
+        series = []
+        position = 0
+        for point in points:
+            end = max(position, bisect.bisect_right(self.times, point))
+            for event in self.events[position:end]:
+                self._apply(event, contributed, settled)
+            position = end
+            series.append(_net_balances(self._pair_totals(contributed, settled)))
+        return series
+
+    def first_event_at(self) -> Optional[datetime]:
+        for at in self.times:
+            if at != _BEGINNING_OF_TIME:
+                return at
+        return None
+
+
+_timelines = TTLCache(maxsize=BALANCE_HISTORY_CACHE_SIZE, ttl=BALANCE_CACHE_TTL)
+
+
+async def _load_balance_timeline(fridge_id: str, member_ids: List[str]) -> BalanceTimeline:
+    # Cursor first, as in FridgeLedger.rebuild(): changes landing during the
+    # reads are applied again by the next catch-up, which is idempotent
+    cursor = await _latest_change_id(fridge_id)
+    items, settlements = await asyncio.gather(
+        fetch_all(lambda: async_supabase.table("fridge_items").select(
+            "id, price, added_by, shared_by, created_at"
+        ).eq("fridge_id", fridge_id)),
+        fetch_all(lambda: async_supabase.table(SETTLEMENT_TABLE).select(SETTLEMENT_FIELDS).eq("fridge_id", fridge_id)),
+    )
+    timeline = BalanceTimeline(items, settlements, member_ids)
+    timeline.cursor = cursor
+    return timeline
+
+
+async def _catch_up_timeline(timeline: BalanceTimeline, fridge_id: str) -> bool:
+    """Apply the fridge's changes since the timeline's cursor; False when it must be reloaded."""
+    if timeline.cursor is None:
+        return False
+
+    changes_response = await async_supabase.table(CHANGES_TABLE).select(
+        "id, collection, row_id, op"
+    ).eq("fridge_id", fridge_id).gt("id", timeline.cursor).order("id").limit(LEDGER_MAX_CATCH_UP + 1).execute()
+    changes = changes_response.data or []
+    if not changes:
+        return True
+    # Membership changes alter every split. Checkpoints do not matter here:
+    # folded settlement rows stay in place and the timeline reads them all.
+    if len(changes) > LEDGER_MAX_CATCH_UP or any(change["collection"] == "fridge_memberships" for change in changes):
+        return False
+
+    latest_ops: Dict[str, Dict[str, str]] = {"fridge_items": {}, SETTLEMENT_TABLE: {}}
+    for change in changes:
+        if change["collection"] in latest_ops and change.get("row_id") is not None:
+            latest_ops[change["collection"]][change["row_id"]] = change["op"]
+
+    item_ids = [row_id for row_id, op in latest_ops["fridge_items"].items() if op == "upsert"]
+    settlement_ids = [row_id for row_id, op in latest_ops[SETTLEMENT_TABLE].items() if op == "upsert"]
+
+    items: List[dict] = []
+    if item_ids:
+        items_response = await async_supabase.table("fridge_items").select(
+            "id, price, added_by, shared_by, created_at"
+        ).eq("fridge_id", fridge_id).in_("id", item_ids).execute()
+        items = items_response.data or []
+
+    settlements: List[dict] = []
+    if settlement_ids:
+        settlements_response = await async_supabase.table(SETTLEMENT_TABLE).select(SETTLEMENT_FIELDS).eq(
+            "fridge_id", fridge_id
+        ).in_("id", settlement_ids).execute()
+        settlements = settlements_response.data or []
+
+    # Deleted rows, and rows that have since left the fridge, lose their events
+    changed: Dict[Tuple[str, str], Optional[dict]] = {
+        (collection, str(row_id)): None for collection, ops in latest_ops.items() for row_id in ops
+    }
+    for item in items:
+        changed[("fridge_items", FridgeLedger._item_key(item))] = item
+    for settlement in settlements:
+        changed[(SETTLEMENT_TABLE, str(settlement.get("id")))] = settlement
+    timeline.apply_rows(changed)
+    timeline.cursor = changes[-1]["id"]
+    return True
+
+
+async def get_balance_timeline(fridge_id: str, member_ids: List[str], version: Optional[int] = None) -> BalanceTimeline:
+    """
+    The fridge's timeline, kept per fridge and brought up to date with the
+    change log. An unchanged balance_version is served without any query.
+    """
+    fridge_id = str(fridge_id)
+    member_ids = tuple(sorted(member_ids))
+    if version is None:
+        version = await _balance_version(fridge_id)
+
+    timeline = _timelines.get(fridge_id)
+    if timeline is not None and timeline.member_ids == member_ids:
+        if version is not None and timeline.version == version:
+            return timeline
+        async with timeline.lock:
+            if version is None or timeline.version != version:
+                if not await _catch_up_timeline(timeline, fridge_id):
+                    timeline = None
+    else:
+        timeline = None
+
+    if timeline is None:
+        timeline = await _load_balance_timeline(fridge_id, list(member_ids))
+        _timelines.set(fridge_id, timeline)
+    # The version was read before the catch-up, so the timeline is at least this new
+    timeline.version = version
+    return timeline
+
+
+def _parse_as_of(value: str, name: str = "as_of") -> datetime:
+    parsed = _parse_iso_datetime(value)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp '{value}'. Use ISO 8601.")
+    return parsed
+
+
+async def _balances_as_of(ctx: RequestContext, as_of: datetime) -> List[dict]:
+    fridge = await ctx.fridge()
+    users_map = {member["id"]: member for member in await ctx.members()}
+    if not users_map:
+        return []
+
+    timeline = await get_balance_timeline(
+        ctx.fridge_id, sorted(users_map), fridge.get("balance_version") if fridge else None
+    )
+    return _build_balance_breakdown({
+        "users_map": users_map,
+        "balances_map": _net_balances(timeline.pair_totals_at(as_of)),
+    })
+
+
+@app.get("/balances/history")
+async def get_balance_history(
+    user_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: int = Query(30, ge=2, le=BALANCE_HISTORY_MAX_POINTS),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """
+    A member's net balance at `points` evenly spaced times between `start`
+    (default: the fridge's first item or settlement) and `end` (default: now).
+    """
+    try:
+        fridge_id = ctx.fridge_id
+
+        if not fridge_id:
+            raise HTTPException(status_code=403, detail="User has no fridge assigned")
+
+        user_id = user_id or ctx.user_id
+        if not await ctx.is_member(user_id):
+            raise HTTPException(status_code=404, detail="User not found in this fridge")
+
+        fridge = await ctx.fridge()
+        timeline = await get_balance_timeline(
+            fridge_id, sorted(await ctx.users_map()), fridge.get("balance_version") if fridge else None
+        )
+
+        end_at = _parse_as_of(end, "end") if end else datetime.now(timezone.utc)
+        start_at = _parse_as_of(start, "start") if start else (timeline.first_event_at() or end_at)
+        if start_at > end_at:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+
+        step = (end_at - start_at) / (points - 1)
+        times = [start_at + step * index for index in range(points)]
+        series = timeline.net_series(times)
+
+        return {
+            "status": "success",
+            "fridge_id": fridge_id,
+            "user_id": user_id,
+            "history": [
+                {"at": _format_iso_datetime(at), "balance": _from_cents(balances.get(user_id, 0))}
+                for at, balances in zip(times, series)
+            ],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error calculating balance history: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to calculate balance history: {str(e)}")
+
+
+def _net_counterparties(user_id: str, fridge_results: List[dict]) -> List[dict]:
+    """
+    The user's settlement plan across fridges: per counterparty, what the
+    user owes in some fridges minus what they are owed in others.
+    """
+    net_cents: Dict[str, int] = {}
+    people: Dict[str, dict] = {}
+    fridges_by_user: Dict[str, List[str]] = defaultdict(list)
+    for result in fridge_results:
+        entry = next((balance for balance in result["balances"] if balance["user_id"] == user_id), None)
+        if entry is None:
+            continue
+        for line in entry["breakdown"]:
+            cents = _to_cents(line["amount"])
+            counterparty_id = line["user_id"]
+            net_cents[counterparty_id] = net_cents.get(counterparty_id, 0) + (
+                -cents if line["type"] == "owes" else cents
+            )
+            people.setdefault(counterparty_id, line)
+            if result["fridge_id"] not in fridges_by_user[counterparty_id]:
+                fridges_by_user[counterparty_id].append(result["fridge_id"])
+
+    settlements = []
+    for counterparty_id, cents in net_cents.items():
+        if not cents:
+            continue
+        person = people[counterparty_id]
+        settlements.append({
+            "type": "owed_by" if cents > 0 else "owes",
+            "user_id": counterparty_id,
+            "email": person.get("email"),
+            "first_name": person.get("first_name"),
+            "last_name": person.get("last_name"),
+            "amount": _from_cents(abs(cents)),
+            "fridge_ids": fridges_by_user[counterparty_id],
+        })
+    settlements.sort(key=lambda x: (x["type"] == "owes", -x["amount"]))
+    return settlements
+
+
+@app.get("/balances/all")
+async def get_all_fridge_balances(ctx: RequestContext = Depends(get_request_context)):
+    """
+    Balances for every fridge the user belongs to, computed concurrently,
+    plus the user's settlement plan netted across those fridges.
+
+    Fridges whose balance_version has not moved are served from the same
+    cache as GET /balances.
+    """
+    try:
+        user_id = ctx.user_id
+
+        fridge_ids = await ctx.fridges()
+
+        if not fridge_ids:
+            return {
+                "status": "success",
+                "user_id": user_id,
+                "total_balance": 0.0,
+                "fridges": [],
+                "settlements": [],
+            }
+
+        fridges_response = await async_supabase.table("fridges").select(
+            "id, name, balance_version"
+        ).in_("id", fridge_ids).execute()
+        fridges = fridges_response.data or []
+
+        async def fridge_balances(fridge: dict) -> List[dict]:
+            version = fridge.get("balance_version")
+            cached = _cached_balance_breakdown(fridge["id"], version)
+            if cached is not None:
+                return cached
+            return await get_balance_breakdown(fridge["id"], version=version)
+
+        outcomes = await asyncio.gather(*(fridge_balances(fridge) for fridge in fridges), return_exceptions=True)
+
+        fridge_results = []
+        failed = []
+        total_cents = 0
+        for fridge, outcome in zip(fridges, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"Error calculating balances for fridge {fridge['id']}: {outcome}")
+                failed.append({"fridge_id": fridge["id"], "name": fridge.get("name"), "error": str(outcome)})
+                continue
+
+            own = next((balance for balance in outcome if balance["user_id"] == user_id), None)
+            balance = own["balance"] if own else 0.0
+            total_cents += _to_cents(balance)
+            fridge_results.append({
+                "fridge_id": fridge["id"],
+                "name": fridge.get("name"),
+                "balance": balance,
+                "balances": outcome,
+            })
+
+        return {
+            "status": "partial" if failed else "success",
+            "user_id": user_id,
+            "total_balance": _from_cents(total_cents),
+            "fridges": fridge_results,
+            "failed": failed,
+            "settlements": _net_counterparties(user_id, fridge_results),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error calculating balances across fridges: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to calculate balances: {str(e)}")
+
+
+async def _verify_checkpoint(fridge_id: str, checkpoint_id: int) -> Tuple[bool, int]:
+    """
+    Replay the fridge's settlements with and without `checkpoint_id` from one
+    paged read of the table. Items are the same on both sides, so equal
+    settled totals and clear times mean equal balances.
+    """
+    # Paged: compaction targets exactly the fridges with more rows than max_rows
+    settlements = await fetch_all(lambda: async_supabase.table(SETTLEMENT_TABLE).select(
+        f"{SETTLEMENT_FIELDS}, checkpoint_id"
+    ).eq("fridge_id", fridge_id))
+    pairs_response = await async_supabase.table(CHECKPOINT_PAIRS_TABLE).select(
+        "from_user_id, to_user_id, amount_cents, last_cleared_at"
+    ).eq("checkpoint_id", checkpoint_id).execute()
+
+    replayed = FridgeLedger(fridge_id, ())
+    compacted = FridgeLedger(fridge_id, ())
+    folded = 0
+    for settlement in settlements:
+        replayed.apply_settlement(settlement)
+        settlement_checkpoint = settlement.get("checkpoint_id")
+        if settlement_checkpoint is None or settlement_checkpoint > checkpoint_id:
+            compacted.apply_settlement(settlement)
+        elif settlement_checkpoint == checkpoint_id:
+            folded += 1
+    for pair in pairs_response.data or []:
+        compacted.apply_checkpoint_pair(pair)
+
+    identical = (
+        replayed.settled_totals() == compacted.settled_totals()
+        and replayed.latest_clears() == compacted.latest_clears()
+    )
+    return identical, folded
+
+
+async def compact_fridge_settlements(fridge_id: str) -> Dict[str, Any]:
+    """
+    Fold a fridge's old settlements into a new checkpoint.
+
+    The checkpoint is written in one transaction by the
+    compact_cost_balance_settlements function and then checked against a
+    full replay; one that would change balances is reverted.
+    """
+    folded_before = datetime.now(timezone.utc) - timedelta(days=BALANCE_COMPACTION_MIN_AGE_DAYS)
+    response = await async_supabase.rpc("compact_cost_balance_settlements", {
+        "p_fridge_id": str(fridge_id),
+        "p_before": folded_before.isoformat(),
+        "p_min_settlements": BALANCE_COMPACTION_MIN_SETTLEMENTS,
+    }).execute()
+    checkpoint_id = response.data
+    if not checkpoint_id:
+        return {"fridge_id": fridge_id, "status": "skipped", "checkpoint_id": None, "folded": 0}
+
+    identical, folded = await _verify_checkpoint(str(fridge_id), checkpoint_id)
+    if not identical:
+        print(f"ERROR: Checkpoint {checkpoint_id} would change balances for fridge {fridge_id}, reverting it")
+        await async_supabase.rpc("revert_cost_balance_checkpoint", {"p_checkpoint_id": checkpoint_id}).execute()
+        return {"fridge_id": fridge_id, "status": "reverted", "checkpoint_id": checkpoint_id, "folded": 0}
+
+    print(f"DEBUG: Folded {folded} settlements of fridge {fridge_id} into checkpoint {checkpoint_id}")
+    return {"fridge_id": fridge_id, "status": "compacted", "checkpoint_id": checkpoint_id, "folded": folded}
+
+
+async def compact_all_fridges() -> List[Dict[str, Any]]:
+    """One compaction pass over up to BALANCE_COMPACTION_BATCH eligible fridges."""
+    folded_before = datetime.now(timezone.utc) - timedelta(days=BALANCE_COMPACTION_MIN_AGE_DAYS)
+    candidates_response = await async_supabase.rpc("cost_balance_compaction_candidates", {
+        "p_before": folded_before.isoformat(),
+        "p_min_settlements": BALANCE_COMPACTION_MIN_SETTLEMENTS,
+        "p_limit": BALANCE_COMPACTION_BATCH,
+    }).execute()
+
+    results = []
+    for row in candidates_response.data or []:
+        try:
+            results.append(await compact_fridge_settlements(row["fridge_id"]))
+        except Exception as exc:
+            print(f"Warning: compaction failed for fridge {row.get('fridge_id')}: {exc}")
+    return results
+
+
+async def run_balance_compaction() -> None:
+    """Background loop started at startup when BALANCE_COMPACTION_INTERVAL > 0."""
+    while True:
+        await asyncio.sleep(BALANCE_COMPACTION_INTERVAL)
+        try:
+            await compact_all_fridges()
+        except Exception as exc:
+            print(f"Warning: balance compaction pass failed: {exc}")
+
+
+@app.post("/balances/compact")
+async def compact_fridge_balances(ctx: RequestContext = Depends(get_request_context)):
+    """
+    Fold the active fridge's old settlements into a checkpoint now.
+
+    Balances are unchanged; later balance rebuilds start from the checkpoint
+    instead of replaying every settlement.
+    """
+    try:
+        fridge_id = ctx.fridge_id
+
+        if not fridge_id:
+            raise HTTPException(status_code=403, detail="User has no fridge assigned")
+
+        result = await compact_fridge_settlements(fridge_id)
+        return {"status": "success", "data": result}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error compacting settlements: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to compact settlements: {str(e)}")
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from database import supabase  
+from database import async_supabase
+from membership import membership_index, notify_membership_changed
 from pydantic import BaseModel
-from service import get_current_user
+from service import get_current_user, invalidate_user_profile
 
 
 app = APIRouter()
@@ -10,10 +11,10 @@ class JoinRequest(BaseModel):
     fridgeCode: str
 
 @app.post("/join-fridge")
-def join_fridge(request: JoinRequest):
+async def join_fridge(request: JoinRequest):
     code_to_check = request.fridgeCode
 
-    response = supabase.table("fridge_invitations").select("*, fridge(name)").eq("invite_code", code_to_check).execute()
+    response = await async_supabase.table("fridge_invitations").select("*, fridge(name)").eq("invite_code", code_to_check).execute()
         
     if not response.data:
             raise HTTPException(status_code=404, detail="Invalid fridge code. Please try again.")
@@ -27,7 +28,7 @@ class LeaveRequest(BaseModel):
     userId: str
 
 @app.post("/leave-fridge")
-def leave_fridge(request: LeaveRequest, current_user = Depends(get_current_user)):
+async def leave_fridge(request: LeaveRequest, current_user = Depends(get_current_user)):
     fridge_id = request.fridgeId
     user_id = request.userId
     
@@ -35,26 +36,29 @@ def leave_fridge(request: LeaveRequest, current_user = Depends(get_current_user)
         raise HTTPException(status_code=403, detail="You can only leave your own fridges")
 
     try:
-        delete_response = supabase.table("fridge_memberships").delete().eq(
+        delete_response = await async_supabase.table("fridge_memberships").delete().eq(
             "user_id", user_id
         ).eq("fridge_id", fridge_id).execute()
         
         if not delete_response.data:
             return {"status": "error", "message": "You are not a member of this fridge"}
         
-        user_response = supabase.table("users").select("active_fridge_id").eq("id", user_id).execute()
+        await notify_membership_changed(fridge_id, user_id)
+        
+        user_response = await async_supabase.table("users").select("active_fridge_id").eq("id", user_id).execute()
         
         if user_response.data and user_response.data[0].get("active_fridge_id") == fridge_id:
             # Get remaining fridges
-            remaining = supabase.table("fridge_memberships").select("fridge_id").eq("user_id", user_id).execute()
+            remaining = await membership_index.fridges_of(user_id)
             
-            if remaining.data and len(remaining.data) > 0:
+            if remaining:
                 # Set to first remaining fridge
-                new_active = remaining.data[0]["fridge_id"]
-                supabase.table("users").update({"active_fridge_id": new_active}).eq("id", user_id).execute()
+                new_active = remaining[0]
+                await async_supabase.table("users").update({"active_fridge_id": new_active}).eq("id", user_id).execute()
             else:
                 # No fridges left, set to null
-                supabase.table("users").update({"active_fridge_id": None}).eq("id", user_id).execute()
+                await async_supabase.table("users").update({"active_fridge_id": None}).eq("id", user_id).execute()
+            invalidate_user_profile(user_id)
         
         return {"status": "success", "message": "Successfully left fridge"}
         
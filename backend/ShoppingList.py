@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query
 from uuid import uuid4
 from typing import Optional
-from database import supabase
+from database import async_supabase
+from events import publish_fridge_event
 from pydantic import BaseModel
 
 app = APIRouter()
@@ -17,13 +18,13 @@ class ShoppingItem(BaseModel):
 
 # Add item to shopping list
 @app.post("/items/")
-def add_item(item: ShoppingItem):
+async def add_item(item: ShoppingItem):
 
     if not item.fridge_id:
         item.fridge_id = str(uuid4())
 
     response = (
-    supabase.table("shopping_list")
+    await async_supabase.table("shopping_list")
     .insert({
         "name": item.name,
         "quantity": item.quantity,
@@ -38,16 +39,18 @@ def add_item(item: ShoppingItem):
     print("Supabase insert response:", response)
     
     if not response.data:
-        raise HTTPException(status_code=400, detail=f"Supabase error: {response.error.message}")
+        raise HTTPException(status_code=400, detail="Supabase error: insert returned no row")
+
+    await publish_fridge_event(item.fridge_id, "shopping_list.created", response.data)
 
     return {"data": response.data, "status": "Item added successfully"}
 
 
 # Get shopping list items
 @app.get("/items/")
-def get_items(fridge_id: str = Query(...)):
+async def get_items(fridge_id: str = Query(...)):
     response = (
-        supabase.table("shopping_list")
+        await async_supabase.table("shopping_list")
         .select("*")
         .eq("fridge_id", fridge_id)
         .execute()
@@ -57,10 +60,10 @@ def get_items(fridge_id: str = Query(...)):
 
 # Update an existing item
 @app.put("/items/{item_id}")
-def update_item(item_id: str, item: ShoppingItem):
+async def update_item(item_id: str, item: ShoppingItem):
   
     response = (
-        supabase.table("shopping_list")
+        await async_supabase.table("shopping_list")
         .update({
             "name": item.name,
             "quantity": item.quantity,
@@ -73,25 +76,31 @@ def update_item(item_id: str, item: ShoppingItem):
         .eq("id", item_id)
         .execute()
     )
+    for row in response.data or []:
+        await publish_fridge_event(row.get("fridge_id"), "shopping_list.updated", [row])
     return {"data": response.data, "status": "Item updated successfully"}
 
 
 # Delete shopping list item by item_id
 @app.delete("/{item_id}")
-def delete_item(item_id: str):
-    response = supabase.table("shopping_list").delete().eq("id", item_id).execute()
+async def delete_item(item_id: str):
+    response = await async_supabase.table("shopping_list").delete().eq("id", item_id).execute()
+    for row in response.data or []:
+        await publish_fridge_event(row.get("fridge_id"), "shopping_list.deleted", [row])
     return {"data": response.data, "status": "Item deleted successfully"}
 
 # Delete shopping list item by name
 @app.delete("/remove_by_name")
-def remove_item_by_name(name: str, fridge_id: str):
+async def remove_item_by_name(name: str, fridge_id: str):
     response = (
-        supabase.table("shopping_list")
+        await async_supabase.table("shopping_list")
         .delete()
         .ilike("name", name)
         .eq("fridge_id", fridge_id)
         .execute()
     )
+    if response.data:
+        await publish_fridge_event(fridge_id, "shopping_list.deleted", response.data)
     return {
         "status": "success",
         "deleted": len(response.data),
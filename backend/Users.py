@@ -1,8 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
-from database import supabase
+from fastapi import APIRouter, HTTPException, Depends, Query
+from database import supabase, async_supabase, run_concurrently
+from listing import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, parse_fields, list_page, stream_table
+from membership import membership_index, is_fridge_member
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Union, Dict, Any
-from service import get_current_user, generate_invite_code, get_current_user_with_fridgeMates
+from service import (
+    get_current_user,
+    get_admin_user,
+    generate_invite_code,
+    get_request_context,
+    invalidate_user_profile,
+    RequestContext,
+)
+import asyncio
 import ast
 import base64
 import uuid
@@ -11,12 +22,29 @@ from typing import List, Optional, Union
 app = APIRouter()
 #TEMPLATE to get started :)
 
+USER_LIST_FIELDS = ("id", "email", "first_name", "last_name", "profile_photo", "fridge_id", "active_fridge_id")
+
 @app.get("/")
-def get_users():
-    
+async def get_users(
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    admin = Depends(get_admin_user),
+):
+    """
+    Users ordered by id, one page at a time; stream=true exports them all (see listing.py).
+    Lists every user's email, so admins only (ADMIN_USER_IDS).
+    """
     try:
-        response = response = supabase.table("users").select("*").execute()
-        return {"data": response.data, "error": None}
+        columns = parse_fields(fields, USER_LIST_FIELDS)
+        if stream:
+            return stream_table("users", columns)
+
+        page = await list_page("users", columns, limit, cursor)
+        return {"data": page["data"], "next_cursor": page["next_cursor"], "error": None}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"data": None, "error": str(e)}
 
@@ -37,7 +65,9 @@ def findAccount(email: str):
 async def create_user(user: UserCreate):
     try:
         # Example of using the database session
-        supabase.auth.sign_up({
+        # Auth calls stay on the blocking client so sign-in state never leaks
+        # into the shared async data client; run them off the event loop.
+        await run_in_threadpool(supabase.auth.sign_up, {
             "email": user.email,
             "password": user.password,
             "options": {
@@ -58,7 +88,10 @@ async def create_user(user: UserCreate):
         return {"error": str(e)}
 
 @app.get("/userInfo")
-async def get_current_user_info(current_user = Depends(get_current_user_with_fridgeMates)):
+async def get_current_user_info(
+    current_user = Depends(get_current_user),
+    ctx: RequestContext = Depends(get_request_context)
+):
 
     try:
         user_data = current_user if isinstance(current_user, dict) else {
@@ -68,27 +101,26 @@ async def get_current_user_info(current_user = Depends(get_current_user_with_fri
             "first_name": None,
             "last_name": None,
             "profile_photo": None,
-            "fridgeMates": []
         }
         
         print(f"DEBUG: /userInfo/ endpoint called for user {user_data.get('id')}")
         
-        fridge_count_response = supabase.table("fridge_memberships").select(
-            "fridge_id", count="exact"
-        ).eq("user_id", user_data["id"]).execute()
+        # Mates, fridge count and fridge row are independent, so fetch them together
+        fridge_mates, fridge_ids, fridge = await run_concurrently(
+            ctx.fridge_mates(),
+            ctx.fridges(),
+            ctx.fridge(),
+        )
         
-        fridge_count = fridge_count_response.count if fridge_count_response.count else 0
-        user_data["fridge_count"] = fridge_count
+        user_data["fridgeMates"] = fridge_mates if user_data.get("fridge_id") else []
+        user_data["fridge_count"] = len(fridge_ids)
         
         # Include active_fridge_id explicitly for frontend routing logic
         user_data["active_fridge_id"] = user_data.get("fridge_id")
         
         if user_data.get("fridge_id"):
-            print(f"DEBUG: Fetching details for fridge {user_data.get('fridge_id')}")
-            fridge_response = supabase.table("fridges").select("*").eq("id", user_data["fridge_id"]).execute()
-            
-            if fridge_response.data and len(fridge_response.data) > 0:
-                user_data["fridge"] = fridge_response.data[0]
+            if fridge:
+                user_data["fridge"] = fridge
             else:
                 print(f"DEBUG: Fridge {user_data.get('fridge_id')} not found")
                 user_data["fridge"] = None
@@ -106,10 +138,13 @@ async def get_current_user_info(current_user = Depends(get_current_user_with_fri
 
 
 @app.get("/fridge-members/")
-async def get_fridge_members(current_user = Depends(get_current_user)):
+async def get_fridge_members(
+    current_user = Depends(get_current_user),
+    ctx: RequestContext = Depends(get_request_context)
+):
     """Return members of the authenticated user's active fridge."""
     try:
-        fridge_id = current_user.get("fridge_id") if isinstance(current_user, dict) else None
+        fridge_id = ctx.fridge_id
 
         if not fridge_id:
             return {
@@ -118,33 +153,8 @@ async def get_fridge_members(current_user = Depends(get_current_user)):
                 "members": [],
             }
 
-        memberships_response = supabase.table("fridge_memberships").select(
-            "users(id, email, first_name, last_name, profile_photo)"
-        ).eq("fridge_id", fridge_id).execute()
-
-        if memberships_response.data is None:
-            raise HTTPException(status_code=500, detail="Failed to fetch fridge members")
-
-        members: List[Dict[str, Any]] = []
-        member_ids = set()
-
-        for membership in memberships_response.data:
-            user_info = membership.get("users")
-            if not user_info:
-                continue
-
-            member_id = user_info.get("id")
-            if not member_id or member_id in member_ids:
-                continue
-
-            member_ids.add(member_id)
-            members.append({
-                "id": member_id,
-                "email": user_info.get("email"),
-                "first_name": user_info.get("first_name"),
-                "last_name": user_info.get("last_name"),
-                "profile_photo": user_info.get("profile_photo"),
-            })
+        members: List[Dict[str, Any]] = [dict(member) for member in await ctx.members()]
+        member_ids = {member["id"] for member in members}
 
         current_user_id = current_user.get("id") if isinstance(current_user, dict) else None
         if current_user_id and current_user_id not in member_ids:
@@ -177,21 +187,21 @@ async def get_user_fridges(current_user = Depends(get_current_user)):
     try:
         user_id = current_user.get("id") if isinstance(current_user, dict) else current_user.id
         
-        memberships_response = supabase.table("fridge_memberships").select(
-            "fridge_id"
-        ).eq("user_id", user_id).execute()
+        fridge_ids = await membership_index.fridges_of(user_id)
         
-        if not memberships_response.data:
+        if not fridge_ids:
             return {
                 "status": "success",
                 "fridges": []
             }
         
-        fridge_ids = [m["fridge_id"] for m in memberships_response.data]
-        
-        fridges_response = supabase.table("fridges").select(
-            "id, name, created_at, created_by"
-        ).in_("id", fridge_ids).execute()
+        # Fridge rows and every fridge's members together; members come from the index when warm
+        fridges_response, members_by_fridge = await asyncio.gather(
+            async_supabase.table("fridges").select(
+                "id, name, created_at, created_by"
+            ).in_("id", fridge_ids).execute(),
+            membership_index.members_of_many(fridge_ids),
+        )
         
         if not fridges_response.data:
             return {
@@ -199,24 +209,23 @@ async def get_user_fridges(current_user = Depends(get_current_user)):
                 "fridges": []
             }
 
+        mates_by_fridge: Dict[str, List[dict]] = {
+            fridge_id: [
+                {field: member.get(field) for field in ("id", "email", "first_name", "last_name")}
+                for member in members
+                if member["id"] != user_id
+            ]
+            for fridge_id, members in members_by_fridge.items()
+        }
+
         fridges_with_mates = []
         for fridge in fridges_response.data:
-            fridge_members_response = supabase.table("fridge_memberships").select(
-                "users(id, email, first_name, last_name)"
-            ).eq("fridge_id", fridge["id"]).neq("user_id", user_id).execute()
-            
-            fridgeMates = []
-            if fridge_members_response.data:
-                for membership in fridge_members_response.data:
-                    if membership.get("users"):
-                        fridgeMates.append(membership["users"])
-            
             fridges_with_mates.append({
                 "id": fridge["id"],
                 "name": fridge["name"],
                 "created_at": fridge["created_at"],
                 "created_by": fridge["created_by"],
-                "fridgeMates": fridgeMates
+                "fridgeMates": mates_by_fridge.get(str(fridge["id"]), [])
             })
         
         return {
@@ -246,18 +255,16 @@ async def set_active_fridge(
         fridge_id = dto.fridge_id
         
         # Verify user is actually a member of this fridge
-        membership = supabase.table("fridge_memberships").select("*").eq(
-            "user_id", user_id
-        ).eq("fridge_id", fridge_id).execute()
-        
-        if not membership.data:
+        if not await is_fridge_member(fridge_id, user_id):
             raise HTTPException(status_code=403, detail="You are not a member of this fridge")
         
         # Update active_fridge_id
-        update_response = supabase.table("users").update({
+        update_response = await async_supabase.table("users").update({
             "active_fridge_id": fridge_id
         }).eq("id", user_id).execute()
         
+        invalidate_user_profile(user_id)
+
         if not update_response.data:
             raise HTTPException(status_code=500, detail="Failed to update active fridge")
         
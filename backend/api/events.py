@@ -0,0 +1,68 @@
+"""
+Realtime stream of fridge changes over Server-Sent Events.
+
+GET /api/events keeps one connection open per client and pushes every event
+published for the user's active fridge (see events.py). Each message carries
+the event type as the SSE `event` field and the JSON event as `data`. On a
+"resync" event the client should call /api/sync with its last cursor.
+
+Events are not stored, so a reconnecting client (one sending Last-Event-ID,
+on whichever worker) starts with a "resync" event for the events it missed.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from service import get_request_context, RequestContext
+from events import event_hub, EVENT_HEARTBEAT_SECONDS
+
+app = APIRouter()
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+SSE_RETRY_MS = 3000
+
+
+def _format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@app.get("/events")
+async def stream_fridge_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """
+    Stream changes to the active fridge as they happen.
+    """
+    fridge_id = ctx.fridge_id
+
+    if not fridge_id:
+        raise HTTPException(status_code=403, detail="User has no fridge assigned")
+
+    async def stream():
+        async with event_hub.subscribe(fridge_id) as subscription:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if last_event_id:
+                # Subscribed first, so nothing published from here on is missed
+                yield _format_sse({
+                    "id": event_hub.next_id(),
+                    "type": "resync",
+                    "fridge_id": str(fridge_id),
+                    "data": {"reason": "reconnected", "last_event_id": last_event_id},
+                    "at": datetime.now(timezone.utc).isoformat(),
+                })
+            while not await request.is_disconnected():
+                event = await subscription.next(timeout=EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
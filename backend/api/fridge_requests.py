@@ -3,7 +3,7 @@ API endpoints for fridge requests management
 Extracted from frontend queries in requests.tsx and ViewRequestsModal.tsx
 """
 from fastapi import APIRouter, HTTPException, Depends
-from database import supabase
+from database import async_supabase
 from service import get_current_user
 from typing import List, Optional
 from pydantic import BaseModel
@@ -51,7 +51,7 @@ async def get_pending_requests(
                 "data": []
             }
         
-        response = supabase.table("fridge_requests").select(
+        response = await async_supabase.table("fridge_requests").select(
             """
             *,
             users:users!fridge_requests_requested_by_fkey(id, email, first_name, last_name),
@@ -95,7 +95,7 @@ async def get_pending_requests(
         
         if missing_user_ids:
             print(f"Fetching {len(missing_user_ids)} missing users for pending requests: {missing_user_ids}")
-            users_response = supabase.table("users").select(
+            users_response = await async_supabase.table("users").select(
                 "id, email, first_name, last_name"
             ).in_("id", list(missing_user_ids)).execute()
             
@@ -131,7 +131,7 @@ async def get_requests_by_fridge(
     Used in ViewRequestsModal.tsx
     """
     try:
-        response = supabase.table("fridge_requests").select(
+        response = await async_supabase.table("fridge_requests").select(
             """
             *,
             users:users!fridge_requests_requested_by_fkey(id, email, first_name, last_name),
@@ -172,7 +172,7 @@ async def get_requests_by_fridge(
         
         if missing_user_ids:
             print(f"Fetching {len(missing_user_ids)} missing users: {missing_user_ids}")
-            users_response = supabase.table("users").select(
+            users_response = await async_supabase.table("users").select(
                 "id, email, first_name, last_name"
             ).in_("id", list(missing_user_ids)).execute()
             
@@ -3,8 +3,8 @@ API endpoints for user profile and photo management
 Extracted from frontend queries in AddProfilePhotoDirectly.tsx and UserDetails.tsx
 """
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from database import supabase
-from service import get_current_user
+from database import async_supabase
+from service import get_current_user, invalidate_user_profile
 from typing import Optional
 from pydantic import BaseModel
 import base64
@@ -41,7 +41,7 @@ async def get_user_profile_photo(
         if not user_id:
             raise HTTPException(status_code=401, detail="User not authenticated")
         
-        response = supabase.table("users").select("profile_photo").eq("id", user_id).single().execute()
+        response = await async_supabase.table("users").select("profile_photo").eq("id", user_id).single().execute()
         
         if response.error:
             raise HTTPException(status_code=500, detail=str(response.error))
@@ -79,9 +79,10 @@ async def update_profile_photo(
         if not user_id:
             raise HTTPException(status_code=401, detail="User not authenticated")
         
-        response = supabase.table("users").update({
+        response = await async_supabase.table("users").update({
             "profile_photo": photo_update.profile_photo
         }).eq("id", user_id).select().execute()
+        invalidate_user_profile(user_id)
         
         if response.error:
             raise HTTPException(status_code=500, detail=str(response.error))
@@ -123,9 +124,10 @@ async def fix_profile_photo_url(
         if not user_id or user_id != fix_data.user_id:
             raise HTTPException(status_code=403, detail="Not authorized to update this profile")
         
-        response = supabase.table("users").update({
+        response = await async_supabase.table("users").update({
             "profile_photo": fix_data.new_url
         }).eq("id", fix_data.user_id).execute()
+        invalidate_user_profile(fix_data.user_id)
         
         if response.error:
             raise HTTPException(status_code=500, detail=str(response.error))
@@ -165,7 +167,7 @@ async def delete_profile_photo_from_storage(
         if not file_path.startswith(user_id):
             raise HTTPException(status_code=403, detail="Not authorized to delete this file")
         
-        response = supabase.storage.from_("profile-photos").remove([file_path])
+        response = await async_supabase.storage.from_("profile-photos").remove([file_path])
         
         return {
             "status": "success",
@@ -208,23 +210,24 @@ async def upload_profile_photo_to_storage(
             )
         
         # Upload to storage
-        storage_response = supabase.storage.from_("profile-photos").upload(
+        storage_response = await async_supabase.storage.from_("profile-photos").upload(
             path=file_name,
             file=file_data,
             file_options={"content-type": content_type, "upsert": False}
         )
         
         # Get public URL
-        public_url = supabase.storage.from_("profile-photos").get_public_url(file_name)
+        public_url = await async_supabase.storage.from_("profile-photos").get_public_url(file_name)
         
         # Fix URL if needed
         if public_url and "/object/" in public_url and "/object/public/" not in public_url:
             public_url = public_url.replace("/object/", "/object/public/")
         
         # Update user record
-        update_response = supabase.table("users").update({
+        update_response = await async_supabase.table("users").update({
             "profile_photo": public_url
         }).eq("id", user_id).select().execute()
+        invalidate_user_profile(user_id)
         
         if update_response.error:
             raise HTTPException(status_code=500, detail=str(update_response.error))
@@ -3,8 +3,9 @@ API endpoints for shopping list management
 Extracted from frontend queries in shop.tsx
 """
 from fastapi import APIRouter, HTTPException, Depends
-from database import supabase
+from database import async_supabase
 from service import get_current_user
+from events import publish_fridge_event
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import date
@@ -45,13 +46,10 @@ async def get_shopping_list(
                 "data": []
             }
         
-        response = supabase.table("shopping_list").select("*").eq(
+        response = await async_supabase.table("shopping_list").select("*").eq(
             "fridge_id", fridge_id
         ).execute()
         
-        if response.error:
-            raise HTTPException(status_code=500, detail=str(response.error))
-        
         return {
             "status": "success",
             "data": response.data
@@ -95,15 +93,17 @@ async def add_shopping_item(
              
         item_data["requested_by"] = user_name
         
-        response = supabase.table("shopping_list").insert(item_data).select().execute()
+        response = await async_supabase.table("shopping_list").insert(item_data).execute()
         
-        if response.error:
-            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=500, detail="Failed to add item")
+
+        await publish_fridge_event(fridge_id, "shopping_list.created", response.data)
         
         return {
             "status": "success",
             "message": "Item added to shopping list",
-            "data": response.data[0] if response.data else None
+            "data": response.data[0]
         }
         
     except HTTPException:
@@ -134,12 +134,14 @@ async def delete_shopping_item(
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
         
         # Ensure user can only delete items from their fridge
-        response = supabase.table("shopping_list").delete().eq(
+        response = await async_supabase.table("shopping_list").delete().eq(
             "id", item_id
         ).eq("fridge_id", fridge_id).execute()
         
-        if response.error:
-            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        await publish_fridge_event(fridge_id, "shopping_list.deleted", response.data)
         
         return {
             "status": "success",
@@ -174,17 +176,19 @@ async def update_item_quantity(
         if not fridge_id:
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
         
-        response = supabase.table("shopping_list").update({
+        response = await async_supabase.table("shopping_list").update({
             "quantity": max(1, quantity)
         }).eq("id", item_id).eq("fridge_id", fridge_id).execute()
         
-        if response.error:
-            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        await publish_fridge_event(fridge_id, "shopping_list.updated", response.data)
         
         return {
             "status": "success",
             "message": "Item quantity updated",
-            "data": response.data[0] if response.data else None
+            "data": response.data[0]
         }
         
     except HTTPException:
@@ -216,7 +220,7 @@ async def toggle_item_checked(
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
         
         # First get the current item
-        item_response = supabase.table("shopping_list").select("*").eq(
+        item_response = await async_supabase.table("shopping_list").select("*").eq(
             "id", item_id
         ).eq("fridge_id", fridge_id).execute()
         
@@ -227,18 +231,20 @@ async def toggle_item_checked(
         new_checked = not current_item.get("checked", False)
         
         # Update the item
-        response = supabase.table("shopping_list").update({
+        response = await async_supabase.table("shopping_list").update({
             "checked": new_checked,
             "bought_by": user_id if new_checked else None
         }).eq("id", item_id).eq("fridge_id", fridge_id).execute()
         
-        if response.error:
-            raise HTTPException(status_code=500, detail=str(response.error))
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        await publish_fridge_event(fridge_id, "shopping_list.updated", response.data)
         
         return {
             "status": "success",
             "message": "Item status toggled",
-            "data": response.data[0] if response.data else None
+            "data": response.data[0]
         }
         
     except HTTPException:
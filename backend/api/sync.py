@@ -0,0 +1,181 @@
+"""
+Delta sync for the mobile client.
+
+GET /sync?since=<cursor> returns the fridge items, shopping list rows and
+balances that changed since the cursor, with tombstones for deleted rows,
+in one round trip. Changes are read from the fridge_changes log that
+database triggers maintain (see supabase/migrations), so an idle fridge
+costs a single indexed lookup.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from database import async_supabase
+from service import get_request_context, RequestContext, days_until_expiry
+from CostSplitting import get_balance_breakdown
+from listing import fetch_all, LIST_MAX_PAGE_SIZE, POSTGREST_MAX_ROWS
+
+app = APIRouter()
+
+CHANGES_TABLE = "fridge_changes"
+SYNCED_COLLECTIONS = ("fridge_items", "shopping_list")
+# Collections whose changes invalidate the computed balances
+BALANCE_SOURCES = ("fridge_items", "cost_balance_settlements", "fridge_memberships")
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+# Longest id list sent in one in_() filter, so the request URL stays short
+SYNC_ID_FILTER_CHARS = 6000
+
+
+def _parse_cursor(since: Optional[str]) -> Optional[int]:
+    if since in (None, ""):
+        return None
+    try:
+        cursor = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    if cursor < 0:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return cursor
+
+
+async def _latest_change_id(fridge_id: str) -> int:
+    response = await async_supabase.table(CHANGES_TABLE).select("id").eq(
+        "fridge_id", str(fridge_id)
+    ).order("id", desc=True).limit(1).execute()
+    return response.data[0]["id"] if response.data else 0
+
+
+def _chunk_ids(row_ids: List[str]) -> List[List[str]]:
+    # As many ids per chunk as fit in the URL, and never more than one response holds
+    chunks: List[List[str]] = []
+    size = 0
+    for row_id in row_ids:
+        if not chunks or size + len(row_id) > SYNC_ID_FILTER_CHARS or len(chunks[-1]) >= POSTGREST_MAX_ROWS:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(row_id)
+        size += len(row_id) + 1
+    return chunks
+
+
+async def _fetch_rows(collection: str, fridge_id: str, row_ids: Optional[List[str]] = None) -> List[dict]:
+    def build_query():
+        return async_supabase.table(collection).select("*").eq("fridge_id", fridge_id)
+
+    if row_ids is None:
+        rows = await fetch_all(build_query)
+    else:
+        responses = await asyncio.gather(*(
+            build_query().in_("id", chunk).execute() for chunk in _chunk_ids(row_ids)
+        ))
+        rows = [row for response in responses for row in response.data or []]
+    if collection == "fridge_items":
+        for row in rows:
+            row["days_till_expiration"] = days_until_expiry(row.get("expiry_date"))
+    return rows
+
+
+async def _full_snapshot(fridge_id: str) -> dict:
+    # Read the cursor first: anything committed while the snapshot is taken is
+    # replayed on the next sync, which is harmless because upserts are idempotent.
+    cursor = await _latest_change_id(fridge_id)
+    items, shopping_list, balances = await asyncio.gather(
+        _fetch_rows("fridge_items", fridge_id),
+        _fetch_rows("shopping_list", fridge_id),
+        get_balance_breakdown(fridge_id),
+    )
+    return {
+        "status": "success",
+        "fridge_id": fridge_id,
+        "full": True,
+        "cursor": str(cursor),
+        "has_more": False,
+        "fridge_items": {"upserted": items, "deleted": []},
+        "shopping_list": {"upserted": shopping_list, "deleted": []},
+        "balances": balances,
+    }
+
+
+@app.get("/sync")
+async def sync_fridge(
+    since: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """
+    Return rows changed since `since` for the active fridge.
+
+    Without a cursor the full state is returned. `balances` is null when
+    nothing affecting balances changed. When `has_more` is true the client
+    should immediately call again with the returned cursor.
+    """
+    try:
+        fridge_id = ctx.fridge_id
+
+        if not fridge_id:
+            raise HTTPException(status_code=403, detail="User has no fridge assigned")
+
+        cursor = _parse_cursor(since)
+        if cursor is None:
+            return await _full_snapshot(fridge_id)
+
+        # limit + 1 rows must fit in one response; has_more brings the client back
+        limit = min(limit, LIST_MAX_PAGE_SIZE)
+        changes_response = await async_supabase.table(CHANGES_TABLE).select(
+            "id, collection, row_id, op"
+        ).eq("fridge_id", str(fridge_id)).gt("id", cursor).order("id").limit(limit + 1).execute()
+
+        changes = changes_response.data or []
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Later changes to the same row win
+        latest_ops: Dict[str, Dict[str, str]] = {collection: {} for collection in SYNCED_COLLECTIONS}
+        balances_dirty = False
+        for change in changes:
+            collection = change["collection"]
+            if collection in BALANCE_SOURCES:
+                balances_dirty = True
+            if collection in latest_ops and change.get("row_id") is not None:
+                latest_ops[collection][change["row_id"]] = change["op"]
+
+        upsert_ids = {
+            collection: [row_id for row_id, op in ops.items() if op == "upsert"]
+            for collection, ops in latest_ops.items()
+        }
+
+        fetches = [_fetch_rows(collection, fridge_id, upsert_ids[collection]) for collection in SYNCED_COLLECTIONS]
+        if balances_dirty:
+            fetches.append(get_balance_breakdown(fridge_id))
+        results = await asyncio.gather(*fetches)
+
+        payload = {
+            "status": "success",
+            "fridge_id": fridge_id,
+            "full": False,
+            "cursor": str(changes[-1]["id"]) if changes else str(cursor),
+            "has_more": has_more,
+            "balances": results[len(SYNCED_COLLECTIONS)] if balances_dirty else None,
+        }
+
+        for index, collection in enumerate(SYNCED_COLLECTIONS):
+            rows = results[index]
+            fetched_ids = {str(row.get("id")) for row in rows}
+            # Rows deleted after the change was logged are tombstones too
+            deleted = [
+                row_id for row_id, op in latest_ops[collection].items()
+                if op == "delete" or row_id not in fetched_ids
+            ]
+            payload[collection] = {"upserted": rows, "deleted": deleted}
+
+        return payload
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error syncing fridge: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to sync fridge: {str(e)}")
@@ -0,0 +1,154 @@
+"""
+Local verification of Supabase access tokens.
+
+Supabase signs access tokens either with the project's JWT secret (HS256) or,
+on projects using asymmetric signing keys, with a key published in the
+project's JWKS document. Checking the signature, expiry and audience here
+saves a round trip to the auth server on every request. Tokens that fail any
+local check return None so service.get_current_user can fall back to
+supabase.auth.get_user.
+
+The JWKS document is fetched through the pooled async HTTP client, so a key
+refresh only delays the requests that need the new keys, never the worker.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+from dotenv import load_dotenv  # type: ignore
+from http_pool import pooled_client
+
+load_dotenv()
+
+# "local" verifies tokens in-process first, "remote" always asks the auth server
+AUTH_VERIFY_MODE = os.getenv("SUPABASE_AUTH_VERIFY_MODE", "local").lower()
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_CACHE_SECONDS = int(os.getenv("SUPABASE_JWKS_CACHE_SECONDS", "600"))
+# Don't hammer the JWKS endpoint when a client keeps sending an unknown kid
+JWKS_MIN_REFRESH_SECONDS = 30
+JWKS_TIMEOUT_SECONDS = 5
+LEEWAY_SECONDS = 10
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+class _SigningKeyCache:
+    """JWT secret and JWKS signing keys, refreshed on expiry or unknown kid."""
+
+    def __init__(self):
+        # Only one request refreshes; the others wait for its result
+        self._lock = asyncio.Lock()
+        self._secret: Optional[str] = None
+        self._secret_loaded = False
+        self._http = pooled_client()
+        self._keys: Dict[str, Any] = {}
+        self._keys_fetched_at = 0.0
+
+    def secret(self) -> Optional[str]:
+        if not self._secret_loaded:
+            self._secret = os.getenv("SUPABASE_JWT_SECRET") or None
+            self._secret_loaded = True
+        return self._secret
+
+    def _jwks_url(self) -> Optional[str]:
+        base_url = os.getenv("SUPABASE_URL")
+        if not base_url:
+            return None
+        return f"{base_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+
+    async def _refresh_keys(self) -> None:
+        url = self._jwks_url()
+        if not url:
+            return
+        try:
+            response = await self._http.get(url, timeout=JWKS_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+            self._keys = {key.key_id: key.key for key in jwk_set.keys if key.key_id}
+        except Exception as e:
+            print(f"DEBUG: Unable to refresh JWKS signing keys: {e}")
+        finally:
+            self._keys_fetched_at = time.monotonic()
+
+    def _needs_refresh(self, kid: str) -> bool:
+        age = time.monotonic() - self._keys_fetched_at
+        # Unknown kid usually means the project rotated its signing key
+        return age > JWKS_CACHE_SECONDS or (kid not in self._keys and age > JWKS_MIN_REFRESH_SECONDS)
+
+    async def signing_key(self, kid: Optional[str]) -> Optional[Any]:
+        if not kid:
+            return None
+        if self._needs_refresh(kid):
+            async with self._lock:
+                # Another request may have refreshed while this one waited
+                if self._needs_refresh(kid):
+                    await self._refresh_keys()
+        return self._keys.get(kid)
+
+    def invalidate(self) -> None:
+        self._secret_loaded = False
+        self._keys = {}
+        self._keys_fetched_at = 0.0
+
+
+_key_cache = _SigningKeyCache()
+
+
+def local_verification_enabled() -> bool:
+    return AUTH_VERIFY_MODE == "local"
+
+
+def _expected_issuer() -> Optional[str]:
+    base_url = os.getenv("SUPABASE_URL")
+    if not base_url:
+        return None
+    return f"{base_url.rstrip('/')}/auth/v1"
+
+
+async def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """Return the token's claims if it verifies locally, otherwise None."""
+    if not token or not local_verification_enabled():
+        return None
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        return None
+
+    algorithm = header.get("alg")
+    if algorithm == "HS256":
+        key = _key_cache.secret()
+        algorithms = ["HS256"]
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        key = await _key_cache.signing_key(header.get("kid"))
+        algorithms = [algorithm]
+    else:
+        return None
+
+    if key is None:
+        return None
+
+    options = {"require": ["exp", "sub"]}
+    issuer = _expected_issuer()
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=JWT_AUDIENCE,
+            issuer=issuer,
+            leeway=LEEWAY_SECONDS,
+            options=options,
+        )
+    except jwt.PyJWTError as e:
+        print(f"DEBUG: Local token verification failed: {e}")
+        return None
+
+    return claims
+
+
+def invalidate_signing_keys() -> None:
+    """Drop cached keys so the next verification reloads them."""
+    _key_cache.invalidate()
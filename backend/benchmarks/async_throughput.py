@@ -0,0 +1,114 @@
+"""
+Throughput of one worker when handlers block on PostgREST versus awaiting it.
+
+Runs entirely in-process: PostgREST is replaced by an httpx mock transport that
+answers every query after --latency seconds, and requests are driven through
+the ASGI interface on a single event loop, just like one uvicorn worker.
+
+    cd backend
+    python benchmarks/async_throughput.py --requests 200 --concurrency 50 --latency 0.05
+
+"before" is an `async def` handler calling the blocking supabase-py query
+builder (what every handler did until the async data layer). "after" awaits
+the async builder used by database.async_supabase.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+
+ROWS = [{"id": i, "name": f"item {i}", "fridge_id": "bench"} for i in range(20)]
+BASE_URL = "http://postgrest.local/rest/v1"
+
+
+def _blocking_postgrest(latency: float) -> SyncPostgrestClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency)
+        return httpx.Response(200, json=ROWS)
+
+    client = SyncPostgrestClient(BASE_URL)
+    client.session = httpx.Client(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    return client
+
+
+def _async_postgrest(latency: float) -> AsyncPostgrestClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=ROWS)
+
+    client = AsyncPostgrestClient(BASE_URL)
+    client.session = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(handler))
+    return client
+
+
+def build_blocking_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    db = _blocking_postgrest(latency)
+
+    @app.get("/fridge_items/")
+    async def get_fridge_items():
+        response = db.table("fridge_items").select("*").eq("fridge_id", "bench").execute()
+        return {"status": "success", "data": response.data}
+
+    return app
+
+
+def build_async_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    db = _async_postgrest(latency)
+
+    @app.get("/fridge_items/")
+    async def get_fridge_items():
+        response = await db.table("fridge_items").select("*").eq("fridge_id", "bench").execute()
+        return {"status": "success", "data": response.data}
+
+    return app
+
+
+async def drive(app: FastAPI, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get("/fridge_items/")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated PostgREST latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} in flight, {args.latency * 1000:.0f}ms per query")
+    for label, build in (("before (blocking)", build_blocking_app), ("after (async)", build_async_app)):
+        result = asyncio.run(drive(build(args.latency), args.requests, args.concurrency))
+        print(
+            f"{label:<18} {result['requests_per_second']:8.1f} req/s   "
+            f"p50 {result['p50_ms']:7.1f}ms   p95 {result['p95_ms']:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Ledger rebuild time for the pure-Python and NumPy balance engines.
+
+Builds synthetic fridges with --members members and each of --items priced
+items (random sharers, some shared with everyone), loads them into a
+FridgeLedger with each engine, and checks that both produce identical pair
+totals before reporting the timings.
+
+    cd backend
+    python benchmarks/balance_engine.py --members 8 --items 1000,10000,100000
+
+Requires numpy. Importing CostSplitting builds the Supabase client, so
+placeholder credentials are filled in when none are configured.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "placeholder.placeholder.placeholder")
+
+import CostSplitting  # noqa: E402
+from CostSplitting import FridgeLedger  # noqa: E402
+
+
+def synthetic_items(count: int, member_ids: list, rng: random.Random) -> list:
+    items = []
+    for index in range(count):
+        shared_by = None if rng.random() < 0.3 else rng.sample(member_ids, rng.randint(1, len(member_ids)))
+        items.append({
+            "id": index,
+            "price": round(rng.uniform(0.5, 80), 2),
+            "added_by": rng.choice(member_ids),
+            "shared_by": shared_by,
+            "created_at": f"2026-01-01T00:00:{index % 60:02d}+00:00",
+        })
+    return items
+
+
+def time_rebuild(engine: str, items: list, member_ids: tuple, rounds: int):
+    CostSplitting.BALANCE_ENGINE = engine
+    durations = []
+    ledger = None
+    for _ in range(rounds):
+        ledger = FridgeLedger("bench", member_ids)
+        started = time.perf_counter()
+        ledger.load_items(items)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000, ledger.pair_totals()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--items", default="1000,10000,100000")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    member_ids = tuple(sorted(f"user-{index}" for index in range(args.members)))
+    print(f"{'items':>8} {'python ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for count in (int(value) for value in args.items.split(",")):
+        items = synthetic_items(count, list(member_ids), rng)
+        python_ms, python_totals = time_rebuild("python", items, member_ids, args.rounds)
+        numpy_ms, numpy_totals = time_rebuild("numpy", items, member_ids, args.rounds)
+        if python_totals != numpy_totals:
+            raise SystemExit(f"Engines disagree for {count} items")
+        print(f"{count:>8} {python_ms:>10.1f} {numpy_ms:>10.1f} {python_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
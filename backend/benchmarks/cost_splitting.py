@@ -0,0 +1,214 @@
+"""
+Time and peak memory of each cost-splitting stage on synthetic fridges.
+
+Generates a fridge with --members members, --items items and --settlements
+settlement rows, then runs the pure computation behind GET /balances with
+the rows handed over directly instead of read from Supabase:
+
+    rebuild     FridgeLedger.load_items + apply_settlement (a ledger rebuild)
+    catch_up    re-applying 1% of the items, as the change log would
+    calculate   per-member balances from the ledger (_ledger_balances)
+    simplify    the settlement plan (_simplify_debts)
+    breakdown   the GET /balances payload (_build_balance_breakdown)
+    timeline    BalanceTimeline build plus one as_of lookup
+
+Time is the median of --rounds runs; peak memory comes from a separate
+tracemalloc run so tracing does not skew the timings.
+
+    cd backend
+    python benchmarks/cost_splitting.py --members 8 --items 10000 --settlements 2000
+    python benchmarks/cost_splitting.py --save-baseline baseline.json
+    python benchmarks/cost_splitting.py --baseline baseline.json --max-regression 1.25
+
+With --baseline, exits non-zero when any stage is slower than the baseline
+by more than --max-regression. Importing CostSplitting builds the Supabase
+client, so placeholder credentials are filled in when none are configured.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "placeholder.placeholder.placeholder")
+
+from CostSplitting import (  # noqa: E402
+    BalanceTimeline,
+    FridgeLedger,
+    _build_balance_breakdown,
+    _ledger_balances,
+    _simplify_debts,
+)
+
+SHARED_BY_DISTRIBUTIONS = ("everyone", "random", "pairs", "mixed")
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_fridge(members: int, items: int, settlements: int, shared_by: str, seed: int):
+    """Members, item rows and settlement rows shaped like the Supabase responses."""
+    rng = random.Random(seed)
+    member_rows = [
+        {
+            "id": f"user-{index}",
+            "email": f"user-{index}@example.com",
+            "first_name": f"User{index}",
+            "last_name": "Bench",
+            "profile_photo": None,
+        }
+        for index in range(members)
+    ]
+    member_ids = [member["id"] for member in member_rows]
+
+    def sharers():
+        distribution = shared_by
+        if distribution == "mixed":
+            distribution = "everyone" if rng.random() < 0.3 else rng.choice(("random", "pairs"))
+        if distribution == "everyone":
+            return None
+        if distribution == "pairs":
+            return rng.sample(member_ids, min(2, len(member_ids)))
+        return rng.sample(member_ids, rng.randint(1, len(member_ids)))
+
+    item_rows = [
+        {
+            "id": index,
+            "price": round(rng.uniform(0.5, 80), 2),
+            "added_by": rng.choice(member_ids),
+            "shared_by": sharers(),
+            "created_at": (START + timedelta(minutes=index)).isoformat(),
+        }
+        for index in range(items)
+    ]
+
+    settlement_rows = []
+    for index in range(settlements):
+        from_id, to_id = rng.sample(member_ids, 2) if len(member_ids) > 1 else (member_ids[0], member_ids[0])
+        settlement_rows.append({
+            "id": index,
+            "fridge_id": "bench",
+            "from_user_id": from_id,
+            "to_user_id": to_id,
+            "amount": round(rng.uniform(0.5, 40), 2),
+            "cleared_at": (START + timedelta(minutes=rng.randint(0, max(items, 1)))).isoformat(),
+            "created_at": START.isoformat(),
+        })
+    return member_rows, item_rows, settlement_rows
+
+
+def stages(member_rows, item_rows, settlement_rows):
+    """Each stage as a callable; later stages reuse the output of earlier ones."""
+    member_ids = tuple(sorted(member["id"] for member in member_rows))
+    users_map = {member["id"]: member for member in member_rows}
+    state = {}
+
+    def rebuild():
+        ledger = FridgeLedger("bench", member_ids)
+        ledger.load_items(item_rows)
+        for settlement in settlement_rows:
+            ledger.apply_settlement(settlement)
+        state["ledger"] = ledger
+
+    def catch_up():
+        ledger = state["ledger"]
+        for item in item_rows[:max(1, len(item_rows) // 100)]:
+            ledger.apply_item(item)
+
+    def calculate():
+        state["calculation"] = _ledger_balances(state["ledger"], users_map)
+
+    def simplify():
+        _simplify_debts(state["calculation"]["balances_map"], users_map)
+
+    def breakdown():
+        _build_balance_breakdown(state["calculation"])
+
+    def timeline():
+        BalanceTimeline(item_rows, settlement_rows, list(member_ids)).pair_totals_at(
+            START + timedelta(minutes=len(item_rows) // 2)
+        )
+
+    return [
+        ("rebuild", rebuild),
+        ("catch_up", catch_up),
+        ("calculate", calculate),
+        ("simplify", simplify),
+        ("breakdown", breakdown),
+        ("timeline", timeline),
+    ]
+
+
+def measure(fridge, rounds: int) -> dict:
+    results = {}
+    # The stages print DEBUG lines; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        durations = {name: [] for name, _ in stages(*fridge)}
+        for _ in range(rounds):
+            for name, run in stages(*fridge):
+                started = time.perf_counter()
+                run()
+                durations[name].append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        for name, run in stages(*fridge):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            results[name] = {
+                "ms": statistics.median(durations[name]) * 1000,
+                "peak_kib": (peak - baseline) / 1024,
+            }
+        tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--settlements", type=int, default=2000)
+    parser.add_argument("--shared-by", choices=SHARED_BY_DISTRIBUTIONS, default="mixed")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save-baseline")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="allowed slowdown factor per stage against --baseline")
+    args = parser.parse_args()
+
+    fridge = synthetic_fridge(args.members, args.items, args.settlements, args.shared_by, args.seed)
+    results = measure(fridge, args.rounds)
+
+    print(f"{args.members} members, {args.items} items, {args.settlements} settlements, shared_by={args.shared_by}")
+    print(f"{'stage':<10} {'median ms':>10} {'peak KiB':>10}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['ms']:>10.2f} {result['peak_kib']:>10.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        regressions = [
+            f"{name}: {result['ms']:.2f} ms vs {baseline[name]['ms']:.2f} ms"
+            for name, result in results.items()
+            if name in baseline and result["ms"] > baseline[name]["ms"] * args.max_regression
+        ]
+        if regressions:
+            raise SystemExit("Slower than baseline by more than "
+                             f"{args.max_regression:.2f}x:\n  " + "\n  ".join(regressions))
+        print(f"Within {args.max_regression:.2f}x of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Settlement plan cost and size across group sizes for each debt simplification
+engine, plus the loop the engines replaced.
+
+Balances are random whole-dollar amounts that sum to zero, so groups often
+contain zero-sum subgroups and the exact engine has something to find.
+
+    cd backend
+    python benchmarks/debt_simplification.py --sizes 4,8,12,16,100,1000 --rounds 20
+
+The exact engine is only timed up to DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES;
+above that it falls back to greedy. "before" is the min/max scan that
+_simplify_debts used, including its 100-iteration cap (a plan that hit the cap
+is counted as truncated).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debt_simplification import DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES, exact_transfers, greedy_transfers  # noqa: E402
+
+MAX_LOOPS = 100
+
+
+def before_transfers(balances):
+    working = {user_id: cents for user_id, cents in balances.items() if cents}
+    transfers = []
+    loops = 0
+    while working:
+        loops += 1
+        if loops > MAX_LOOPS:
+            return transfers, True
+        debtor_id, debt = min(working.items(), key=lambda x: x[1])
+        creditor_id, credit = max(working.items(), key=lambda x: x[1])
+        amount = min(-debt, credit)
+        transfers.append((debtor_id, creditor_id, amount))
+        working[debtor_id] += amount
+        working[creditor_id] -= amount
+        if not working[debtor_id]:
+            del working[debtor_id]
+        if creditor_id in working and not working[creditor_id]:
+            del working[creditor_id]
+    return transfers, False
+
+
+def random_balances(size: int, rng: random.Random) -> dict:
+    values = [rng.choice((-1, 1)) * rng.randint(1, 40) * 100 for _ in range(size - 1)]
+    values.append(-sum(values))
+    return {f"user-{index}": cents for index, cents in enumerate(values)}
+
+
+def time_engine(engine, samples):
+    durations = []
+    transfers = []
+    for balances in samples:
+        started = time.perf_counter()
+        result = engine(balances)
+        durations.append(time.perf_counter() - started)
+        transfers.append(len(result[0] if isinstance(result, tuple) else result))
+    return statistics.median(durations) * 1000, statistics.mean(transfers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="4,8,12,16,100,1000")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'members':>8} {'engine':<8} {'median ms':>10} {'transfers':>10}  notes")
+    for size in (int(value) for value in args.sizes.split(",")):
+        samples = [random_balances(size, rng) for _ in range(args.rounds)]
+
+        truncated = sum(1 for balances in samples if before_transfers(balances)[1])
+        before_ms, before_count = time_engine(before_transfers, samples)
+        note = f"{truncated}/{args.rounds} truncated" if truncated else ""
+        print(f"{size:>8} {'before':<8} {before_ms:>10.3f} {before_count:>10.1f}  {note}")
+
+        greedy_ms, greedy_count = time_engine(greedy_transfers, samples)
+        print(f"{size:>8} {'greedy':<8} {greedy_ms:>10.3f} {greedy_count:>10.1f}")
+
+        if size <= DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES:
+            exact_ms, exact_count = time_engine(exact_transfers, samples)
+            print(f"{size:>8} {'exact':<8} {exact_ms:>10.3f} {exact_count:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 # EXAMPLE TEMPLATE SETUP
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import os
+from typing import Any, Awaitable, List, Optional
 from dotenv import load_dotenv # type: ignore
-from supabase import create_client
+from fastapi import HTTPException
+from gotrue import AsyncMemoryStorage
+from postgrest import AsyncPostgrestClient
+from storage3 import AsyncStorageClient
+from supabase import create_client, AClient, ClientOptions, ASupabaseAuthClient as AsyncSupabaseAuthClient
+from http_pool import pooled_client
 
 
 load_dotenv()
@@ -11,9 +18,78 @@ load_dotenv()
 url = os.getenv("SUPABASE_URL")
 key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+# Time budget, in seconds, for one fan-out of independent queries (see run_concurrently)
+QUERY_FANOUT_TIMEOUT = float(os.getenv("QUERY_FANOUT_TIMEOUT", "10"))
+
 print(f"DEBUG: Connecting with URL: '{url}'")
 
 if not url or not key:
     raise ValueError("ERROR: SUPABASE_URL or SUPABASE_KEY is missing. Check your .env file.")
 
-supabase = create_client(url, key)
\ No newline at end of file
+# Blocking client, only for the sync (threadpool) recipe and receipt endpoints.
+# Request handlers declared `async def` must use async_supabase instead.
+supabase = create_client(url, key)
+
+
+def _pooled_session(base_url, headers, timeout):
+    return pooled_client(base_url=base_url, headers=headers, timeout=timeout)
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True):
+        return _pooled_session(base_url, headers, timeout)
+
+
+class _PooledStorageClient(AsyncStorageClient):
+    def _create_session(self, base_url, headers, timeout, verify=True):
+        return _pooled_session(base_url, headers, timeout)
+
+
+class PooledAsyncClient(AClient):
+    """Async Supabase client whose auth, table and storage calls share one pool (see http_pool)."""
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True):
+        return _PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+    @staticmethod
+    def _init_storage_client(storage_url, headers, storage_client_timeout=None, verify=True):
+        return _PooledStorageClient(storage_url, headers, storage_client_timeout)
+
+    @staticmethod
+    def _init_supabase_auth_client(auth_url, client_options):
+        return AsyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=pooled_client(),
+        )
+
+
+async_supabase = PooledAsyncClient(url, key, options=ClientOptions(storage=AsyncMemoryStorage()))
+
+
+async def run_concurrently(*queries: Awaitable[Any], timeout: Optional[float] = None) -> List[Any]:
+    """
+    Await independent queries in parallel and return their results in order.
+
+    The batch shares one budget of `timeout` seconds (QUERY_FANOUT_TIMEOUT by
+    default), so a request waits for its slowest query rather than the sum of
+    all of them. If one query fails, or the budget runs out, the others are
+    cancelled; a failure is re-raised as is and a timeout becomes a 504.
+    """
+    tasks = [asyncio.ensure_future(query) for query in queries]
+    try:
+        return await asyncio.wait_for(
+            asyncio.gather(*tasks),
+            timeout=QUERY_FANOUT_TIMEOUT if timeout is None else timeout,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for the database")
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,128 @@
+"""
+Debt simplification engines for cost splitting.
+
+Given each member's net balance in cents (positive: is owed, negative: owes),
+an engine returns the transfers (debtor_id, creditor_id, cents) that settle
+everyone. Engines are registered in ENGINES and chosen with
+DEBT_SIMPLIFICATION_ENGINE:
+
+    greedy  largest debtor pays largest creditor, using two heaps;
+            O(n log n) and at most n - 1 transfers (default)
+    exact   fewest possible transfers, found by a bitmask search over
+            zero-sum subgroups; O(2^n * n), so groups with more than
+            DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES non-zero balances fall
+            back to greedy
+
+If the balances do not sum to zero, both engines settle as much as they can
+and leave the residue unassigned.
+"""
+import heapq
+import os
+from typing import Callable, Dict, List, Tuple
+
+DEBT_SIMPLIFICATION_ENGINE = os.getenv("DEBT_SIMPLIFICATION_ENGINE", "greedy")
+DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES = int(os.getenv("DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES", "12"))
+
+Transfer = Tuple[str, str, int]
+
+
+def greedy_transfers(balances: Dict[str, int]) -> List[Transfer]:
+    """Repeatedly settle the largest debt against the largest credit."""
+    # Min-heaps keyed on -|balance| so the largest amount pops first; `order` breaks ties by input order
+    debtors = []
+    creditors = []
+    for order, (user_id, cents) in enumerate(balances.items()):
+        if cents < 0:
+            debtors.append((cents, order, user_id))
+        elif cents > 0:
+            creditors.append((-cents, order, user_id))
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers: List[Transfer] = []
+    while debtors and creditors:
+        debt, debtor_order, debtor_id = heapq.heappop(debtors)
+        credit, creditor_order, creditor_id = heapq.heappop(creditors)
+
+        amount = min(-debt, -credit)
+        transfers.append((debtor_id, creditor_id, amount))
+
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_order, debtor_id))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_order, creditor_id))
+
+    return transfers
+
+
+def exact_transfers(balances: Dict[str, int]) -> List[Transfer]:
+    """
+    Fewest transfers that settle everyone.
+
+    A group of k people whose balances sum to zero can always be settled
+    with k - 1 transfers, so the minimum is (non-zero members) - (largest
+    number of disjoint zero-sum groups). best[mask] is that number of groups
+    for the members in mask; each group is then settled greedily.
+    """
+    parties = [(user_id, cents) for user_id, cents in balances.items() if cents != 0]
+    n = len(parties)
+    if n > DEBT_SIMPLIFICATION_EXACT_MAX_PARTIES:
+        return greedy_transfers(balances)
+
+    size = 1 << n
+    sums = [0] * size
+    for mask in range(1, size):
+        low_bit = mask & -mask
+        sums[mask] = sums[mask ^ low_bit] + parties[low_bit.bit_length() - 1][1]
+
+    best = [0] * size
+    choice = [0] * size
+    for mask in range(1, size):
+        best_count = -1
+        remaining = mask
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            if best[mask ^ bit] > best_count:
+                best_count = best[mask ^ bit]
+                choice[mask] = bit
+        best[mask] = best_count + (1 if sums[mask] == 0 else 0)
+
+    # Walk one member at a time; every zero-sum mask on the way closes a group
+    groups: List[List[int]] = []
+    current: List[int] = []
+    mask = size - 1
+    while mask:
+        if sums[mask] == 0 and current:
+            groups.append(current)
+            current = []
+        bit = choice[mask]
+        current.append(bit.bit_length() - 1)
+        mask ^= bit
+    if current:
+        groups.append(current)
+
+    transfers: List[Transfer] = []
+    for group in groups:
+        transfers.extend(greedy_transfers({parties[index][0]: parties[index][1] for index in sorted(group)}))
+    return transfers
+
+
+ENGINES: Dict[str, Callable[[Dict[str, int]], List[Transfer]]] = {
+    "greedy": greedy_transfers,
+    "exact": exact_transfers,
+}
+
+
+def simplify(balances: Dict[str, int], engine: str = DEBT_SIMPLIFICATION_ENGINE) -> List[Transfer]:
+    solver = ENGINES.get(engine)
+    if solver is None:
+        raise ValueError(f"Unknown debt simplification engine '{engine}'. Expected one of: {', '.join(ENGINES)}")
+    return solver(balances)
+
+
+if DEBT_SIMPLIFICATION_ENGINE not in ENGINES:
+    raise ValueError(
+        f"ERROR: Unknown DEBT_SIMPLIFICATION_ENGINE '{DEBT_SIMPLIFICATION_ENGINE}'. "
+        f"Expected one of: {', '.join(ENGINES)}"
+    )
@@ -0,0 +1,206 @@
+"""
+Per-fridge event fan-out for realtime updates.
+
+Mutation handlers call publish_fridge_event() after their write succeeds.
+The event goes to the configured broker, and every worker attached to that
+broker hands it to its EventHub, which copies it into the bounded queue of
+each open connection for that fridge (see api/events.py for the SSE stream).
+
+A connection that cannot keep up never slows the publisher down: when its
+queue is full the pending events are dropped and replaced by a single
+"resync" event, telling the client to catch up through /api/sync.
+
+Event ids are "<publish time in ns>-<worker>": unique across workers and
+ordered by publish time, so an SSE id (and the Last-Event-ID a reconnecting
+client sends back) means the same thing whichever worker serves it.
+
+Configuration (environment variables):
+    EVENT_BROKER               broker name, see BROKERS (default "local")
+    EVENT_QUEUE_SIZE           events buffered per connection (default 100)
+    EVENT_HEARTBEAT_SECONDS    idle seconds before a keep-alive is sent (default 15)
+"""
+import asyncio
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+EVENT_BROKER = os.getenv("EVENT_BROKER", "local")
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+Deliver = Callable[[str, dict], None]
+
+# Distinguishes ids published in the same nanosecond by different workers
+WORKER_ID = uuid.uuid4().hex[:8]
+
+
+class EventBroker(ABC):
+    """
+    Transport between workers. publish() sends an event to every attached
+    worker, including the one that published it.
+    """
+
+    @abstractmethod
+    def attach(self, deliver: Deliver) -> None:
+        ...
+
+    @abstractmethod
+    def detach(self, deliver: Deliver) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, fridge_id: str, event: dict) -> None:
+        ...
+
+
+class LocalBroker(EventBroker):
+    """
+    In-process stand-in for a shared broker. Every LocalBroker in the process
+    talks to the same set of workers, so several hubs can be wired together
+    in tests and benchmarks exactly as they would be over a network broker.
+    """
+
+    _workers: List[Deliver] = []
+
+    def attach(self, deliver: Deliver) -> None:
+        if deliver not in self._workers:
+            self._workers.append(deliver)
+
+    def detach(self, deliver: Deliver) -> None:
+        if deliver in self._workers:
+            self._workers.remove(deliver)
+
+    async def publish(self, fridge_id: str, event: dict) -> None:
+        for deliver in list(self._workers):
+            deliver(fridge_id, event)
+
+
+BROKERS: Dict[str, Callable[[], EventBroker]] = {
+    "local": LocalBroker,
+}
+
+
+class Subscription:
+    """One open connection: a bounded queue of events for a single fridge."""
+
+    def __init__(self, fridge_id: str, maxsize: int = EVENT_QUEUE_SIZE):
+        self.fridge_id = fridge_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        # Slow consumer: discard what it has not read and tell it to resync
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.dropped += 1
+        self.queue.put_nowait({
+            "id": event.get("id"),
+            "type": "resync",
+            "fridge_id": self.fridge_id,
+            "data": {"reason": "queue_overflow"},
+            "at": event.get("at"),
+        })
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Wait for the next event; None when `timeout` passes without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    """Fans events out to this worker's subscriptions, keyed by fridge."""
+
+    def __init__(self, broker: EventBroker, queue_size: int = EVENT_QUEUE_SIZE):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._last_id_ns = 0
+        self.published_total = 0
+        self.delivered_total = 0
+        self.overflows_total = 0
+        broker.attach(self.deliver)
+
+    @asynccontextmanager
+    async def subscribe(self, fridge_id: str):
+        subscription = Subscription(str(fridge_id), self.queue_size)
+        self._subscriptions.setdefault(subscription.fridge_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscriptions.get(subscription.fridge_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.fridge_id]
+
+    def deliver(self, fridge_id: str, event: dict) -> None:
+        for subscription in list(self._subscriptions.get(str(fridge_id), ())):
+            dropped = subscription.dropped
+            subscription.offer(event)
+            if subscription.dropped != dropped:
+                self.overflows_total += 1
+            self.delivered_total += 1
+
+    def next_id(self) -> str:
+        """A new event id, strictly increasing on this worker."""
+        self._last_id_ns = max(time.time_ns(), self._last_id_ns + 1)
+        return f"{self._last_id_ns}-{WORKER_ID}"
+
+    async def publish(self, fridge_id: str, event_type: str, data: Any = None) -> dict:
+        event = {
+            "id": self.next_id(),
+            "type": event_type,
+            "fridge_id": str(fridge_id),
+            "data": data,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.published_total += 1
+        await self.broker.publish(str(fridge_id), event)
+        return event
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "fridges": len(self._subscriptions),
+            "connections": sum(len(subscribers) for subscribers in self._subscriptions.values()),
+            "queue_size": self.queue_size,
+            "published_total": self.published_total,
+            "delivered_total": self.delivered_total,
+            "overflows_total": self.overflows_total,
+        }
+
+
+def _create_broker(name: str) -> EventBroker:
+    factory = BROKERS.get(name)
+    if factory is None:
+        raise ValueError(f"ERROR: Unknown EVENT_BROKER '{name}'. Expected one of: {', '.join(BROKERS)}")
+    return factory()
+
+
+event_hub = EventHub(_create_broker(EVENT_BROKER))
+
+
+async def publish_fridge_event(fridge_id: Optional[str], event_type: str, data: Any = None) -> None:
+    """
+    Publish a change for a fridge. Never raises: the write it describes has
+    already been committed, and clients fall back to /api/sync anyway.
+    """
+    if not fridge_id:
+        return
+    try:
+        await event_hub.publish(fridge_id, event_type, data)
+    except Exception as exc:
+        print(f"DEBUG: Failed to publish {event_type} for fridge {fridge_id}: {exc}")
@@ -0,0 +1,165 @@
+"""
+Pooled HTTP transport shared by every async Supabase call (auth, PostgREST and
+Storage).
+
+All sub-clients of database.async_supabase send their requests through one
+SharedTransport so a worker keeps a single set of warm, HTTP/2-multiplexed
+connections to the project instead of one pool per sub-client. The transport
+also caps concurrent requests per host and keeps counters that
+/debug/http-pool exposes for sizing workers.
+
+Configuration (environment variables):
+    SUPABASE_HTTP2                           "true" to negotiate HTTP/2 (default true)
+    SUPABASE_HTTP_MAX_CONNECTIONS            total connections in the pool (default 100)
+    SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS  idle connections kept open (default 20)
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY           seconds an idle connection is kept (default 30)
+    SUPABASE_HTTP_MAX_PER_HOST               concurrent requests per host (default 50)
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict
+
+import httpx
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+HTTP2_ENABLED = _env_flag("SUPABASE_HTTP2", True)
+HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_PER_HOST = int(os.getenv("SUPABASE_HTTP_MAX_PER_HOST", "50"))
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that frees the per-host slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """httpx transport with a shared connection pool, per-host limits and stats."""
+
+    def __init__(
+        self,
+        http2: bool = HTTP2_ENABLED,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        max_per_host: int = HTTP_MAX_PER_HOST,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.max_per_host = max_per_host
+        self._transport = httpx.AsyncHTTPTransport(http2=http2, limits=self.limits)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self.requests_total = 0
+        self.waits_total = 0
+        self.wait_seconds_total = 0.0
+        self.errors_total = 0
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_per_host)
+            self._host_slots[host] = slot
+        return slot
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        slot = self._slot(host)
+
+        if slot.locked():
+            self.waits_total += 1
+            started = time.perf_counter()
+            await slot.acquire()
+            self.wait_seconds_total += time.perf_counter() - started
+        else:
+            await slot.acquire()
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._in_flight[host] -= 1
+                slot.release()
+
+        self.requests_total += 1
+        self._in_flight[host] += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.errors_total += 1
+            release()
+            raise
+
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def stats(self) -> dict:
+        connections = list(self._transport._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+                "max_per_host": self.max_per_host,
+            },
+            "connections": len(connections),
+            "in_use": len(connections) - idle,
+            "idle": idle,
+            "in_flight": {host: count for host, count in self._in_flight.items() if count},
+            "requests_total": self.requests_total,
+            "waits_total": self.waits_total,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "errors_total": self.errors_total,
+        }
+
+
+class SharedAsyncClient(httpx.AsyncClient):
+    """AsyncClient on the shared transport; closing it must not close the pool."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+shared_transport = SharedTransport()
+
+
+def pooled_client(**kwargs) -> httpx.AsyncClient:
+    return SharedAsyncClient(transport=shared_transport, follow_redirects=True, **kwargs)
+
+
+def pool_stats() -> dict:
+    return shared_transport.stats()
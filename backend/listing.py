@@ -0,0 +1,155 @@
+"""
+Keyset-paginated listing of whole tables, used by GET /fridges and GET /users/.
+
+Pages are ordered by primary key and continue after the last id of the
+previous page, so every page costs the same however deep it is. Callers pick
+columns with `fields` from a per-table whitelist. Pages are cached for
+LIST_CACHE_TTL seconds; that staleness is acceptable for these overview lists,
+and no write path invalidates them.
+
+For exports, stream_table() walks the table batch by batch and writes one JSON
+document as it goes, so the worker holds a single batch in memory at a time.
+iter_batches() and fetch_all() walk any filtered query the same way; use them
+for reads that must see every row, since PostgREST silently cuts a single
+response at max_rows (supabase/config.toml).
+
+Configuration (environment variables):
+    LIST_CACHE_TTL       seconds a page stays cached (default 30)
+    LIST_CACHE_SIZE      pages kept across all tables (default 256)
+    LIST_EXPORT_BATCH    rows fetched per query while streaming (default 1000)
+"""
+import base64
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from database import async_supabase
+from cache import TTLCache
+
+LIST_PAGE_SIZE = 100
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "30"))
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "256"))
+LIST_EXPORT_BATCH = int(os.getenv("LIST_EXPORT_BATCH", "1000"))
+# PostgREST max_rows: no single response is longer than this
+POSTGREST_MAX_ROWS = 1000
+# A page reads one extra row to detect the next page, and that row must fit too
+LIST_MAX_PAGE_SIZE = POSTGREST_MAX_ROWS - 1
+
+if not 1 <= LIST_EXPORT_BATCH <= POSTGREST_MAX_ROWS:
+    # A batch cut short by max_rows would look like the last one
+    raise ValueError(f"ERROR: LIST_EXPORT_BATCH must be between 1 and {POSTGREST_MAX_ROWS}.")
+
+_pages = TTLCache(maxsize=LIST_CACHE_SIZE, ttl=LIST_CACHE_TTL)
+
+
+def parse_fields(fields: Optional[str], allowed: Tuple[str, ...]) -> List[str]:
+    """Requested columns, always including the id the cursor is built from."""
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+
+def encode_cursor(last_id) -> str:
+    raw = json.dumps(last_id).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _fetch_batch(table: str, columns: List[str], limit: int, after) -> List[dict]:
+    query = async_supabase.table(table).select(", ".join(columns))
+    if after is not None:
+        query = query.gt("id", after)
+    response = await query.order("id").limit(limit).execute()
+    return response.data or []
+
+
+async def iter_batches(
+    build_query: Callable[[], Any],
+    batch_size: int = LIST_EXPORT_BATCH,
+) -> AsyncIterator[List[dict]]:
+    """
+    Every row of a query, in id order, `batch_size` rows per request.
+
+    `build_query` returns a fresh select with its filters applied; the id
+    keyset, order and limit are added here. The select must include id.
+    """
+    after = None
+    while True:
+        query = build_query()
+        if after is not None:
+            query = query.gt("id", after)
+        response = await query.order("id").limit(batch_size).execute()
+        rows = response.data or []
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]["id"]
+
+
+async def fetch_all(build_query: Callable[[], Any], batch_size: int = LIST_EXPORT_BATCH) -> List[dict]:
+    """All rows of a query, however many there are; see iter_batches()."""
+    rows: List[dict] = []
+    async for batch in iter_batches(build_query, batch_size):
+        rows.extend(batch)
+    return rows
+
+
+async def list_page(table: str, columns: List[str], limit: int, cursor: Optional[str]) -> Dict:
+    """One page of `table`: {"data", "next_cursor", "count"}, served from cache when fresh."""
+    key = (table, tuple(columns), limit, cursor)
+    page = _pages.get(key)
+    if page is not None:
+        return page
+
+    # One extra row tells us whether another page exists
+    rows = await _fetch_batch(table, columns, limit + 1, decode_cursor(cursor) if cursor else None)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    page = {
+        "data": rows,
+        "next_cursor": encode_cursor(rows[-1]["id"]) if has_more and rows else None,
+        "count": len(rows),
+    }
+    _pages.set(key, page)
+    return page
+
+
+def stream_table(table: str, columns: List[str]) -> StreamingResponse:
+    """
+    The whole table as {"data": [...], "count": n}, written batch by batch.
+
+    Headers are sent before the first query runs, so a failure part way
+    through can only cut the document short; it is logged for the operator.
+    """
+
+    async def generate() -> AsyncIterator[str]:
+        yield '{"data": ['
+        count = 0
+        try:
+            async for rows in iter_batches(lambda: async_supabase.table(table).select(", ".join(columns))):
+                for row in rows:
+                    yield ("," if count else "") + json.dumps(row, default=str)
+                    count += 1
+        except Exception as exc:
+            print(f"Error streaming {table} after {count} rows: {exc}")
+            raise
+        yield f'], "count": {count}}}'
+
+    return StreamingResponse(generate(), media_type="application/json")
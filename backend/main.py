@@ -1,26 +1,34 @@
+import asyncio
 from typing import List, Any, Optional, Dict
-from fastapi import FastAPI, HTTPException, Depends, Header
-from database import supabase
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
+from database import supabase, async_supabase, run_concurrently
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from service import get_current_user, generate_invite_code
+from datetime import datetime, date, timedelta
+from service import get_current_user, get_admin_user, generate_invite_code, invalidate_user_profile, get_request_context, RequestContext, days_until_expiry
 from Join import app as join_router
 from ai_expiration import app as ai_expiration_router
 from Users import app as users_router
 from ShoppingList import app as shopping_router
 from typing import List, Optional, Any
-from CostSplitting import app as cost_splitting_router
+from CostSplitting import app as cost_splitting_router, get_balance_breakdown, run_balance_compaction, BALANCE_COMPACTION_INTERVAL
 from receiptParsing.chatGPTParse import app as receipt_router
 from recipes import app as recipes_router
 from RecipeGen2 import app as recipe_gen_router
 from favorite_recipes import app as favorite_recipes_router
 from dotenv import load_dotenv
+from http_pool import pool_stats
+from listing import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, parse_fields, encode_cursor, decode_cursor, list_page, stream_table
+from events import event_hub, publish_fridge_event
+from membership import membership_index, notify_membership_changed
 
 # Import new API routers
 from api.fridge_requests import app as fridge_requests_api_router
 from api.shopping_list import app as shopping_list_api_router
 from api.profile_photos import app as profile_photos_router
+from api.sync import app as sync_router
+from api.events import app as events_router
 
 load_dotenv()
 app = FastAPI()
@@ -85,6 +93,85 @@ class DeclineFridgeRequestDTO(BaseModel):
 def read_root():
     return {"message": "Hello from backend with Supabase!"}
 
+# Connection pool counters for the shared Supabase transport, used to size workers
+@app.get("/debug/http-pool")
+def get_http_pool_stats():
+    return {"status": "success", "data": pool_stats()}
+
+@app.get("/debug/events")
+def get_event_hub_stats():
+    return {"status": "success", "data": event_hub.stats()}
+
+@app.get("/debug/memberships")
+def get_membership_index_stats():
+    return {"status": "success", "data": membership_index.stats()}
+
+# Background tasks started with the app; kept referenced so they are not collected
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_balance_compaction():
+    if BALANCE_COMPACTION_INTERVAL > 0:
+        task = asyncio.create_task(run_balance_compaction())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+def _fridge_item_row(item: FridgeItemCreate, expiry: date, fridge_id: str, user_id: str) -> dict:
+    final_shared_by = list(item.shared_by) if item.shared_by else []
+
+    if user_id not in final_shared_by:
+        final_shared_by.append(user_id)
+
+    return {
+        "name": item.name.strip(),
+        "quantity": item.quantity,
+        "expiry_date": expiry.isoformat(),
+        # Legacy snapshot for older clients; readers derive it from expiry_date
+        "days_till_expiration": days_until_expiry(expiry),
+        "fridge_id": fridge_id,
+        "added_by": user_id,
+        "shared_by": final_shared_by,
+        "price": item.price
+    }
+
+
+# Longest or_() filter sent in one shopping list update, to stay under URL limits
+SHOPPING_CHECK_OFF_FILTER_CHARS = 6000
+
+
+def _name_matches_filter(name: str) -> str:
+    # Case-insensitive equality: escape LIKE wildcards, then PostgREST quoting
+    pattern = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    quoted = pattern.replace("\\", "\\\\").replace('"', '\\"')
+    return f'name.ilike."{quoted}"'
+
+
+async def _check_off_shopping_items(fridge_id: str, names: List[str]) -> List[dict]:
+    """Check off unchecked shopping list rows matching any of `names`, case-insensitively."""
+    unique_names = list(dict.fromkeys(name.strip().lower() for name in names if name and name.strip()))
+
+    # One update per chunk of names; a chunk holds as many names as fit in the URL
+    chunks: List[List[str]] = []
+    size = 0
+    for condition in (_name_matches_filter(name) for name in unique_names):
+        if not chunks or size + len(condition) > SHOPPING_CHECK_OFF_FILTER_CHARS:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(condition)
+        size += len(condition) + 1
+
+    checked: List[dict] = []
+    for conditions in chunks:
+        response = await async_supabase.table("shopping_list") \
+            .update({"checked": True}) \
+            .eq("fridge_id", fridge_id) \
+            .eq("checked", False) \
+            .or_(",".join(conditions)) \
+            .execute()
+        checked.extend(response.data or [])
+    return checked
+
+
 # Fridge items endpoints, this is not done yet it doesn't have shared by or added by logic yet
 @app.post("/fridge_items/")
 async def create_fridge_item(
@@ -92,129 +179,289 @@ async def create_fridge_item(
     current_user = Depends(get_current_user)
 ):
     try:
-        from datetime import datetime, date
-        
-        # Calculate days till expiration
-        expiry = datetime.strptime(item.expiry_date, "%Y-%m-%d").date()
-        today = date.today()
-        days_till_expiration = (expiry - today).days
+        expiry = _parse_expiry_date(item.expiry_date)
 
         fridge_id = current_user["fridge_id"] if isinstance(current_user, dict) else None
         
         if not fridge_id:
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
         
-        user_id = current_user["id"]
-        
-        final_shared_by = list(item.shared_by) if item.shared_by else []
-        
-        if user_id not in final_shared_by:
-            final_shared_by.append(user_id)
-        
         # insert new item to fridge
-        response = supabase.table("fridge_items").insert({
-            "name": item.name.strip(),
-            "quantity": item.quantity,
-            "days_till_expiration": days_till_expiration,
-            "fridge_id": fridge_id,
-            "added_by": current_user["id"],
-            "shared_by": final_shared_by,
-            "price": item.price
-        }).execute()
+        response = await async_supabase.table("fridge_items").insert(
+            _fridge_item_row(item, expiry, fridge_id, current_user["id"])
+        ).execute()
 
         #check off matching item in shopping_list
-        supabase.table("shopping_list") \
-            .update({"checked": True}) \
-            .ilike("name", item.name.strip()) \
-            .eq("fridge_id", fridge_id) \
-            .eq("checked", False) \
-            .execute()
+        checked_items = await _check_off_shopping_items(fridge_id, [item.name])
+
+        await publish_fridge_event(fridge_id, "fridge_item.created", response.data)
+        if checked_items:
+            await publish_fridge_event(fridge_id, "shopping_list.updated", checked_items)
         
         return {
             "status": "success",
             "message": "Fridge item added and shopping list item checked off",
             "data": response.data,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error creating fridge item: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to add item: {str(e)}")
 
+
+BULK_MAX_ITEMS = 500
+
+
+class FridgeItemBulkCreate(BaseModel):
+    # Rows are validated one by one so a bad row is reported instead of failing the batch
+    items: List[Dict[str, Any]]
+
+
+@app.post("/fridge_items/bulk")
+async def create_fridge_items_bulk(
+    batch: FridgeItemBulkCreate,
+    current_user = Depends(get_current_user)
+):
+    #Add many fridge items at once (e.g. a parsed receipt) in a single insert,
+    #then check off every matching shopping list entry in one batched update.
+    #results[i] reports what happened to items[i].
+    try:
+        fridge_id = current_user["fridge_id"] if isinstance(current_user, dict) else None
+
+        if not fridge_id:
+            raise HTTPException(status_code=403, detail="User has no fridge assigned")
+
+        if not batch.items:
+            raise HTTPException(status_code=400, detail="No items to add")
+
+        if len(batch.items) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+        results: List[dict] = [None] * len(batch.items)
+        rows: List[dict] = []
+        row_indexes: List[int] = []
+
+        for index, raw_item in enumerate(batch.items):
+            try:
+                item = FridgeItemCreate(**raw_item)
+                if not item.name.strip():
+                    raise ValueError("name must not be empty")
+                expiry = _parse_expiry_date(item.expiry_date)
+            except HTTPException as exc:
+                results[index] = {"index": index, "status": "error", "error": exc.detail}
+                continue
+            except (ValidationError, ValueError, TypeError) as exc:
+                results[index] = {"index": index, "status": "error", "error": str(exc)}
+                continue
+
+            rows.append(_fridge_item_row(item, expiry, fridge_id, current_user["id"]))
+            row_indexes.append(index)
+
+        inserted: List[dict] = []
+        if rows:
+            try:
+                response = await async_supabase.table("fridge_items").insert(rows).execute()
+                inserted = response.data or []
+            except Exception as exc:
+                # The insert is one statement, so a database error rejects every valid row
+                for index in row_indexes:
+                    results[index] = {"index": index, "status": "error", "error": f"Insert failed: {exc}"}
+                row_indexes = []
+
+        # PostgREST returns inserted rows in request order
+        for index, row in zip(row_indexes, inserted):
+            results[index] = {"index": index, "status": "created", "data": row}
+        # Fewer rows back than sent: the rest can't be matched to a row, so report them rather than guess
+        for index in row_indexes[len(inserted):]:
+            results[index] = {
+                "index": index,
+                "status": "error",
+                "error": "Insert returned no row for this item; it may still have been saved",
+            }
+
+        checked_items: List[dict] = []
+        if inserted:
+            checked_items = await _check_off_shopping_items(fridge_id, [row["name"] for row in inserted])
+            await publish_fridge_event(fridge_id, "fridge_item.created", inserted)
+            if checked_items:
+                await publish_fridge_event(fridge_id, "shopping_list.updated", checked_items)
+
+        failed = sum(1 for result in results if result["status"] == "error")
+
+        return {
+            "status": "success" if not failed else ("partial" if inserted else "error"),
+            "created": len(inserted),
+            "failed": failed,
+            "shopping_list_checked": checked_items,
+            "results": results,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error bulk creating fridge items: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to add items: {str(e)}")
+
+EXPIRING_SOON_DAYS = 3
+
+
+def _parse_expiry_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="expiry_date must be YYYY-MM-DD")
+
+
+FRIDGE_ITEMS_PAGE_SIZE = 100
+FRIDGE_ITEMS_MAX_PAGE_SIZE = 500
+
+# Response field -> columns it needs from fridge_items
+FRIDGE_ITEM_FIELDS = {
+    "id": ["id"],
+    "name": ["name"],
+    "quantity": ["quantity"],
+    "days_till_expiration": ["expiry_date"],
+    "expiry_date": ["expiry_date"],
+    "price": ["price"],
+    "fridge_id": ["fridge_id"],
+    "added_by": ["added_by_user:users!fridge_items_added_by_fkey(id, email, first_name, last_name)"],
+    "shared_by": ["shared_by"],
+    "created_at": ["created_at"],
+}
+
+
+def _decode_items_cursor(cursor: str):
+    """(created_at, id) of the last item of the previous page, validated before it reaches the filter."""
+    try:
+        created_at, item_id = decode_cursor(cursor)
+        return datetime.fromisoformat(created_at).isoformat(), int(item_id)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _fridge_items_page(
+    ctx: RequestContext,
+    limit: int,
+    cursor: Optional[str],
+    requested_fields: List[str],
+) -> dict:
+    """One page of the fridge's items, shaped as GET /fridge_items/ returns them."""
+    fridge_id = ctx.fridge_id
+    columns = ["id", "created_at"]
+    for field in requested_fields:
+        for column in FRIDGE_ITEM_FIELDS[field]:
+            if column not in columns:
+                columns.append(column)
+
+    # Get items with added_by user details in the same query
+    query = async_supabase.table("fridge_items").select(
+        ", ".join(columns)
+    ).eq("fridge_id", fridge_id)
+
+    # Newest first, so a client that stops after one page still sees recent items
+    if cursor:
+        before_created_at, before_id = _decode_items_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{before_created_at}",'
+            f'and(created_at.eq."{before_created_at}",id.lt.{before_id})'
+        )
+
+    # One extra row tells us whether another page exists; members load alongside
+    page_query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    if "shared_by" in requested_fields:
+        items_response, members_map = await run_concurrently(page_query, ctx.users_map())
+    else:
+        items_response = await page_query
+        members_map = {}
+    rows = items_response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    users_map = {}
+    if "shared_by" in requested_fields:
+        for user_id, user_data in members_map.items():
+            users_map[user_id] = {
+                "id": user_id,
+                "email": user_data.get("email"),
+                "first_name": user_data.get("first_name"),
+                "last_name": user_data.get("last_name"),
+            }
+
+    # Transform the data to populate shared_by with user details
+    transformed_items = []
+    for item in rows:
+        # Handle added_by user
+        added_by_data = item.get("added_by_user")
+        if added_by_data:
+            added_by = {
+                "id": added_by_data.get("id"),
+                "email": added_by_data.get("email"),
+                "first_name": added_by_data.get("first_name"),
+                "last_name": added_by_data.get("last_name"),
+            }
+        else:
+            added_by = None
+
+        # Handle shared_by - it's stored as a JSONB array of user_ids
+        shared_by = []
+        shared_by_ids = item.get("shared_by")
+        if shared_by_ids and isinstance(shared_by_ids, list):
+            shared_by = [users_map[user_id] for user_id in shared_by_ids if user_id in users_map]
+
+        full_item = {
+            "id": item["id"],
+            "name": item.get("name"),
+            "quantity": item.get("quantity"),
+            "days_till_expiration": days_until_expiry(item.get("expiry_date")),
+            "expiry_date": item.get("expiry_date"),
+            "price": item.get("price", 0.0),
+            "fridge_id": item.get("fridge_id"),
+            "added_by": added_by,
+            "shared_by": shared_by if len(shared_by) > 0 else None,
+            "created_at": item.get("created_at")
+        }
+        transformed_items.append({field: full_item[field] for field in requested_fields})
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor([rows[-1]["created_at"], rows[-1]["id"]])
+
+    return {"data": transformed_items, "next_cursor": next_cursor}
+
+
 @app.get("/fridge_items/")
-def get_fridge_items(current_user = Depends(get_current_user)):
-    #Get items from the current user's fridge with user details
+async def get_fridge_items(
+    ctx: RequestContext = Depends(get_request_context),
+    limit: int = Query(FRIDGE_ITEMS_PAGE_SIZE, ge=1, le=FRIDGE_ITEMS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    #Get items from the current user's fridge with user details, newest first.
+    #Pages are keyed on (created_at, id); pass next_cursor back to get the next page.
 
     try:
         #Get the user's fridge_id
-        fridge_id = current_user.get("fridge_id") if isinstance(current_user, dict) else None
+        fridge_id = ctx.fridge_id
         
         if not fridge_id:
             return {
                 "status": "success",
                 "message": "User has no fridge assigned",
-                "data": []
+                "data": [],
+                "next_cursor": None,
             }        
-        # Get items with added_by user details
-        items_response = supabase.table("fridge_items").select(
-            "*, added_by_user:users!fridge_items_added_by_fkey(id, email, first_name, last_name)"
-        ).eq("fridge_id", fridge_id).execute()
-
-        memberships_response = supabase.table("fridge_memberships").select(
-            "users(id, email, first_name, last_name)"
-        ).eq("fridge_id", fridge_id).execute()
-
-        users_map = {}
-        if memberships_response.data:
-            for membership in memberships_response.data:
-                if membership.get("users"):
-                    user_data = membership["users"]
-                    users_map[user_data["id"]] = {
-                        "id": user_data["id"],
-                        "email": user_data.get("email"),
-                        "first_name": user_data.get("first_name"),
-                        "last_name": user_data.get("last_name"),
-                    }
-
-        # Transform the data to populate shared_by with user details
-        transformed_items = []
-        for item in items_response.data:
-            # Handle added_by user
-            added_by_data = item.get("added_by_user")
-            if added_by_data:
-                added_by = {
-                    "id": added_by_data.get("id"),
-                    "email": added_by_data.get("email"),
-                    "first_name": added_by_data.get("first_name"),
-                    "last_name": added_by_data.get("last_name"),
-                }
-            else:
-                added_by = None
-
-            # Handle shared_by - it's stored as a JSONB array of user_ids
-            shared_by = []
-            shared_by_ids = item.get("shared_by")
-            if shared_by_ids and isinstance(shared_by_ids, list) and len(shared_by_ids) > 0:
-                for user_id in shared_by_ids:
-                    print(f"  Looking up user_id: {user_id}")
-                    if user_id in users_map:
-                        shared_by.append(users_map[user_id])
-                        print(f"Found user: {users_map[user_id]}")
-                    else:
-                        print(f"User {user_id} not in users_map")
-            transformed_items.append({
-                "id": item["id"],
-                "name": item["name"],
-                "quantity": item.get("quantity"),
-                "days_till_expiration": item.get("days_till_expiration"),
-                "price": item.get("price", 0.0),
-                "fridge_id": item["fridge_id"],
-                "added_by": added_by,
-                "shared_by": shared_by if len(shared_by) > 0 else None,
-                "created_at": item.get("created_at")
-            })
+
+        requested_fields = parse_fields(fields, tuple(FRIDGE_ITEM_FIELDS))
+        page = await _fridge_items_page(ctx, limit, cursor, requested_fields)
         
         return {
             "status": "success",
-            "data": transformed_items
+            "data": page["data"],
+            "next_cursor": page["next_cursor"],
         }
         
     except HTTPException:
@@ -225,22 +472,123 @@ def get_fridge_items(current_user = Depends(get_current_user)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to get fridge items: {str(e)}")
 
+DASHBOARD_SECTIONS = ("items", "shopping_list", "members", "balances")
+
+
+def _parse_sections(include: Optional[str]) -> List[str]:
+    if not include:
+        return list(DASHBOARD_SECTIONS)
+    requested = [section.strip() for section in include.split(",") if section.strip()]
+    unknown = [section for section in requested if section not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    return requested
+
+
+@app.get("/fridge/{fridge_id}/dashboard")
+async def get_fridge_dashboard(
+    fridge_id: str,
+    include: Optional[str] = None,
+    items_limit: int = Query(FRIDGE_ITEMS_PAGE_SIZE, ge=1, le=FRIDGE_ITEMS_MAX_PAGE_SIZE),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    """
+    The home screen in one request: the first page of items, the shopping
+    list, members and balances of a fridge the user belongs to.
+
+    `include` is a comma-separated subset of DASHBOARD_SECTIONS (default: all).
+    Sections share one auth and membership lookup and are fetched concurrently.
+    """
+    try:
+        sections = _parse_sections(include)
+
+        if not isinstance(ctx.user, dict):
+            raise HTTPException(status_code=403, detail="User profile not found")
+
+        # Same lazily loaded context, pointed at the requested fridge
+        if str(fridge_id) == str(ctx.fridge_id):
+            fridge_ctx = ctx
+        else:
+            fridge_ctx = RequestContext({**ctx.user, "fridge_id": fridge_id})
+
+        fridge, is_member = await run_concurrently(fridge_ctx.fridge(), fridge_ctx.is_member(ctx.user_id))
+        if not fridge:
+            raise HTTPException(status_code=404, detail="Fridge not found")
+        if not is_member:
+            raise HTTPException(status_code=403, detail="You are not a member of this fridge")
+
+        # Members are read after the fridge row so they are never older than its balance_version
+        members = await fridge_ctx.members() if {"members", "balances"} & set(sections) else []
+
+        fetches = {}
+        if "items" in sections:
+            fetches["items"] = _fridge_items_page(fridge_ctx, items_limit, None, list(FRIDGE_ITEM_FIELDS))
+        if "shopping_list" in sections:
+            fetches["shopping_list"] = async_supabase.table("shopping_list").select("*").eq(
+                "fridge_id", fridge_id
+            ).execute()
+        if "balances" in sections:
+            fetches["balances"] = get_balance_breakdown(fridge_id, members, fridge.get("balance_version"))
+        results = dict(zip(fetches, await run_concurrently(*fetches.values())))
+
+        dashboard = {
+            "status": "success",
+            "fridge_id": fridge_id,
+            "fridge": fridge,
+        }
+        if "items" in sections:
+            dashboard["items"] = results["items"]
+        if "shopping_list" in sections:
+            dashboard["shopping_list"] = results["shopping_list"].data or []
+        if "members" in sections:
+            dashboard["members"] = sorted(
+                (dict(member) for member in members),
+                key=lambda m: (m.get("first_name") or m.get("email") or "").lower(),
+            )
+        if "balances" in sections:
+            dashboard["balances"] = results["balances"]
+        return dashboard
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error building fridge dashboard: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to load dashboard: {str(e)}")
+
 @app.get("/items/added-by/{user_name}")
-def get_items_added_by(user_name: str):
-    response = (supabase.table("fridge_items")
+async def get_items_added_by(user_name: str):
+    response = (await async_supabase.table("fridge_items")
                .select("*")
                .contains("added_by", {"name": user_name})
                .execute())
     return {"data": response.data}
 
-# Get items expiring soon
+# Get items expiring soon (already expired items included), soonest first
 @app.get("/fridge_items/expiring-soon/")
-def get_expiring_items():
-    response = (supabase.table("fridge_items")
+async def get_expiring_items(
+    days: int = Query(EXPIRING_SOON_DAYS, ge=0, le=365),
+    ctx: RequestContext = Depends(get_request_context),
+):
+    fridge_id = ctx.fridge_id
+
+    if not fridge_id:
+        return {"data": []}
+
+    today = date.today()
+    # Range scan on the (fridge_id, expiry_date) index
+    response = (await async_supabase.table("fridge_items")
                .select("*")
-               .lte("days_till_expiration", 3)
+               .eq("fridge_id", fridge_id)
+               .lte("expiry_date", (today + timedelta(days=days)).isoformat())
+               .order("expiry_date")
                .execute())
-    return {"data": response.data}
+
+    items = response.data or []
+    for item in items:
+        item["days_till_expiration"] = days_until_expiry(item.get("expiry_date"), today)
+    return {"data": items}
 
 
 @app.put("/fridge_items/{item_id}")
@@ -250,12 +598,7 @@ async def update_fridge_item(
     current_user = Depends(get_current_user)
 ):
     try:
-        from datetime import datetime, date
-
-        # Calculate days till expiration
-        expiry = datetime.strptime(item.expiry_date, "%Y-%m-%d").date()
-        today = date.today()
-        days_till_expiration = (expiry - today).days
+        expiry = _parse_expiry_date(item.expiry_date)
 
         fridge_id = current_user["fridge_id"] if isinstance(current_user, dict) else None
 
@@ -263,10 +606,11 @@ async def update_fridge_item(
             raise HTTPException(status_code=403, detail="User has no fridge assigned")
 
         # Update the item
-        response = supabase.table("fridge_items").update({
+        response = await async_supabase.table("fridge_items").update({
             "name": item.name,
             "quantity": item.quantity,
-            "days_till_expiration": days_till_expiration,
+            "expiry_date": expiry.isoformat(),
+            "days_till_expiration": days_until_expiry(expiry),
             "shared_by": item.shared_by,
             "price": item.price,
         }).eq("id", item_id).eq("fridge_id", fridge_id).execute()
@@ -274,6 +618,8 @@ async def update_fridge_item(
         if not response.data:
             raise HTTPException(status_code=404, detail="Item not found or you don't have permission to update it")
 
+        await publish_fridge_event(fridge_id, "fridge_item.updated", response.data)
+
         return {
             "status": "success",
             "message": "Fridge item updated successfully",
@@ -287,21 +633,23 @@ async def update_fridge_item(
         raise HTTPException(status_code=500, detail=f"Failed to update item: {str(e)}")
 
 @app.delete("/items/{item_id}")
-def delete_fridge_item(item_id: int):
-    response = supabase.table("fridge_items").delete().eq("id", item_id).execute()
+async def delete_fridge_item(item_id: int):
+    response = await async_supabase.table("fridge_items").delete().eq("id", item_id).execute()
+    for row in response.data or []:
+        await publish_fridge_event(row.get("fridge_id"), "fridge_item.deleted", [row])
     return {"data": response.data}
 
 @join_router.post('/request-join')
-def request_join_fridge(request_join_dto: RequestJoinDTO, current_user = Depends(get_current_user)):
+async def request_join_fridge(request_join_dto: RequestJoinDTO, current_user = Depends(get_current_user)):
     try:
         # Check if fridge with code exists
-        fridge_data = supabase.table("fridges").select("*").eq("fridge_code", request_join_dto.fridgeCode).execute()
+        fridge_data = await async_supabase.table("fridges").select("*").eq("fridge_code", request_join_dto.fridgeCode).execute()
         
         if not fridge_data.data:
             raise HTTPException(status_code=404, detail="Fridge with code" + request_join_dto.fridgeCode + "not found")
         
         # Create request record in fridge_requests table
-        request_data = supabase.table("fridge_requests").insert({
+        request_data = await async_supabase.table("fridge_requests").insert({
             "fridge_id": fridge_data.data[0]["id"],
             "requested_by": current_user["id"],
             "acceptance_status": "PENDING"
@@ -327,7 +675,7 @@ async def accept_fridge_request(
 ):
     try:
         # Check if fridge request exists and is valid
-        request_response = supabase.table("fridge_requests").select(
+        request_response = await async_supabase.table("fridge_requests").select(
             "*, fridges(name)"
         ).eq(
             "id", accept_dto.request_id
@@ -340,25 +688,27 @@ async def accept_fridge_request(
 
         fridge_request = request_response.data[0]
 
-        # 1. Create fridge membership
-        membership_response = supabase.table("fridge_memberships").insert({
+        # 1. Create fridge membership; a duplicate fails here, before anything else changes
+        membership_response = await async_supabase.table("fridge_memberships").insert({
             "user_id": fridge_request["requested_by"],
             "fridge_id": fridge_request["fridge_id"]
         }).execute()
+        await notify_membership_changed(fridge_request["fridge_id"], fridge_request["requested_by"])
         
         # 2. Update user profile with active_fridge_id and fridge_id
-        profile_response = supabase.table("users").update({
+        profile_response = await async_supabase.table("users").update({
             "fridge_id": fridge_request["fridge_id"],
             "active_fridge_id": fridge_request["fridge_id"]
         }).eq("id", fridge_request["requested_by"]).execute()
+        invalidate_user_profile(fridge_request["requested_by"])
 
         if not profile_response.data:
             # If user update fails, we might want to rollback membership, 
             # but for now just raising error is standard for this codebase
             raise HTTPException(status_code=500, detail="Failed to update user profile")
 
-        # Mark request as accepted
-        supabase.table("fridge_requests").update({
+        # Mark request as accepted, only once the profile points at the fridge
+        await async_supabase.table("fridge_requests").update({
             "acceptance_status": "ACCEPTED",
         }).eq("id", fridge_request["id"]).execute()
 
@@ -385,7 +735,7 @@ async def decline_fridge_request(
 ):
     try:
         # Check if fridge request exists and is valid
-        request_response = supabase.table("fridge_requests").select(
+        request_response = await async_supabase.table("fridge_requests").select(
             "*, fridges(name)"
         ).eq(
             "id", decline_dto.request_id
@@ -399,7 +749,7 @@ async def decline_fridge_request(
         fridge_request = request_response.data[0]
 
         # Mark request as declined
-        supabase.table("fridge_requests").update({
+        await async_supabase.table("fridge_requests").update({
             "acceptance_status": "DECLINED",
         }).eq("id", fridge_request["id"]).execute()
 
@@ -428,6 +778,8 @@ app.include_router(shopping_router, prefix="/shopping")
 app.include_router(fridge_requests_api_router, prefix="/api/fridge-requests", tags=["api", "fridge-requests"])
 app.include_router(shopping_list_api_router, prefix="/api/shopping-list", tags=["api", "shopping-list"])
 app.include_router(profile_photos_router, prefix="/api/profile-photos", tags=["api", "profile-photos"])
+app.include_router(sync_router, prefix="/api", tags=["api", "sync"])
+app.include_router(events_router, prefix="/api", tags=["api", "events"])
        
 
 # Login Page
@@ -438,7 +790,7 @@ class UserLogin(BaseModel):
 @app.post("/log-in/")
 async def login_user(user: UserLogin):
     try:
-        res = supabase.auth.sign_in_with_password({
+        res = await run_in_threadpool(supabase.auth.sign_in_with_password, {
             "email": user.email,
             "password": user.password
         })
@@ -457,13 +809,13 @@ class FridgeCreate(BaseModel):
     name: str
 
 @app.post("/fridges")
-def create_fridge(fridge: FridgeCreate, current_user = Depends(get_current_user)):
+async def create_fridge(fridge: FridgeCreate, current_user = Depends(get_current_user)):
     try:
         # Get user ID from dict
         user_id = current_user.get("id") if isinstance(current_user, dict) else current_user.id
         
         # Insert the fridge and get the response
-        response = supabase.table("fridges").insert({
+        response = await async_supabase.table("fridges").insert({
             "name": fridge.name,
             "created_by": current_user["id"],
             "created_at": "now()",
@@ -478,20 +830,22 @@ def create_fridge(fridge: FridgeCreate, current_user = Depends(get_current_user)
         fridge_id = response.data[0].get("id")
 
         # NEW: Add creator as a member of the fridge
-        membership_response = supabase.table("fridge_memberships").insert({
+        membership_response = await async_supabase.table("fridge_memberships").insert({
             "user_id": user_id,
             "fridge_id": fridge_id
         }).execute()
         
         if not membership_response.data:
             print(f"Warning: Failed to add creator membership for fridge {fridge_id}")
+        await notify_membership_changed(fridge_id, user_id)
 
 
         # Gets the response for updating the fridge id for a user
-        updateFridgeID_response = supabase.table("users").update({
+        updateFridgeID_response = await async_supabase.table("users").update({
             "fridge_id": fridge_id,
             "active_fridge_id": fridge_id
         }).eq("id", user_id).execute()
+        invalidate_user_profile(user_id)
 
         if not updateFridgeID_response.data or len(updateFridgeID_response.data) == 0:
             print(f"Error updating user fridge ID: {updateFridgeID_response}")
@@ -513,19 +867,33 @@ def create_fridge(fridge: FridgeCreate, current_user = Depends(get_current_user)
         raise HTTPException(status_code=500, detail=error_msg)
 
 
+FRIDGE_LIST_FIELDS = ("id", "name", "created_at", "created_by", "fridge_code")
+
 @app.get("/fridges")
-def get_fridges():
+async def get_fridges(
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    admin = Depends(get_admin_user),
+):
+    #Every fridge, invite codes included, so admins only (ADMIN_USER_IDS).
+    #Fridges ordered by id, one page at a time; pass next_cursor back for the next page.
+    #stream=true writes every fridge as one JSON document instead, for exports.
     try:
-        response = supabase.table("fridges").select("*").execute()
-        
-        if response.get("error"):
-            raise HTTPException(status_code=500, detail=response.error.message)
-            
+        columns = parse_fields(fields, FRIDGE_LIST_FIELDS)
+        if stream:
+            return stream_table("fridges", columns)
+
+        page = await list_page("fridges", columns, limit, cursor)
         return {
             "status": "success",
-            "data": response.data,
-            "count": len(response.data) if response.data else 0
+            "data": page["data"],
+            "next_cursor": page["next_cursor"],
+            "count": page["count"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching fridges: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
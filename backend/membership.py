@@ -0,0 +1,176 @@
+"""
+In-process index of fridge members (fridge -> member profiles).
+
+Entries are loaded lazily from fridge_memberships and kept in a bounded TTL
+cache. Each entry remembers the newest change to that fridge's memberships in
+the trigger-fed fridge_changes log at the time it was loaded; a lookup first
+reads that fridge's change id again (one probe of a partial (fridge_id, id)
+index) and reloads the entry if it is older. A membership write on any worker
+therefore invalidates that fridge, and only that fridge, on every worker.
+RequestContext reads each fridge's change id at most once per request.
+
+The reverse direction (user -> fridges) has no per-user signal in the log, so
+fridges_of() always reads fridge_memberships; RequestContext memoizes it per
+request. Authorization goes through is_fridge_member(), which always asks the
+database. Member rows embed profile fields, so invalidate_user() is also
+called when a profile changes; MEMBERSHIP_CACHE_TTL bounds profile edits made
+by other workers.
+
+Configuration (environment variables):
+    MEMBERSHIP_CACHE_SIZE    fridges and users kept in each map (default 4096)
+    MEMBERSHIP_CACHE_TTL     seconds an entry is trusted (default 300)
+"""
+import asyncio
+import os
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from database import async_supabase
+from cache import TTLCache
+from events import publish_fridge_event
+
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "4096"))
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "300"))
+
+MEMBER_FIELDS = ("id", "email", "first_name", "last_name", "profile_photo")
+MEMBERS_CHANGED = "members.changed"
+
+# (change id the entry was loaded at, members in membership order)
+FridgeMembers = Tuple[int, Tuple[dict, ...]]
+
+
+async def membership_change_id(fridge_id: str) -> int:
+    """Id of the newest fridge_memberships change of one fridge in fridge_changes, or 0."""
+    response = await async_supabase.table("fridge_changes").select("id").eq(
+        "fridge_id", str(fridge_id)
+    ).eq("collection", "fridge_memberships").order("id", desc=True).limit(1).execute()
+    return response.data[0]["id"] if response.data else 0
+
+
+async def membership_change_ids(fridge_ids: Iterable[str]) -> Dict[str, int]:
+    """membership_change_id() for several fridges, read concurrently."""
+    fridge_ids = list(dict.fromkeys(str(fridge_id) for fridge_id in fridge_ids))
+    change_ids = await asyncio.gather(*(membership_change_id(fridge_id) for fridge_id in fridge_ids))
+    return dict(zip(fridge_ids, change_ids))
+
+
+async def is_fridge_member(fridge_id: Optional[str], user_id: Optional[str]) -> bool:
+    """Authoritative membership check, always read from the database."""
+    if not fridge_id or not user_id:
+        return False
+    response = await async_supabase.table("fridge_memberships").select("fridge_id").eq(
+        "fridge_id", fridge_id
+    ).eq("user_id", user_id).limit(1).execute()
+    return bool(response.data)
+
+
+class MembershipIndex:
+    """Members of each fridge, cached per worker."""
+
+    def __init__(self, maxsize: int = MEMBERSHIP_CACHE_SIZE, ttl: float = MEMBERSHIP_CACHE_TTL):
+        self._members = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Fridges whose cached member rows include a user, for profile invalidation
+        self._listed_in = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _current(self, fridge_id: str, change_id: int):
+        entry = self._members.get(fridge_id)
+        if entry is None or entry[0] < change_id:
+            return None
+        return entry[1]
+
+    def _store_members(self, fridge_id: str, memberships: Iterable[dict], change_id: int) -> Tuple[dict, ...]:
+        members: List[dict] = []
+        seen = set()
+        for membership in memberships:
+            user_data = membership.get("users")
+            if not user_data or not user_data.get("id") or user_data["id"] in seen:
+                continue
+            seen.add(user_data["id"])
+            members.append({field: user_data.get(field) for field in MEMBER_FIELDS})
+            listed_in = self._listed_in.get(user_data["id"]) or frozenset()
+            self._listed_in.set(user_data["id"], listed_in | {fridge_id})
+
+        self._members.set(fridge_id, (change_id, tuple(members)))
+        return tuple(members)
+
+    async def members(self, fridge_id: str, change_id: Optional[int] = None) -> List[dict]:
+        """Users belonging to a fridge, in membership order. The dicts are copies."""
+        if not fridge_id:
+            return []
+        change_ids = None if change_id is None else {str(fridge_id): change_id}
+        return (await self.members_of_many([fridge_id], change_ids))[str(fridge_id)]
+
+    async def members_of_many(
+        self,
+        fridge_ids: List[str],
+        change_ids: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, List[dict]]:
+        """
+        members() for several fridges, loading every stale entry in one query.
+
+        `change_ids` are the fridges' membership_change_id() values when the
+        caller already has them; they must be read before this call.
+        """
+        fridge_ids = list(dict.fromkeys(str(fridge_id) for fridge_id in fridge_ids))
+        # Read the change ids before the rows: a write landing in between makes
+        # the entry look older than it is, never newer
+        if change_ids is None:
+            change_ids = await membership_change_ids(fridge_ids)
+        found: Dict[str, Tuple[dict, ...]] = {}
+        missing = []
+        for fridge_id in fridge_ids:
+            members = self._current(fridge_id, change_ids[fridge_id])
+            if members is None:
+                missing.append(fridge_id)
+            else:
+                found[fridge_id] = members
+
+        if missing:
+            memberships_response = await async_supabase.table("fridge_memberships").select(
+                "fridge_id, users(id, email, first_name, last_name, profile_photo)"
+            ).in_("fridge_id", missing).execute()
+            grouped: Dict[str, List[dict]] = {fridge_id: [] for fridge_id in missing}
+            for membership in memberships_response.data or []:
+                grouped.setdefault(str(membership.get("fridge_id")), []).append(membership)
+            for fridge_id in missing:
+                found[fridge_id] = self._store_members(fridge_id, grouped[fridge_id], change_ids[fridge_id])
+
+        return {fridge_id: [dict(member) for member in found[fridge_id]] for fridge_id in fridge_ids}
+
+    async def fridges_of(self, user_id: str) -> List[str]:
+        """Ids of the fridges a user belongs to, in membership order, read from the database."""
+        if not user_id:
+            return []
+        memberships_response = await async_supabase.table("fridge_memberships").select(
+            "fridge_id"
+        ).eq("user_id", user_id).execute()
+        return list(dict.fromkeys(
+            membership["fridge_id"] for membership in memberships_response.data or [] if membership.get("fridge_id")
+        ))
+
+    def invalidate_fridge(self, fridge_id: Optional[str]) -> None:
+        if fridge_id:
+            self._members.pop(str(fridge_id))
+
+    def invalidate_user(self, user_id: Optional[str]) -> None:
+        """Forget every cached member list showing a user's profile."""
+        if not user_id:
+            return
+        for fridge_id in self._listed_in.pop(user_id) or ():
+            self._members.pop(fridge_id)
+
+    def stats(self) -> dict:
+        return {"fridges": self._members.stats(), "users": self._listed_in.stats()}
+
+
+membership_index = MembershipIndex()
+
+
+async def notify_membership_changed(fridge_id: str, user_id: str) -> None:
+    """
+    Call after inserting or deleting a fridge_memberships row. Other workers
+    notice through fridge_changes; this drops the local entries at once and
+    tells clients streaming the fridge's events.
+    """
+    membership_index.invalidate_fridge(fridge_id)
+    membership_index.invalidate_user(user_id)
+    await publish_fridge_event(fridge_id, MEMBERS_CHANGED, {"user_id": user_id})
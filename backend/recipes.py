@@ -3,7 +3,7 @@ import os
 from openai import OpenAI
 from pydantic import BaseModel
 from fastapi import HTTPException, APIRouter
-from database import supabase
+from database import supabase, async_supabase
 from datetime import datetime 
 
 for key in list(os.environ.keys()):
@@ -60,7 +60,7 @@ async def add_to_grocery_list(grocery_item: GroceryItem):
     """
     try:
         # Fetch user details to get name
-        user_response = supabase.table("users").select("first_name, last_name").eq("id", grocery_item.userId).execute()
+        user_response = await async_supabase.table("users").select("first_name, last_name").eq("id", grocery_item.userId).execute()
         
         user_name = "Unknown"
         if user_response.data and len(user_response.data) > 0:
@@ -75,7 +75,7 @@ async def add_to_grocery_list(grocery_item: GroceryItem):
         print(f"Adding '{grocery_item.ingredient}' to shopping list for user {user_name} ({grocery_item.userId})")
         
         # Insert into shopping_list table
-        result = supabase.table("shopping_list").insert({
+        result = await async_supabase.table("shopping_list").insert({
             "name": grocery_item.ingredient,
             "requested_by": user_name,
             "fridge_id": grocery_item.fridgeId,
@@ -1,26 +1,92 @@
 
 import random
 from fastapi import Header
-from database import supabase
+from database import async_supabase
 from fastapi import HTTPException, Header, Depends
 from fastapi import HTTPException, Header, Depends
 import string
 from functools import lru_cache
 import os
-from supabase import create_client
 from functools import lru_cache
 import os
+from datetime import date
+from typing import Optional
+from auth_tokens import verify_access_token
+from cache import TTLCache
+from membership import membership_index, is_fridge_member, membership_change_ids
+
+# Profile rows rarely change; writers call invalidate_user_profile() so photo
+# and name updates are visible on the very next request. Only this worker sees
+# that call, so the fridge assignment (which scopes every fridge query) is not
+# cached: it is read on each request, together with nothing else.
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "60"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "2048"))
+_user_profile_cache = TTLCache(maxsize=USER_PROFILE_CACHE_SIZE, ttl=USER_PROFILE_CACHE_TTL)
+# Comma-separated user ids allowed to use the cross-fridge listings (GET /fridges, GET /users/)
+ADMIN_USER_IDS = frozenset(user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip())
 
 def generate_invite_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
 
-@lru_cache()
+def days_until_expiry(expiry_date, today: Optional[date] = None) -> Optional[int]:
+    """Days from today until a stored expiry_date (negative once expired)."""
+    if not expiry_date:
+        return None
+    if isinstance(expiry_date, str):
+        expiry_date = date.fromisoformat(expiry_date[:10])
+    return (expiry_date - (today or date.today())).days
+
+
 def get_supabase_client():
-    return create_client(
-        os.getenv("SUPABASE_URL"),
-        os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    )
+    return async_supabase
+
+
+def invalidate_user_profile(user_id: str):
+    """Drop a user's cached profile after writing to their users row."""
+    if user_id:
+        _user_profile_cache.pop(user_id)
+        # Member lists embed the profile too
+        membership_index.invalidate_user(user_id)
+
+
+PROFILE_FIELDS = ("id", "email", "first_name", "last_name", "profile_photo")
+FRIDGE_FIELDS = ("active_fridge_id", "fridge_id")
+
+
+async def _get_user_profile(supabase, user_id: str):
+    cached = _user_profile_cache.get(user_id)
+    if cached is not None:
+        # Another worker may have switched or left the fridge since this was cached
+        fridge_response = await supabase.table("users").select(
+            ", ".join(FRIDGE_FIELDS)
+        ).eq("id", user_id).execute()
+        if not fridge_response.data:
+            _user_profile_cache.pop(user_id)
+            return None
+        return {**cached, **fridge_response.data[0]}
+
+    user_response = await supabase.table("users").select(
+        ", ".join(PROFILE_FIELDS + FRIDGE_FIELDS)
+    ).eq("id", user_id).execute()
+
+    if not user_response.data or len(user_response.data) == 0:
+        return None
+
+    user_data = user_response.data[0]
+    _user_profile_cache.set(user_id, {field: user_data.get(field) for field in PROFILE_FIELDS})
+    return user_data
+
+
+async def _get_auth_user(supabase, token: str):
+    response = await supabase.auth.get_user(token)
+
+    if not response or not response.user:
+        print("DEBUG: No user found in Supabase Auth")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return response.user
+
 
 async def get_current_user(
     authorization: str = Header(None),
@@ -32,23 +98,23 @@ async def get_current_user(
     try:
         token = authorization.replace("Bearer ", "")
         # print(f"DEBUG: Processing token: {token[:10]}...")
-        response = supabase.auth.get_user(token)
-        
-        if not response or not response.user:
-            print("DEBUG: No user found in Supabase Auth")
-            raise HTTPException(status_code=401, detail="Invalid token")
+        auth_user = None
+        claims = await verify_access_token(token)
+        if claims:
+            user_id = claims["sub"]
+        else:
+            # Token could not be verified locally (unknown key, remote mode, ...)
+            auth_user = await _get_auth_user(supabase, token)
+            user_id = auth_user.id
             
-        print(f"DEBUG: Auth user found: {response.user.id}")
+        print(f"DEBUG: Auth user found: {user_id}")
         
-        user_response = supabase.table("users").select(
-            "id, email, active_fridge_id, fridge_id, first_name, last_name, profile_photo"
-        ).eq("id", response.user.id).execute()
+        user_data = await _get_user_profile(supabase, user_id)
         
-        if not user_response.data or len(user_response.data) == 0:
-            print(f"DEBUG: User {response.user.id} not found in public.users table")
-            return response.user
+        if not user_data:
+            print(f"DEBUG: User {user_id} not found in public.users table")
+            return auth_user or await _get_auth_user(supabase, token)
         
-        user_data = user_response.data[0]
         print(f"DEBUG: User data retrieved: {user_data.get('email')}, Active Fridge: {user_data.get('active_fridge_id')}")
         
         user_data["fridge_id"] = user_data.get("active_fridge_id") or user_data.get("fridge_id")
@@ -62,8 +128,106 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Authentication failed")
 
 
+class RequestContext:
+    """
+    Lazily loaded, memoized view of the current user's active fridge.
+
+    FastAPI resolves a dependency once per request, so every handler and
+    sub-dependency asking for get_request_context shares one instance and
+    each lookup below hits Supabase at most once per request.
+    """
+
+    def __init__(self, current_user):
+        self.user = current_user
+        self._fridge = None
+        self._fridge_loaded = False
+        self._members = None
+        self._users_map = None
+        self._is_member = {}
+        self._fridge_ids = None
+        self._change_ids = {}
+
+    @property
+    def user_id(self):
+        if isinstance(self.user, dict):
+            return self.user.get("id")
+        return getattr(self.user, "id", None)
+
+    @property
+    def fridge_id(self):
+        return self.user.get("fridge_id") if isinstance(self.user, dict) else None
+
+    async def fridge(self):
+        """Row from the fridges table for the active fridge, or None."""
+        if not self._fridge_loaded:
+            self._fridge_loaded = True
+            if self.fridge_id:
+                fridge_response = await async_supabase.table("fridges").select("*").eq("id", self.fridge_id).execute()
+                if fridge_response.data:
+                    self._fridge = fridge_response.data[0]
+        return self._fridge
+
+    async def membership_change_ids(self, fridge_ids):
+        """Newest membership change of each fridge, read once per request."""
+        missing = [str(fridge_id) for fridge_id in fridge_ids if str(fridge_id) not in self._change_ids]
+        if missing:
+            self._change_ids.update(await membership_change_ids(missing))
+        return {str(fridge_id): self._change_ids[str(fridge_id)] for fridge_id in fridge_ids}
+
+    async def members_of_many(self, fridge_ids):
+        """Members of several fridges, keyed by fridge id."""
+        return await membership_index.members_of_many(fridge_ids, await self.membership_change_ids(fridge_ids))
+
+    async def members(self):
+        """Users belonging to the active fridge, in membership order."""
+        if self._members is None:
+            if self.fridge_id:
+                self._members = (await self.members_of_many([self.fridge_id]))[str(self.fridge_id)]
+            else:
+                self._members = []
+        return self._members
+
+    async def fridges(self):
+        """Ids of every fridge the user belongs to, in membership order."""
+        if self._fridge_ids is None:
+            self._fridge_ids = await membership_index.fridges_of(self.user_id)
+        return self._fridge_ids
+
+    async def users_map(self):
+        if self._users_map is None:
+            self._users_map = {member["id"]: member for member in await self.members()}
+        return self._users_map
+
+    async def is_member(self, user_id):
+        """Whether a user belongs to the active fridge, checked against the database."""
+        if user_id not in self._is_member:
+            self._is_member[user_id] = await is_fridge_member(self.fridge_id, user_id)
+        return self._is_member[user_id]
+
+    async def fridge_mates(self):
+        """Other members of the active fridge, without profile photos."""
+        return [
+            {field: member.get(field) for field in ("id", "email", "first_name", "last_name")}
+            for member in await self.members()
+            if member["id"] != self.user_id
+        ]
+
+
+async def get_admin_user(current_user = Depends(get_current_user)):
+    """The current user, if listed in ADMIN_USER_IDS."""
+    user_id = current_user.get("id") if isinstance(current_user, dict) else getattr(current_user, "id", None)
+    if user_id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+async def get_request_context(current_user = Depends(get_current_user)):
+    return RequestContext(current_user)
+
+
 async def get_current_user_with_fridgeMates(
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    ctx: RequestContext = Depends(get_request_context)
 ):
     """Get user with their fridgeMates from their active/current fridge"""
     try:
@@ -75,15 +239,7 @@ async def get_current_user_with_fridgeMates(
             current_user["fridgeMates"] = []
             return current_user
         
-        memberships_response = supabase.table("fridge_memberships").select(
-            "users(id, email, first_name, last_name)"
-        ).eq("fridge_id", fridge_id).neq("user_id", current_user["id"]).execute()
-        
-        fridgeMates = []
-        if memberships_response.data:
-            for membership in memberships_response.data:
-                if membership.get("users"):
-                    fridgeMates.append(membership["users"])
+        fridgeMates = await ctx.fridge_mates()
         
         print(f"DEBUG: Found {len(fridgeMates)} fridgeMates")
         current_user["fridgeMates"] = fridgeMates
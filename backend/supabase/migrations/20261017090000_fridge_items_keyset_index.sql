@@ -0,0 +1,3 @@
+-- Keyset pagination for GET /fridge_items/ walks (created_at, id) within a fridge.
+create index if not exists fridge_items_fridge_created_at_id_idx
+    on public.fridge_items (fridge_id, created_at, id);
@@ -0,0 +1,72 @@
+-- Append-only change log behind GET /sync. Every insert, update and delete on a
+-- synced table records (collection, row id, op) against the row's fridge; the
+-- log id is the sync cursor, so clients only fetch what changed since their
+-- last cursor and deletes survive as tombstones.
+create table if not exists public.fridge_changes (
+    id bigint generated always as identity primary key,
+    fridge_id text not null,
+    collection text not null,
+    row_id text,
+    op text not null check (op in ('upsert', 'delete')),
+    changed_at timestamptz not null default now()
+);
+
+create index if not exists fridge_changes_fridge_id_id_idx
+    on public.fridge_changes (fridge_id, id);
+
+create or replace function public.log_fridge_change()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        insert into public.fridge_changes (fridge_id, collection, row_id, op)
+        values (old.fridge_id::text, tg_table_name, to_jsonb(old)->>'id', 'delete');
+        return old;
+    end if;
+
+    -- A row moved to another fridge is a delete for the old one
+    if tg_op = 'UPDATE' and old.fridge_id is distinct from new.fridge_id then
+        insert into public.fridge_changes (fridge_id, collection, row_id, op)
+        values (old.fridge_id::text, tg_table_name, to_jsonb(old)->>'id', 'delete');
+    end if;
+
+    if new.fridge_id is not null then
+        insert into public.fridge_changes (fridge_id, collection, row_id, op)
+        values (new.fridge_id::text, tg_table_name, to_jsonb(new)->>'id', 'upsert');
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists fridge_items_log_change on public.fridge_items;
+create trigger fridge_items_log_change
+    after insert or update or delete on public.fridge_items
+    for each row execute function public.log_fridge_change();
+
+drop trigger if exists shopping_list_log_change on public.shopping_list;
+create trigger shopping_list_log_change
+    after insert or update or delete on public.shopping_list
+    for each row execute function public.log_fridge_change();
+
+drop trigger if exists cost_balance_settlements_log_change on public.cost_balance_settlements;
+create trigger cost_balance_settlements_log_change
+    after insert or update or delete on public.cost_balance_settlements
+    for each row execute function public.log_fridge_change();
+
+-- Membership changes alter who shares unassigned items, so they dirty balances too
+drop trigger if exists fridge_memberships_log_change on public.fridge_memberships;
+create trigger fridge_memberships_log_change
+    after insert or update or delete on public.fridge_memberships
+    for each row execute function public.log_fridge_change();
+
+-- Only the API (service role) reads the log; it names every row id of every
+-- fridge. RLS without any policy keeps anon and authenticated out, and the
+-- security definer trigger function must not be callable through the API.
+alter table public.fridge_changes enable row level security;
+revoke all on table public.fridge_changes from anon, authenticated;
+
+revoke execute on function public.log_fridge_change from public, anon, authenticated;
+grant execute on function public.log_fridge_change to service_role;
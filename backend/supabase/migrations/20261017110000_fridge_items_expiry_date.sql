@@ -0,0 +1,48 @@
+-- Persist the expiry date itself; days remaining is derived at read time.
+-- days_till_expiration was computed once on write and is only kept for old clients.
+alter table public.fridge_items
+    add column if not exists expiry_date date;
+
+-- Best reconstruction for existing rows. The old write paths stored a countdown
+-- from the day of the write, and an edit recomputed it from the day of the edit,
+-- so count from the row's last write: updated_at where the table has that column,
+-- else the newest upsert logged in fridge_changes, else created_at. A row last
+-- edited before either was recorded falls back to created_at and can be early by
+-- the days between creation and that edit; nothing in the database recovers it.
+-- From here on expiry_date is authoritative and days_till_expiration is derived
+-- from it on read.
+do $$
+declare
+    updated_at_expr text := 'null::timestamptz';
+begin
+    if exists (
+        select 1
+          from information_schema.columns
+         where table_schema = 'public'
+           and table_name = 'fridge_items'
+           and column_name = 'updated_at'
+    ) then
+        updated_at_expr := 'item.updated_at::timestamptz';
+    end if;
+
+    execute format($backfill$
+        update public.fridge_items as item
+           set expiry_date = (coalesce(
+                   %s,
+                   (select max(change.changed_at)
+                      from public.fridge_changes as change
+                     where change.fridge_id = item.fridge_id::text
+                       and change.collection = 'fridge_items'
+                       and change.row_id = item.id::text
+                       and change.op = 'upsert'),
+                   item.created_at
+               ) at time zone 'utc')::date + item.days_till_expiration
+         where item.expiry_date is null
+           and item.days_till_expiration is not null
+    $backfill$, updated_at_expr);
+end;
+$$;
+
+-- GET /fridge_items/expiring-soon/ is a range scan on expiry_date within one fridge.
+create index if not exists fridge_items_fridge_expiry_date_idx
+    on public.fridge_items (fridge_id, expiry_date);
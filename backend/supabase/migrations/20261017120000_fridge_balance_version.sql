@@ -0,0 +1,41 @@
+-- Mutation counter behind the GET /balances cache. Every write that can move a
+-- balance (items, settlements, memberships) bumps the owning fridge's
+-- balance_version, so (fridge_id, balance_version) identifies one balance state.
+alter table public.fridges
+    add column if not exists balance_version bigint not null default 0;
+
+create or replace function public.bump_fridge_balance_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update public.fridges set balance_version = balance_version + 1
+        where id = old.fridge_id;
+    end if;
+
+    -- A row moved to another fridge changes both fridges
+    if tg_op = 'INSERT' or (tg_op = 'UPDATE' and old.fridge_id is distinct from new.fridge_id) then
+        update public.fridges set balance_version = balance_version + 1
+        where id = new.fridge_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists fridge_items_bump_balance_version on public.fridge_items;
+create trigger fridge_items_bump_balance_version
+    after insert or update or delete on public.fridge_items
+    for each row execute function public.bump_fridge_balance_version();
+
+drop trigger if exists cost_balance_settlements_bump_balance_version on public.cost_balance_settlements;
+create trigger cost_balance_settlements_bump_balance_version
+    after insert or update or delete on public.cost_balance_settlements
+    for each row execute function public.bump_fridge_balance_version();
+
+drop trigger if exists fridge_memberships_bump_balance_version on public.fridge_memberships;
+create trigger fridge_memberships_bump_balance_version
+    after insert or update or delete on public.fridge_memberships
+    for each row execute function public.bump_fridge_balance_version();
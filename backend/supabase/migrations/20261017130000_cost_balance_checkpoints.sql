@@ -0,0 +1,189 @@
+-- Settlement compaction. Old cost_balance_settlements rows are folded into a
+-- checkpoint holding, per (from, to) pair, the cents settled and the latest
+-- clear time. Checkpoints are cumulative: each one includes the pairs of the
+-- previous checkpoint, so balances start from the latest checkpoint plus the
+-- settlements not folded into it. Folded rows stay in place for auditing and
+-- point at their checkpoint through cost_balance_settlements.checkpoint_id.
+create table if not exists public.cost_balance_checkpoints (
+    id bigint generated always as identity primary key,
+    fridge_id text not null,
+    previous_checkpoint_id bigint references public.cost_balance_checkpoints (id),
+    folded_before timestamptz not null,
+    settlement_count integer not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists cost_balance_checkpoints_fridge_id_id_idx
+    on public.cost_balance_checkpoints (fridge_id, id);
+
+create table if not exists public.cost_balance_checkpoint_pairs (
+    checkpoint_id bigint not null references public.cost_balance_checkpoints (id) on delete cascade,
+    from_user_id text not null,
+    to_user_id text not null,
+    amount_cents bigint not null,
+    last_cleared_at timestamptz,
+    primary key (checkpoint_id, from_user_id, to_user_id)
+);
+
+alter table public.cost_balance_settlements
+    add column if not exists checkpoint_id bigint references public.cost_balance_checkpoints (id);
+
+-- Balance rebuilds only read settlements that are not folded yet
+create index if not exists cost_balance_settlements_unfolded_idx
+    on public.cost_balance_settlements (fridge_id)
+    where checkpoint_id is null;
+
+-- Ledgers follow fridge_changes and rebuild when a checkpoint appears or goes
+drop trigger if exists cost_balance_checkpoints_log_change on public.cost_balance_checkpoints;
+create trigger cost_balance_checkpoints_log_change
+    after insert or update or delete on public.cost_balance_checkpoints
+    for each row execute function public.log_fridge_change();
+
+-- Fold settlements cleared before p_before into a new checkpoint, atomically.
+-- Amounts are converted to cents row by row, rounding half up and ignoring
+-- negatives, exactly as the API does. Returns the checkpoint id, or null when
+-- fewer than p_min_settlements rows qualify.
+create or replace function public.compact_cost_balance_settlements(
+    p_fridge_id public.cost_balance_settlements.fridge_id%type,
+    p_before timestamptz,
+    p_min_settlements integer default 1
+)
+returns bigint
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_fridge_id text := p_fridge_id::text;
+    v_previous bigint;
+    v_checkpoint bigint;
+    v_folded integer;
+begin
+    -- One compaction per fridge at a time
+    perform pg_advisory_xact_lock(hashtext('cost_balance_checkpoints:' || v_fridge_id));
+
+    select count(*) into v_folded
+    from public.cost_balance_settlements s
+    where s.fridge_id = p_fridge_id
+      and s.checkpoint_id is null
+      and s.from_user_id is not null
+      and s.to_user_id is not null
+      and coalesce(s.cleared_at, s.created_at) < p_before;
+
+    if v_folded = 0 or v_folded < p_min_settlements then
+        return null;
+    end if;
+
+    select id into v_previous
+    from public.cost_balance_checkpoints
+    where fridge_id = v_fridge_id
+    order by id desc
+    limit 1;
+
+    insert into public.cost_balance_checkpoints (fridge_id, previous_checkpoint_id, folded_before, settlement_count)
+    values (v_fridge_id, v_previous, p_before, 0)
+    returning id into v_checkpoint;
+
+    with folded as (
+        update public.cost_balance_settlements s
+        set checkpoint_id = v_checkpoint
+        where s.fridge_id = p_fridge_id
+          and s.checkpoint_id is null
+          and s.from_user_id is not null
+          and s.to_user_id is not null
+          and coalesce(s.cleared_at, s.created_at) < p_before
+        returning s.from_user_id, s.to_user_id, s.amount, coalesce(s.cleared_at, s.created_at) as cleared_at
+    ),
+    pairs as (
+        select from_user_id, to_user_id, amount_cents, last_cleared_at
+        from public.cost_balance_checkpoint_pairs
+        where checkpoint_id = v_previous
+        union all
+        select from_user_id::text, to_user_id::text,
+               greatest(0, round(amount::numeric * 100))::bigint, cleared_at
+        from folded
+    )
+    insert into public.cost_balance_checkpoint_pairs (checkpoint_id, from_user_id, to_user_id, amount_cents, last_cleared_at)
+    select v_checkpoint, from_user_id, to_user_id, sum(amount_cents), max(last_cleared_at)
+    from pairs
+    group by from_user_id, to_user_id;
+
+    update public.cost_balance_checkpoints
+    set settlement_count = (
+        select count(*) from public.cost_balance_settlements where checkpoint_id = v_checkpoint
+    )
+    where id = v_checkpoint;
+
+    return v_checkpoint;
+end;
+$$;
+
+-- Undo the latest checkpoint of a fridge: its settlements become unfolded again
+create or replace function public.revert_cost_balance_checkpoint(p_checkpoint_id bigint)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_fridge_id text;
+begin
+    select fridge_id into v_fridge_id from public.cost_balance_checkpoints where id = p_checkpoint_id;
+    if v_fridge_id is null then
+        return;
+    end if;
+
+    perform pg_advisory_xact_lock(hashtext('cost_balance_checkpoints:' || v_fridge_id));
+
+    if exists (
+        select 1 from public.cost_balance_checkpoints
+        where fridge_id = v_fridge_id and id > p_checkpoint_id
+    ) then
+        raise exception 'checkpoint % is not the latest for fridge %', p_checkpoint_id, v_fridge_id;
+    end if;
+
+    update public.cost_balance_settlements set checkpoint_id = null where checkpoint_id = p_checkpoint_id;
+    delete from public.cost_balance_checkpoints where id = p_checkpoint_id;
+end;
+$$;
+
+-- Fridges with at least p_min_settlements settlements old enough to fold
+create or replace function public.cost_balance_compaction_candidates(
+    p_before timestamptz,
+    p_min_settlements integer default 1,
+    p_limit integer default 100
+)
+returns table (fridge_id text, settlement_count bigint)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select s.fridge_id::text, count(*)
+    from public.cost_balance_settlements s
+    where s.checkpoint_id is null
+      and s.from_user_id is not null
+      and s.to_user_id is not null
+      and coalesce(s.cleared_at, s.created_at) < p_before
+    group by s.fridge_id
+    having count(*) >= p_min_settlements
+    order by count(*) desc
+    limit p_limit;
+$$;
+
+-- Compaction is run by the API with the service role only. RLS without any
+-- policy hides the checkpoint tables from anon and authenticated, and the
+-- security definer functions must not be callable through /rest/v1/rpc.
+alter table public.cost_balance_checkpoints enable row level security;
+alter table public.cost_balance_checkpoint_pairs enable row level security;
+
+revoke all on table public.cost_balance_checkpoints from anon, authenticated;
+revoke all on table public.cost_balance_checkpoint_pairs from anon, authenticated;
+
+revoke execute on function public.compact_cost_balance_settlements from public, anon, authenticated;
+revoke execute on function public.revert_cost_balance_checkpoint from public, anon, authenticated;
+revoke execute on function public.cost_balance_compaction_candidates from public, anon, authenticated;
+
+grant execute on function public.compact_cost_balance_settlements to service_role;
+grant execute on function public.revert_cost_balance_checkpoint to service_role;
+grant execute on function public.cost_balance_compaction_candidates to service_role;
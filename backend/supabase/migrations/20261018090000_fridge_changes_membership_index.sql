@@ -0,0 +1,7 @@
+-- The membership index (backend/membership.py) checks the newest
+-- fridge_memberships change of a fridge on every lookup; keep that a single
+-- index probe however many item and shopping list changes the fridge has.
+drop index if exists public.fridge_changes_memberships_id_idx;
+create index if not exists fridge_changes_memberships_fridge_id_id_idx
+    on public.fridge_changes (fridge_id, id)
+    where collection = 'fridge_memberships';
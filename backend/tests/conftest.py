@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Importing the routers builds the Supabase client; nothing is sent over the network
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "placeholder.placeholder.placeholder")
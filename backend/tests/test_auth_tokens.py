@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+
+import auth_tokens
+
+SECRET = "secret-for-tests-0123456789abcdef"
+
+
+def test_jwks_refresh_does_not_block_other_requests(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "http://localhost:54321")
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+    fetches = []
+
+    async def slow_jwks(request):
+        fetches.append(request.url.path)
+        await asyncio.sleep(0.3)
+        return httpx.Response(200, json={"keys": [{"kty": "oct", "kid": "k1", "alg": "HS256", "k": "c2VjcmV0"}]})
+
+    key_cache = auth_tokens._SigningKeyCache()
+    key_cache._http = httpx.AsyncClient(transport=httpx.MockTransport(slow_jwks))
+    monkeypatch.setattr(auth_tokens, "_key_cache", key_cache)
+
+    token = jwt.encode(
+        {
+            "sub": "user-1",
+            "aud": auth_tokens.JWT_AUDIENCE,
+            "iss": "http://localhost:54321/auth/v1",
+            "exp": int(time.time()) + 60,
+        },
+        SECRET,
+        algorithm="HS256",
+    )
+
+    async def scenario():
+        refreshing = [asyncio.create_task(key_cache.signing_key("k1")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        claims = await auth_tokens.verify_access_token(token)
+        elapsed = time.monotonic() - started
+        return claims, elapsed, await asyncio.gather(*refreshing)
+
+    claims, elapsed, keys = asyncio.run(scenario())
+
+    # The event loop kept serving while the JWKS request was in flight
+    assert claims["sub"] == "user-1"
+    assert elapsed < 0.1
+    # Concurrent misses share one refresh
+    assert all(key is not None for key in keys)
+    assert fetches == ["/auth/v1/.well-known/jwks.json"]
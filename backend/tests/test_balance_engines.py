@@ -0,0 +1,72 @@
+"""
+The NumPy ledger engine must split items exactly like the Python one.
+
+Both engines rebuild a FridgeLedger from the same randomized items, including
+prices with more than two decimals, strings, ints, missing and negative
+prices, duplicate and unknown sharers, and non-member buyers, and must produce
+identical pair_totals().
+"""
+import random
+
+import pytest
+
+import CostSplitting
+from CostSplitting import FridgeLedger
+
+pytest.importorskip("numpy")
+
+ENGINE_FRIDGES = 300
+ENGINE_SEED = 14
+
+
+def random_price(rng: random.Random):
+    cents = rng.choice((rng.randint(1, 99), rng.randint(1, 100_000), rng.randint(1, 10 ** 9)))
+    return rng.choice((
+        cents / 100,
+        f"{cents / 100:.2f}",
+        cents // 100,
+        # Half cents and float noise go through the exact fallback
+        round(rng.uniform(0, 1_000), 3),
+        cents / 100 + 1e-9,
+        -cents / 100,
+        0,
+        None,
+    ))
+
+
+def random_items(rng: random.Random, member_ids: list) -> list:
+    people = member_ids + ["former-member"]
+    items = []
+    for index in range(rng.randint(0, 200)):
+        shared_by = rng.choice((
+            None,
+            [],
+            rng.sample(people, rng.randint(1, len(people))),
+            [rng.choice(people)] * 2,
+            rng.choice(people),
+        ))
+        items.append({
+            "id": index + 1,
+            "price": random_price(rng),
+            "added_by": rng.choice(people),
+            "shared_by": shared_by,
+            "created_at": None,
+        })
+    return items
+
+
+def ledger_pair_totals(monkeypatch, engine: str, member_ids: tuple, items: list) -> dict:
+    monkeypatch.setattr(CostSplitting, "BALANCE_ENGINE", engine)
+    ledger = FridgeLedger("fridge", member_ids)
+    ledger.load_items(items)
+    return ledger.pair_totals()
+
+
+def test_numpy_engine_matches_python_engine(monkeypatch):
+    rng = random.Random(ENGINE_SEED)
+    for _ in range(ENGINE_FRIDGES):
+        member_ids = tuple(sorted(f"user-{index}" for index in range(rng.randint(1, 12))))
+        items = random_items(rng, list(member_ids))
+
+        expected = ledger_pair_totals(monkeypatch, "python", member_ids, items)
+        assert ledger_pair_totals(monkeypatch, "numpy", member_ids, items) == expected
@@ -0,0 +1,107 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from CostSplitting import BalanceTimeline, FridgeLedger
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def ledger_for(member_ids, items, settlements):
+    # Built the way get_fridge_ledger builds it
+    ledger = FridgeLedger("fridge", tuple(sorted(member_ids)))
+    ledger.load_items(items)
+    for settlement in settlements:
+        ledger.apply_settlement(settlement)
+    return ledger
+
+
+def test_odd_cents_follow_the_ledger_whatever_the_member_order():
+    member_ids = ["c", "a", "b"]
+    items = [{"id": 1, "price": 1.00, "added_by": "c", "shared_by": None, "created_at": START.isoformat()}]
+
+    timeline = BalanceTimeline(items, [], member_ids)
+
+    assert timeline.pair_totals_at(START) == ledger_for(member_ids, items, []).pair_totals()
+    assert timeline.pair_totals_at(START) == {"a": {"c": 34}, "b": {"c": 33}}
+
+
+def test_as_of_now_matches_the_live_ledger():
+    rng = random.Random(18)
+    for _ in range(200):
+        member_ids = [f"user-{index}" for index in range(rng.randint(1, 8))]
+        rng.shuffle(member_ids)
+        items = [
+            {
+                "id": index,
+                "price": rng.randint(1, 10_000) / 100,
+                "added_by": rng.choice(member_ids),
+                "shared_by": rng.choice((None, rng.sample(member_ids, rng.randint(1, len(member_ids))))),
+                "created_at": (START + timedelta(minutes=index)).isoformat(),
+            }
+            for index in range(rng.randint(0, 40))
+        ]
+        settlements = [
+            {
+                "id": index,
+                "from_user_id": rng.choice(member_ids),
+                "to_user_id": rng.choice(member_ids),
+                "amount": rng.randint(1, 2_000) / 100,
+                "cleared_at": (START + timedelta(minutes=rng.randint(0, 40))).isoformat(),
+            }
+            for index in range(rng.randint(0, 10))
+        ]
+
+        now = START + timedelta(days=1)
+        timeline = BalanceTimeline(items, settlements, member_ids)
+        assert timeline.pair_totals_at(now) == ledger_for(member_ids, items, settlements).pair_totals()
+
+
+def test_applied_changes_match_a_fresh_timeline(monkeypatch):
+    # Small snapshot interval so changes land before, between and after snapshots
+    monkeypatch.setattr("CostSplitting.BALANCE_HISTORY_SNAPSHOT_EVERY", 3)
+    rng = random.Random(25)
+
+    def random_item(index, member_ids):
+        return {
+            "id": index,
+            "price": rng.randint(1, 10_000) / 100,
+            "added_by": rng.choice(member_ids),
+            "shared_by": None,
+            "created_at": (START + timedelta(minutes=rng.randint(0, 60))).isoformat(),
+        }
+
+    def random_settlement(index, member_ids):
+        return {
+            "id": index,
+            "from_user_id": rng.choice(member_ids),
+            "to_user_id": rng.choice(member_ids),
+            "amount": rng.randint(1, 2_000) / 100,
+            "cleared_at": (START + timedelta(minutes=rng.randint(0, 60))).isoformat(),
+        }
+
+    for _ in range(100):
+        member_ids = [f"user-{index}" for index in range(rng.randint(1, 5))]
+        items = {index: random_item(index, member_ids) for index in range(1, rng.randint(1, 20))}
+        settlements = {index: random_settlement(index, member_ids) for index in range(1, rng.randint(1, 6))}
+        timeline = BalanceTimeline(list(items.values()), list(settlements.values()), member_ids)
+
+        changed = {}
+        for _ in range(rng.randint(1, 8)):
+            collection, rows, make = rng.choice((
+                ("fridge_items", items, random_item),
+                ("cost_balance_settlements", settlements, random_settlement),
+            ))
+            row_id = rng.randint(1, 25)
+            if rng.random() < 0.3:
+                rows.pop(row_id, None)
+                changed[(collection, str(row_id))] = None
+            else:
+                rows[row_id] = make(row_id, member_ids)
+                changed[(collection, str(row_id))] = rows[row_id]
+        timeline.apply_rows(changed)
+
+        fresh = BalanceTimeline(list(items.values()), list(settlements.values()), member_ids)
+        for minute in range(-1, 62, 4):
+            at = START + timedelta(minutes=minute)
+            assert timeline.pair_totals_at(at) == fresh.pair_totals_at(at)
+        assert len(timeline.snapshots) == len(fresh.snapshots)
@@ -0,0 +1,102 @@
+"""
+Randomized property checks for the integer-cents cost splitting pipeline.
+
+Generates fridges with random members, prices, sharers, edits, deletions and
+settlements, feeds them through FridgeLedger exactly as the change log would,
+and checks that:
+
+    * every item's shares (including the buyer's own) add up to its price
+    * shares of one item differ by at most one cent
+    * the members' balances sum to exactly zero
+    * the simplified settlement plan, once paid, leaves every balance at zero
+    * clearing a user's pairs leaves that user's balance at exactly zero
+
+Set COST_SPLITTING_PROPERTY_FRIDGES for a longer run:
+
+    COST_SPLITTING_PROPERTY_FRIDGES=5000 python -m pytest tests/test_cost_splitting_properties.py
+"""
+import os
+import random
+
+from CostSplitting import FridgeLedger, _item_shares, _net_balances, _simplify_debts, _to_cents
+
+PROPERTY_FRIDGES = int(os.getenv("COST_SPLITTING_PROPERTY_FRIDGES", "500"))
+PROPERTY_SEED = 13
+
+
+def random_price(rng: random.Random):
+    cents = rng.choice((rng.randint(1, 9), rng.randint(1, 10_000), rng.randint(1, 1_000_000)))
+    # Prices arrive as floats, strings and ints depending on the client
+    return rng.choice((cents / 100, f"{cents / 100:.2f}", cents // 100 or 1))
+
+
+def check_item(item: dict, member_ids: list) -> None:
+    shares = _item_shares(item, member_ids)
+    price_cents = _to_cents(item["price"])
+    sharers = [uid for uid in (item["shared_by"] or member_ids) if uid in member_ids]
+    # The buyer's own share is not a debt; recompute it from the split rule
+    base_share, remainder = divmod(price_cents, len(sharers))
+    own_share = sum(base_share + (1 if index < remainder else 0)
+                    for index, uid in enumerate(sharers) if uid == item["added_by"])
+    amounts = [cents for _, _, cents in shares]
+    assert sum(amounts) + own_share == price_cents, (item, shares)
+    if amounts:
+        assert max(amounts) - min(amounts) <= 1, (item, shares)
+
+
+def run_fridge(rng: random.Random, fridge_index: int) -> None:
+    member_ids = [f"user-{index}" for index in range(rng.randint(1, 12))]
+    ledger = FridgeLedger(f"fridge-{fridge_index}", tuple(sorted(member_ids)))
+    items = {}
+    settlement_ids = iter(range(1, 1_000_000))
+
+    for step in range(rng.randint(1, 80)):
+        action = rng.random()
+        if action < 0.55 or not items:
+            item = {
+                "id": f"item-{step}",
+                "price": random_price(rng),
+                "added_by": rng.choice(member_ids),
+                "shared_by": rng.choice((None, rng.sample(member_ids, rng.randint(1, len(member_ids))))),
+            }
+            check_item(item, member_ids)
+            items[item["id"]] = item
+            ledger.apply_item(item)
+        elif action < 0.7:
+            item = items[rng.choice(list(items))]
+            item["price"] = random_price(rng)
+            check_item(item, member_ids)
+            ledger.apply_item(item)
+        elif action < 0.8:
+            ledger.remove_item(items.pop(rng.choice(list(items)))["id"])
+        else:
+            # Clear one user the way clear_user_balance does
+            user_id = rng.choice(member_ids)
+            pair_totals = ledger.pair_totals()
+            owed = [(user_id, creditor, cents) for creditor, cents in pair_totals.get(user_id, {}).items()]
+            owed += [(debtor, user_id, creditors[user_id]) for debtor, creditors in pair_totals.items()
+                     if debtor != user_id and creditors.get(user_id)]
+            for from_id, to_id, cents in owed:
+                ledger.apply_settlement({
+                    "id": next(settlement_ids),
+                    "from_user_id": from_id,
+                    "to_user_id": to_id,
+                    "amount": cents / 100,
+                })
+            assert _net_balances(ledger.pair_totals()).get(user_id, 0) == 0, (user_id, ledger.pair_totals())
+
+        balances = _net_balances(ledger.pair_totals())
+        assert sum(balances.values()) == 0, balances
+
+        remaining = dict(balances)
+        for transaction in _simplify_debts(balances, {}):
+            cents = _to_cents(transaction["amount"])
+            remaining[transaction["from_user_id"]] += cents
+            remaining[transaction["to_user_id"]] -= cents
+        assert not any(remaining.values()), (balances, remaining)
+
+
+def test_random_fridges_keep_every_property():
+    rng = random.Random(PROPERTY_SEED)
+    for fridge_index in range(PROPERTY_FRIDGES):
+        run_fridge(rng, fridge_index)
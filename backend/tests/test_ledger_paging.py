@@ -0,0 +1,139 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import CostSplitting
+import listing
+from CostSplitting import FridgeLedger, _verify_checkpoint, get_balance_timeline
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class CappedQuery:
+    """Just enough of a PostgREST select to page through, capped at max_rows like the real one."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    async def execute(self):
+        rows = [row for row in self.rows if all(match(row) for match in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        return Response(rows[:listing.POSTGREST_MAX_ROWS])
+
+
+class CappedClient:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return CappedQuery(self.tables.get(name, []))
+
+
+def large_fridge(member_ids, items, settlements):
+    rng = random.Random(14)
+    return {
+        "fridge_items": [
+            {
+                "id": index,
+                "fridge_id": "big",
+                "price": rng.randint(1, 5_000) / 100,
+                "added_by": rng.choice(member_ids),
+                "shared_by": rng.choice((None, rng.sample(member_ids, 2))),
+                "created_at": (START + timedelta(minutes=index)).isoformat(),
+            }
+            for index in range(items)
+        ],
+        CostSplitting.SETTLEMENT_TABLE: [
+            {
+                "id": index,
+                "fridge_id": "big",
+                "from_user_id": rng.choice(member_ids),
+                "to_user_id": rng.choice(member_ids),
+                "amount": rng.randint(1, 1_000) / 100,
+                "cleared_at": (START + timedelta(minutes=index)).isoformat(),
+            }
+            for index in range(settlements)
+        ],
+    }
+
+
+def test_rebuild_and_timeline_read_past_max_rows(monkeypatch):
+    member_ids = ["user-0", "user-1", "user-2", "user-3"]
+    tables = large_fridge(member_ids, items=2_500, settlements=1_200)
+    client = CappedClient(tables)
+    monkeypatch.setattr(CostSplitting, "async_supabase", client)
+    monkeypatch.setattr(listing, "async_supabase", client)
+
+    expected = FridgeLedger("big", tuple(member_ids))
+    expected.load_items(tables["fridge_items"])
+    for settlement in tables[CostSplitting.SETTLEMENT_TABLE]:
+        expected.apply_settlement(settlement)
+
+    ledger = FridgeLedger("big", tuple(member_ids))
+    asyncio.run(ledger.rebuild())
+    assert len(ledger._items) == 2_500
+    assert ledger.pair_totals() == expected.pair_totals()
+
+    timeline = asyncio.run(get_balance_timeline("big", member_ids))
+    assert timeline.pair_totals_at(START + timedelta(days=30)) == expected.pair_totals()
+
+
+def test_checkpoint_verification_reads_past_max_rows(monkeypatch):
+    member_ids = ["user-0", "user-1", "user-2"]
+    tables = large_fridge(member_ids, items=0, settlements=1_500)
+    settlements = tables[CostSplitting.SETTLEMENT_TABLE]
+
+    # Fold the first 1,200 rows into checkpoint 7, as compact_cost_balance_settlements would
+    folded = FridgeLedger("big", ())
+    for settlement in settlements[:1_200]:
+        settlement["checkpoint_id"] = 7
+        folded.apply_settlement(settlement)
+    tables[CostSplitting.CHECKPOINT_PAIRS_TABLE] = [
+        {
+            "checkpoint_id": 7,
+            "from_user_id": from_id,
+            "to_user_id": to_id,
+            "amount_cents": cents,
+            "last_cleared_at": max(
+                row["cleared_at"] for row in settlements[:1_200]
+                if (row["from_user_id"], row["to_user_id"]) == (from_id, to_id)
+            ),
+        }
+        for (from_id, to_id), cents in folded.settled_totals().items()
+    ]
+
+    client = CappedClient(tables)
+    monkeypatch.setattr(CostSplitting, "async_supabase", client)
+    monkeypatch.setattr(listing, "async_supabase", client)
+
+    assert asyncio.run(_verify_checkpoint("big", 7)) == (True, 1_200)
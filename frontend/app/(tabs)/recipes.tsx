@@ -16,6 +16,7 @@ import React, { useState, useEffect } from "react";
 import { useAuth } from "../context/authContext";
 import { supabase } from "../utils/client";
 import ProfileIcon from "@/components/ProfileIcon";
+import { fetchAllFridgeItems } from "../api/FetchFridgeItems";
 
 interface ItemProps {
   title: string;
@@ -229,18 +230,7 @@ export default function recipes() {
         return;
       }
 
-      const fridgeItems = await fetch(
-        `${process.env.EXPO_PUBLIC_API_URL}/fridge_items/`,
-        {
-          method: "GET",
-          headers: {
-            "Content-Type": "application/json",
-            Authorization: `Bearer ${session.access_token}`,
-          },
-        }
-      );
-
-      const result = await fridgeItems.json();
+      const result = await fetchAllFridgeItems(session.access_token);
 
       const fridgeItemsFetched = (result.data as FridgeItem[]).map(
         (item: FridgeItem) => item.name
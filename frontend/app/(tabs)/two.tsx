@@ -26,6 +26,7 @@ import { supabase } from "../utils/client";
 import { useAuth } from "../context/authContext";
 import { useFocusEffect } from "@react-navigation/native";
 import ProfileIcon from "@/components/ProfileIcon";
+import { fetchAllFridgeItems } from "../api/FetchFridgeItems";
 
 const API_URL = `${process.env.EXPO_PUBLIC_API_URL}`; // Backend API endpoint
 
@@ -506,19 +507,7 @@ export default function TabOneScreen() {
 
       console.log("User ID:", user?.id);
 
-      const response = await fetch(`${API_URL}/fridge_items/`, {
-        method: "GET",
-        headers: {
-          "Content-Type": "application/json",
-          Authorization: `Bearer ${session.access_token}`,
-        },
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      const result = await response.json();
+      const result = await fetchAllFridgeItems(session.access_token);
       console.log("API Response:", result);
 
       if (result.message === "User has no fridge assigned") {
@@ -0,0 +1,38 @@
+const API_URL = process.env.EXPO_PUBLIC_API_URL || "http://localhost:8000";
+
+// Largest page GET /fridge_items/ accepts
+const PAGE_SIZE = 500;
+
+// GET /fridge_items/ is paginated (newest first); this follows next_cursor
+// until the last page and returns the first response with every item in data.
+export async function fetchAllFridgeItems(access_token: string) {
+  let cursor: string | null = null;
+  let first: any = null;
+  const items: any[] = [];
+
+  do {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor) {
+      params.set("cursor", cursor);
+    }
+
+    const response = await fetch(`${API_URL}/fridge_items/?${params}`, {
+      method: "GET",
+      headers: {
+        "Content-Type": "application/json",
+        Authorization: `Bearer ${access_token}`,
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const result = await response.json();
+    first = first ?? result;
+    items.push(...(result.data || []));
+    cursor = result.next_cursor || null;
+  } while (cursor);
+
+  return { ...first, data: items, next_cursor: null };
+}